@@ -1,12 +1,29 @@
 # core/accounting.py
+"""
+Plafonds légaux (LegalThresholds) et taux URSSAF (UrssafRate), par année.
+
+Les deux tables changent une fois par an au plus : elles sont lues une fois
+par année et par processus (lru_cache), puis servies depuis la mémoire.
+Une modification (admin) incrémente un compteur de version partagé dans le
+cache Django ; chaque processus le relit au plus toutes les
+VERSION_CHECK_INTERVAL secondes et abandonne alors ses tables en mémoire.
+
+Une année sans ligne reprend la dernière année antérieure saisie (les taux
+et plafonds sont reconduits tant que la loi ne change pas), à défaut les
+valeurs par défaut ci-dessous — sans rien écrire en base.
+"""
+
+import time
 from decimal import Decimal
+from functools import lru_cache
 
+from django.core.cache import cache
 from django.utils import timezone
 
-from .models import LegalThresholds
+from .models import LegalThresholds, UrssafRate
 
-# Taux URSSAF 2025 (Entreprendre.Service-Public, 19/09/2025)
-# :contentReference[oaicite:10]{index=10}
+# Taux URSSAF 2025 (Entreprendre.Service-Public, 19/09/2025) : valeurs par
+# défaut si la table UrssafRate ne couvre pas l'année demandée
 URSSAF_RATES = {
     "VENTES": Decimal("0.123"),  # 12,3%
     "SERVICES_BIC": Decimal("0.212"),  # 21,2%
@@ -14,25 +31,82 @@ URSSAF_RATES = {
     "LIB_CIPAV": Decimal("0.232"),  # 23,2%
 }
 
-URSSAF_RATES_LIB = {
-    "VENTES": "12,3 %",
-    "SERVICES_BIC": "21,2 %",
-    "LIB_BNC": "24,6 %",
-    "LIB_CIPAV": "23,2 %",
-}
+ACCOUNTING_TABLES_VERSION_KEY = "accounting:tables:ver"
+VERSION_CHECK_INTERVAL = 5  # secondes
 
+# version connue du processus et date (monotone) de sa dernière lecture
+_local = {"version": None, "checked": 0.0}
 
-def get_thresholds(year=None):
-    year = year or timezone.now().year
-    obj = LegalThresholds.objects.filter(year=year).first()
-    if obj:
-        return obj
-    # fallback : crée avec défauts (sécurise l’usage)
-    return LegalThresholds.objects.create(year=year)
-
-
-def compute_contributions(activity_kind, amount):
-    rate = URSSAF_RATES.get(activity_kind, Decimal("0.00"))
-    return (amount * rate).quantize(Decimal("0.01")), URSSAF_RATES_LIB.get(
-        activity_kind, "-"
+
+def tables_version():
+    """Version courante des tables (relue dans le cache au plus toutes les 5 s)."""
+    now = time.monotonic()
+    if _local["version"] is None or now - _local["checked"] > VERSION_CHECK_INTERVAL:
+        version = cache.get(ACCOUNTING_TABLES_VERSION_KEY)
+        if version is None:
+            # compteur absent (jamais créé ou évincé) : valeur horodatée
+            cache.add(ACCOUNTING_TABLES_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(ACCOUNTING_TABLES_VERSION_KEY)
+        _local.update(version=version, checked=now)
+    return _local["version"]
+
+
+def invalidate_accounting_tables():
+    """À appeler après toute modification des plafonds ou des taux."""
+    try:
+        cache.incr(ACCOUNTING_TABLES_VERSION_KEY)
+    except ValueError:
+        cache.set(ACCOUNTING_TABLES_VERSION_KEY, time.time_ns(), None)
+    _year_tables.cache_clear()
+    _local.update(version=None, checked=0.0)
+
+
+@lru_cache(maxsize=32)
+def _year_tables(year, version):
+    # `version` ne sert qu'à la clé : une nouvelle version = nouvelle lecture
+    thresholds = (
+        LegalThresholds.objects.filter(year__lte=year).order_by("-year").first()
+    )
+    if thresholds is None:
+        thresholds = LegalThresholds(year=year)  # défauts du modèle, non enregistrés
+    rates = dict(URSSAF_RATES)
+    seen = set()
+    rows = (
+        UrssafRate.objects.filter(year__lte=year)
+        .order_by("activity_kind", "-year")
+        .values_list("activity_kind", "rate")
     )
+    for kind, rate in rows:
+        if kind not in seen:
+            seen.add(kind)
+            rates[kind] = rate
+    return thresholds, rates
+
+
+def _tables(year=None):
+    return _year_tables(year or timezone.now().year, tables_version())
+
+
+def get_thresholds(year=None):
+    return _tables(year)[0]
+
+
+def get_urssaf_rates(year=None):
+    """{activité: taux} applicables à l'année `year` (copie)."""
+    return dict(_tables(year)[1])
+
+
+def rate_label(rate):
+    """Decimal("0.212") -> "21,2 %"."""
+    return f"{(rate * 100).normalize():f}".replace(".", ",") + " %"
+
+
+def compute_contributions(activity_kind, amount, year=None):
+    """
+    Cotisations URSSAF estimées sur `amount`, au taux de l'année `year`
+    (année en cours par défaut). Renvoie (montant, libellé du taux).
+    """
+    rate = _tables(year)[1].get(activity_kind)
+    if rate is None:
+        return Decimal("0.00"), "-"
+    return (amount * rate).quantize(Decimal("0.01")), rate_label(rate)
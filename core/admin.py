@@ -214,3 +214,48 @@ class LegalThresholdsAdmin(admin.ModelAdmin):
         "vat_base_services_tol",
     )
     list_filter = ("year",)
+
+
+@admin.register(models.UrssafRate)
+class UrssafRateAdmin(admin.ModelAdmin):
+    list_display = ("year", "activity_kind", "rate")
+    list_filter = ("year", "activity_kind")
+
+
+@admin.register(models.CompanyMonthlyRevenue)
+class CompanyMonthlyRevenueAdmin(admin.ModelAdmin):
+    list_display = (
+        "company",
+        "year",
+        "month",
+        "status",
+        "subtotal_cents",
+        "tax_cents",
+        "total_cents",
+        "invoice_count",
+        "updated_at",
+    )
+    list_filter = ("year", "status", "company")
+    search_fields = ("company__name",)
+
+
+@admin.register(models.Insight)
+class InsightAdmin(admin.ModelAdmin):
+    list_display = ("company", "type", "subject_id", "severity", "computed_at")
+    list_filter = ("type", "severity", "company")
+    search_fields = ("company__name",)
+
+
+@admin.register(models.ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "company",
+        "kind",
+        "status",
+        "progress",
+        "rows_done",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("kind", "status", "company")
+    search_fields = ("company__name", "rq_job_id")
@@ -0,0 +1,289 @@
+# core/fec.py
+"""
+Fichier des Écritures Comptables (FEC, art. A47 A-1 du LPF) des ventes.
+
+Chaque facture émise de l'exercice (année civile) devient une écriture du
+journal des ventes :
+    débit  411 client          TTC
+    crédit 706/707 produits    HT, par taux de TVA
+    crédit 4457 TVA collectée  TVA, par taux
+(sens inversés pour un montant négatif, ex. avoir). Les montants viennent des
+lignes, via le noyau core.totals (arrondi par ligne) : l'écriture est
+équilibrée par construction, ce que FecValidator vérifie au fil de l'eau.
+
+Les factures sont lues par paquets (`.iterator(chunk_size=...)`), les lignes
+d'un paquet en une requête : mémoire bornée quel que soit le volume.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from .models import Invoice, InvoiceItem
+from .totals import line_totals, to_bp, to_hundredths
+
+FEC_COLUMNS = [
+    "JournalCode",
+    "JournalLib",
+    "EcritureNum",
+    "EcritureDate",
+    "CompteNum",
+    "CompteLib",
+    "CompAuxNum",
+    "CompAuxLib",
+    "PieceRef",
+    "PieceDate",
+    "EcritureLib",
+    "Debit",
+    "Credit",
+    "EcritureLet",
+    "DateLet",
+    "ValidDate",
+    "Montantdevise",
+    "Idevise",
+]
+SEPARATOR = "|"
+
+# factures comptabilisées (les brouillons et annulées n'ont pas d'écriture)
+POSTED_STATUSES = ("ISSUED", "PAID", "OVERDUE")
+
+SALES_JOURNAL = ("VT", "Journal des ventes")
+CUSTOMER_ACCOUNT = ("411000", "Clients")
+REVENUE_ACCOUNTS = {
+    "VENTES": ("707000", "Ventes de marchandises"),
+}
+DEFAULT_REVENUE_ACCOUNT = ("706000", "Prestations de services")
+# taux (points de base) -> compte de TVA collectée
+VAT_ACCOUNTS = {
+    2000: ("445712", "TVA collectée 20 %"),
+    1000: ("445711", "TVA collectée 10 %"),
+    550: ("445713", "TVA collectée 5,5 %"),
+    210: ("445714", "TVA collectée 2,1 %"),
+}
+DEFAULT_VAT_ACCOUNT = ("445710", "TVA collectée")
+
+CHUNK_SIZE = 2000
+
+
+class FecError(ValueError):
+    pass
+
+
+def fec_filename(company, year):
+    """Nom légal : <SIREN>FEC<date de clôture AAAAMMJJ>.txt"""
+    siren = (company.siret or "")[:9] or "000000000"
+    return f"{siren}FEC{year}1231.txt"
+
+
+def _amount(cents):
+    # format FEC : virgule décimale, pas de séparateur de milliers
+    return f"{cents // 100},{cents % 100:02d}"
+
+
+def _date(d):
+    return d.strftime("%Y%m%d")
+
+
+def _label(value):
+    return " ".join(str(value or "").replace(SEPARATOR, " ").split())
+
+
+def _vat_account(bp):
+    account = VAT_ACCOUNTS.get(bp)
+    if account:
+        return account
+    code, label = DEFAULT_VAT_ACCOUNT
+    return code, f"{label} {Decimal(bp) / 100} %"
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _amounts_by_rate(invoice_ids):
+    """{invoice_id: {taux bp: [HT, TVA]}} pour un paquet de factures (une requête)."""
+    amounts = {}
+    rows = InvoiceItem.objects.filter(invoice_id__in=invoice_ids).values_list(
+        "invoice_id", "quantity", "unit_price_cents", "discount_pct", "vat_rate"
+    )
+    for invoice_id, qty, unit, discount, vat_rate in rows:
+        bp = to_bp(vat_rate)
+        lt = line_totals(unit, to_hundredths(qty), to_bp(discount), bp)
+        acc = amounts.setdefault(invoice_id, {}).setdefault(bp, [0, 0])
+        acc[0] += lt.ht
+        acc[1] += lt.vat
+    return amounts
+
+
+def _row(entry, account, cents, debit_side, aux=None):
+    # montant négatif (avoir) : passé dans la colonne opposée
+    if cents < 0:
+        cents, debit_side = -cents, not debit_side
+    debit, credit = (cents, 0) if debit_side else (0, cents)
+    return [
+        *SALES_JOURNAL,
+        entry["num"],
+        entry["date"],
+        *account,
+        *(aux or ("", "")),
+        entry["piece"],
+        entry["date"],
+        entry["lib"],
+        _amount(debit),
+        _amount(credit),
+        "",
+        "",
+        entry["date"],
+        "",
+        "",
+    ]
+
+
+def fec_invoices(company, year):
+    return Invoice.objects.filter(
+        company=company,
+        status__in=POSTED_STATUSES,
+        issue_date__gte=date(year, 1, 1),
+        issue_date__lte=date(year, 12, 31),
+    )
+
+
+def fec_rows(company, year, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Génère les lignes du FEC des ventes de l'exercice `year` (listes de 18
+    champs, sans l'en-tête), dans l'ordre chronologique des factures.
+    progress(factures traitées) est appelé après chaque paquet.
+    """
+    revenue = REVENUE_ACCOUNTS.get(company.activity_kind, DEFAULT_REVENUE_ACCOUNT)
+    invoices = (
+        fec_invoices(company, year)
+        .order_by("issue_date", "pk")
+        .values_list("pk", "number", "issue_date", "customer_id", "customer__name")
+        .iterator(chunk_size=chunk_size)
+    )
+    entry_num = done = 0
+    for chunk in _chunks(invoices, chunk_size):
+        amounts = _amounts_by_rate([inv[0] for inv in chunk])
+        for pk, number, issued, customer_id, customer_name in chunk:
+            by_rate = amounts.get(pk, {})
+            if not any(ht or vat for ht, vat in by_rate.values()):
+                continue  # facture sans ligne ou à 0 : pas d'écriture
+            entry_num += 1
+            entry = {
+                "num": str(entry_num),
+                "date": _date(issued),
+                "piece": _label(number),
+                "lib": _label(f"Facture {number} {customer_name or ''}"),
+            }
+            aux = (f"C{customer_id}", _label(customer_name)) if customer_id else None
+            total = sum(ht + vat for ht, vat in by_rate.values())
+            yield _row(entry, CUSTOMER_ACCOUNT, total, True, aux)
+            for bp in sorted(by_rate):
+                ht, vat = by_rate[bp]
+                if ht:
+                    rev_code, rev_lib = revenue
+                    label = f"{rev_lib} {Decimal(bp) / 100} %" if bp else rev_lib
+                    yield _row(entry, (rev_code, label), ht, False)
+                if vat:
+                    yield _row(entry, _vat_account(bp), vat, False)
+        done += len(chunk)
+        if progress is not None:
+            progress(done)
+
+
+def _cents(value):
+    units, _, decimals = value.partition(",")
+    if not units.isdigit() or len(decimals) != 2 or not decimals.isdigit():
+        raise FecError(f"montant invalide : {value!r}")
+    return int(units) * 100 + int(decimals)
+
+
+class FecValidator:
+    """
+    Contrôle au fil de l'eau des lignes FEC (listes de champs) :
+    nombre de colonnes, montants, dates dans l'exercice, et équilibre
+    débit = crédit de chaque écriture (lignes d'une écriture contiguës).
+    Seule l'écriture en cours est gardée en mémoire.
+    """
+
+    max_errors = 20
+
+    def __init__(self, year=None):
+        self.year = str(year) if year else None
+        self.errors = []
+        self.entries = 0
+        self.lines = 0
+        self.debit = self.credit = 0
+        self._current = None
+        self._balance = 0
+
+    def _error(self, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(message)
+
+    def _close_entry(self):
+        if self._current is not None and self._balance:
+            self._error(
+                f"écriture {self._current} déséquilibrée : "
+                f"écart {_amount(abs(self._balance))}"
+            )
+
+    def feed(self, fields):
+        self.lines += 1
+        if len(fields) != len(FEC_COLUMNS):
+            self._error(f"ligne {self.lines} : {len(fields)} colonnes au lieu de 18")
+            return
+        num = fields[2]
+        if num != self._current:
+            self._close_entry()
+            self._current, self._balance = num, 0
+            self.entries += 1
+        if self.year and not fields[3].startswith(self.year):
+            self._error(f"écriture {num} : date {fields[3]} hors exercice")
+        try:
+            debit, credit = _cents(fields[11]), _cents(fields[12])
+        except FecError as exc:
+            self._error(f"écriture {num} : {exc}")
+            return
+        self.debit += debit
+        self.credit += credit
+        self._balance += debit - credit
+
+    def close(self):
+        self._close_entry()
+        self._current = None
+        if self.debit != self.credit:
+            self._error(
+                f"total débit {_amount(self.debit)} ≠ total crédit {_amount(self.credit)}"
+            )
+        return not self.errors
+
+    def check(self, rows):
+        """Passe les lignes au travers du contrôle (générateur)."""
+        for fields in rows:
+            self.feed(fields)
+            yield fields
+
+
+def validate_fec(lines, year=None):
+    """
+    Contrôle un FEC (lignes de texte, en-tête compris) ; renvoie la liste des
+    anomalies (vide si le fichier est équilibré).
+    """
+    validator = FecValidator(year)
+    lines = iter(lines)
+    header = next(lines, "").lstrip("\ufeff").rstrip("\r\n").split(SEPARATOR)
+    if header != FEC_COLUMNS:
+        validator._error("en-tête FEC invalide")
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line:
+            validator.feed(line.split(SEPARATOR))
+    validator.close()
+    return validator.errors
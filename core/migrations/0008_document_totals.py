@@ -0,0 +1,81 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:22
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+FIELDS = ["subtotal_cents", "tax_cents", "total_cents"]
+
+
+def compute_totals(items):
+    # calcul figé à la date de la migration (arrondi des sommes, et non par
+    # ligne : voir 0011) ; ne pas remplacer par un import de code applicatif
+    subtotal = Decimal("0")
+    tax = Decimal("0")
+    for it in items:
+        q = Decimal(it.quantity)
+        unit = Decimal(it.unit_price_cents) / 100
+        disc = Decimal(it.discount_pct or 0) / 100
+        line_ht = q * unit * (Decimal("1") - disc)
+        subtotal += line_ht
+        tax += line_ht * Decimal(it.vat_rate or 0) / 100
+    subtotal_c = int((subtotal * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    tax_c = int((tax * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    return subtotal_c, tax_c, subtotal_c + tax_c
+
+
+def backfill_totals(apps, schema_editor):
+    for model_name in ("Invoice", "Quote"):
+        model = apps.get_model("core", model_name)
+        batch = []
+        for doc in model.objects.prefetch_related("items").iterator(chunk_size=500):
+            doc.subtotal_cents, doc.tax_cents, doc.total_cents = compute_totals(
+                doc.items.all()
+            )
+            batch.append(doc)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, FIELDS)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_alter_invoice_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invoice",
+            name="subtotal_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="tax_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="total_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quote",
+            name="subtotal_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quote",
+            name="tax_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quote",
+            name="total_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
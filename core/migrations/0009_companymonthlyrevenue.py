@@ -0,0 +1,94 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_rollup(apps, schema_editor):
+    # reconstruction figée (modèles historiques), cf. core.revenue.rebuild_monthly_revenue
+    Invoice = apps.get_model("core", "Invoice")
+    CompanyMonthlyRevenue = apps.get_model("core", "CompanyMonthlyRevenue")
+    fields = ("subtotal_cents", "tax_cents", "total_cents")
+    rows = (
+        Invoice.objects.annotate(
+            y=ExtractYear("issue_date"), m=ExtractMonth("issue_date")
+        )
+        .values("company_id", "y", "m", "status")
+        .annotate(invoice_count=Count("id"), **{f: Sum(f) for f in fields})
+        .order_by()
+    )
+    CompanyMonthlyRevenue.objects.bulk_create(
+        (
+            CompanyMonthlyRevenue(
+                company_id=r["company_id"],
+                year=r["y"],
+                month=r["m"],
+                status=r["status"],
+                subtotal_cents=r["subtotal_cents"] or 0,
+                tax_cents=r["tax_cents"] or 0,
+                total_cents=r["total_cents"] or 0,
+                invoice_count=r["invoice_count"],
+            )
+            for r in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_document_totals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompanyMonthlyRevenue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("DRAFT", "Brouillon"),
+                            ("ISSUED", "Émise"),
+                            ("PAID", "Payée"),
+                            ("OVERDUE", "En retard"),
+                            ("CANCELLED", "Annulée"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("subtotal_cents", models.BigIntegerField(default=0)),
+                ("tax_cents", models.BigIntegerField(default=0)),
+                ("total_cents", models.BigIntegerField(default=0)),
+                ("invoice_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_revenue",
+                        to="core.company",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["company", "year", "month", "status"],
+                "unique_together": {("company", "year", "month", "status")},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
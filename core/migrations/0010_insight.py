@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_companymonthlyrevenue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Insight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("type", models.CharField(max_length=40)),
+                ("subject_id", models.PositiveIntegerField()),
+                ("severity", models.CharField(max_length=20)),
+                ("payload", models.JSONField(default=dict)),
+                (
+                    "computed_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="insights",
+                        to="core.company",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["company", "type", "subject_id"],
+                "unique_together": {("company", "type", "subject_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Totaux recalculés avec le noyau core.totals (arrondi par ligne) : les anciens
+# totaux arrondissaient la somme des lignes et pouvaient différer d'un centime.
+# Noyau et reconstruction de l'agrégat figés ici (modèles historiques) : la
+# migration ne dépend pas des évolutions de core.totals / core.revenue.
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+FIELDS = ["subtotal_cents", "tax_cents", "total_cents"]
+
+
+def _scaled(value):
+    # décimal -> entier ×100, arrondi demi vers le haut (None -> 0)
+    if not value:
+        return 0
+    d = value if isinstance(value, Decimal) else Decimal(str(value))
+    return int(d.scaleb(2).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _div_round(n, d):
+    if n >= 0:
+        return (n + d // 2) // d
+    return -((d // 2 - n) // d)
+
+
+def _document_totals(items):
+    subtotal = tax = 0
+    for it in items:
+        base = _div_round(it.unit_price_cents * _scaled(it.quantity), 100)
+        ht = base - _div_round(base * _scaled(it.discount_pct), 10000)
+        subtotal += ht
+        tax += _div_round(ht * _scaled(it.vat_rate), 10000)
+    return subtotal, tax, subtotal + tax
+
+
+def _rebuild_monthly_revenue(apps):
+    Invoice = apps.get_model("core", "Invoice")
+    CompanyMonthlyRevenue = apps.get_model("core", "CompanyMonthlyRevenue")
+    rows = (
+        Invoice.objects.annotate(
+            y=ExtractYear("issue_date"), m=ExtractMonth("issue_date")
+        )
+        .values("company_id", "y", "m", "status")
+        .annotate(invoice_count=Count("id"), **{f: Sum(f) for f in FIELDS})
+        .order_by()
+    )
+    objs = [
+        CompanyMonthlyRevenue(
+            company_id=r["company_id"],
+            year=r["y"],
+            month=r["m"],
+            status=r["status"],
+            subtotal_cents=r["subtotal_cents"] or 0,
+            tax_cents=r["tax_cents"] or 0,
+            total_cents=r["total_cents"] or 0,
+            invoice_count=r["invoice_count"],
+        )
+        for r in rows.iterator(chunk_size=2000)
+    ]
+    CompanyMonthlyRevenue.objects.all().delete()
+    CompanyMonthlyRevenue.objects.bulk_create(objs, batch_size=1000)
+
+
+def recompute_totals(apps, schema_editor):
+    for model_name in ("Invoice", "Quote"):
+        model = apps.get_model("core", model_name)
+        batch = []
+        for doc in model.objects.prefetch_related("items").iterator(chunk_size=500):
+            expected = _document_totals(doc.items.all())
+            if expected != tuple(getattr(doc, f) for f in FIELDS):
+                doc.subtotal_cents, doc.tax_cents, doc.total_cents = expected
+                batch.append(doc)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, FIELDS)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, FIELDS)
+    _rebuild_monthly_revenue(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_insight"),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.7 on 2026-10-18 21:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# taux 2025 (jusqu'ici constantes de core.accounting)
+RATES_2025 = {
+    "VENTES": Decimal("0.123"),
+    "SERVICES_BIC": Decimal("0.212"),
+    "LIB_BNC": Decimal("0.246"),
+    "LIB_CIPAV": Decimal("0.232"),
+}
+
+
+def seed_rates(apps, schema_editor):
+    UrssafRate = apps.get_model("core", "UrssafRate")
+    for kind, rate in RATES_2025.items():
+        UrssafRate.objects.get_or_create(
+            year=2025, activity_kind=kind, defaults={"rate": rate}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_exportjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UrssafRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveIntegerField()),
+                (
+                    "activity_kind",
+                    models.CharField(
+                        choices=[
+                            ("VENTES", "Vente de marchandises / hébergement (BIC)"),
+                            ("SERVICES_BIC", "Prestations de services (BIC)"),
+                            ("LIB_BNC", "Libéral non réglementé (BNC)"),
+                            ("LIB_CIPAV", "Libéral réglementé (CIPAV)"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("rate", models.DecimalField(decimal_places=4, max_digits=5)),
+            ],
+            options={
+                "ordering": ["-year", "activity_kind"],
+                "unique_together": {("year", "activity_kind")},
+            },
+        ),
+        migrations.RunPython(seed_rates, migrations.RunPython.noop),
+    ]
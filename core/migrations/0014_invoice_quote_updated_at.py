@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 21:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_urssafrate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invoice",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="quote",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
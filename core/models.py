@@ -12,6 +12,35 @@ class Timestamped(models.Model):
         abstract = True
 
 
+class DocumentTotals(models.Model):
+    """
+    Totaux HT/TVA/TTC dénormalisés (centimes) d'un devis ou d'une facture.
+    Maintenus par core.services.refresh_document_totals à chaque modification
+    des lignes : ne jamais les écrire à la main.
+    """
+
+    TOTALS_FIELDS = ("subtotal_cents", "tax_cents", "total_cents")
+
+    subtotal_cents = models.BigIntegerField(default=0, editable=False)
+    tax_cents = models.BigIntegerField(default=0, editable=False)
+    total_cents = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Une instance chargée avant l'édition des lignes porte des totaux périmés :
+        # on ne les réécrit pas lors d'un save() complet.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            skip = set(self.TOTALS_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in skip and f.name not in skip
+            ]
+        super().save(*args, **kwargs)
+
+
 class Company(Timestamped):
     name = models.CharField(max_length=200)
     siret = models.CharField(max_length=14, blank=True)
@@ -105,6 +134,24 @@ class LegalThresholds(models.Model):
         unique_together = [("year",)]
 
 
+class UrssafRate(models.Model):
+    """
+    Taux de cotisations URSSAF (micro-entrepreneur) par année et activité,
+    éditables si la loi change ; lus via core.accounting (cache par année).
+    """
+
+    year = models.PositiveIntegerField()
+    activity_kind = models.CharField(max_length=20, choices=Company.ACTIVITY_KIND)
+    rate = models.DecimalField(max_digits=5, decimal_places=4)  # 0.2120 = 21,2 %
+
+    class Meta:
+        unique_together = [("year", "activity_kind")]
+        ordering = ["-year", "activity_kind"]
+
+    def __str__(self):
+        return f"{self.year} {self.activity_kind} {self.rate}"
+
+
 class Membership(Timestamped):
     ROLE_CHOICES = [("ADMIN", "Admin"), ("MANAGER", "Manager"), ("MEMBER", "Member")]
     user = models.ForeignKey("auth.User", on_delete=models.CASCADE)
@@ -258,7 +305,7 @@ class Customer(models.Model):
 
 
 # --- Devis ---
-class Quote(models.Model):
+class Quote(DocumentTotals):
     STATUS = [
         ("DRAFT", "Brouillon"),
         ("SENT", "Envoyé"),
@@ -281,6 +328,8 @@ class Quote(models.Model):
     currency = models.CharField(max_length=10, default="EUR")
     created_by = models.ForeignKey("auth.User", null=True, on_delete=models.SET_NULL)
     pdf = models.FileField(upload_to="quotes/", null=True, blank=True)
+    # toute modification (lignes comprises) : version du PDF enregistré (core.pdf_store)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("company", "number")
@@ -301,7 +350,7 @@ class QuoteItem(models.Model):
 
 
 # --- Factures (plus riche que ta version initiale) ---
-class Invoice(models.Model):
+class Invoice(DocumentTotals):
     STATUS = [
         ("DRAFT", "Brouillon"),
         ("ISSUED", "Émise"),
@@ -327,6 +376,8 @@ class Invoice(models.Model):
     notes = models.TextField(blank=True)
     pdf = models.FileField(upload_to="invoices/", null=True, blank=True)
     created_by = models.ForeignKey("auth.User", null=True, on_delete=models.SET_NULL)
+    # toute modification (lignes comprises) : version du PDF enregistré (core.pdf_store)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
@@ -352,6 +403,103 @@ class InvoiceItem(models.Model):
     discount_pct = models.DecimalField(max_digits=4, decimal_places=2, default=0)
 
 
+# --- Agrégat mensuel de CA (maintenu par core.revenue) ---
+class CompanyMonthlyRevenue(models.Model):
+    """
+    CA mensuel par entreprise et statut de facture (centimes).
+    Recalculé pour le seul mois touché à chaque modification de facture/ligne,
+    reconstruit par la commande rebuild_monthly_revenue.
+    """
+
+    company = models.ForeignKey(
+        "Company", on_delete=models.CASCADE, related_name="monthly_revenue"
+    )
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=20, choices=Invoice.STATUS)
+    subtotal_cents = models.BigIntegerField(default=0)
+    tax_cents = models.BigIntegerField(default=0)
+    total_cents = models.BigIntegerField(default=0)
+    invoice_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("company", "year", "month", "status")]
+        ordering = ["company", "year", "month", "status"]
+
+    def __str__(self):
+        return f"{self.company_id} {self.year}-{self.month:02d} {self.status}"
+
+
+# --- Insights persistés (alimentés par portal.services_insights.refresh_insights) ---
+class Insight(models.Model):
+    """
+    Insight du dashboard (marge faible, client perdu…) pour un sujet donné :
+    facture ou client selon le type. `payload` contient le dict affiché.
+    """
+
+    company = models.ForeignKey(
+        "Company", on_delete=models.CASCADE, related_name="insights"
+    )
+    type = models.CharField(max_length=40)
+    subject_id = models.PositiveIntegerField()
+    severity = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [("company", "type", "subject_id")]
+        ordering = ["company", "type", "subject_id"]
+
+    def __str__(self):
+        return f"{self.company_id} {self.type} #{self.subject_id}"
+
+
+# --- Exports en tâche de fond (portal.services_exports, file RQ "default") ---
+class ExportJob(Timestamped):
+    """
+    Export long (CSV comptable, FEC, lot de PDF, dump de la company) exécuté par
+    un worker RQ ; suivi de l'avancement et fichier produit sous MEDIA_ROOT/exports.
+    """
+
+    KIND = [
+        ("ACCOUNTING_CSV", "CSV comptable"),
+        ("FEC", "Fichier des écritures comptables"),
+        ("PDF_BUNDLE", "Lot de PDF"),
+        ("TENANT_DUMP", "Export complet des données"),
+    ]
+    STATUS = [
+        ("PENDING", "En attente"),
+        ("RUNNING", "En cours"),
+        ("SUCCESS", "Terminé"),
+        ("FAILED", "Échec"),
+        ("EXPIRED", "Expiré"),
+    ]
+    company = models.ForeignKey(
+        "Company", on_delete=models.CASCADE, related_name="export_jobs"
+    )
+    requested_by = models.ForeignKey(
+        "auth.User", null=True, blank=True, on_delete=models.SET_NULL
+    )
+    kind = models.CharField(max_length=20, choices=KIND)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default="PENDING")
+    progress = models.PositiveSmallIntegerField(default=0)  # en %
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    file = models.FileField(upload_to="exports/", null=True, blank=True)
+    error = models.TextField(blank=True)
+    rq_job_id = models.CharField(max_length=64, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"{self.company_id} {self.kind} #{self.pk} ({self.status})"
+
+
 # --- Accès support avec consentement (grant) ---
 class SupportAccessGrant(models.Model):
     SCOPE = [("TICKETS", "Tickets"), ("BILLING", "Facturation"), ("ALL", "Tout")]
@@ -1,19 +1,37 @@
 # core/pdf.py
+"""
+Rendu PDF (xhtml2pdf) et contexte des templates pdf/*.html.
+
+Les URI d'assets statiques sont résolues une fois par processus
+(resolve_static, mémoïsée) ; warm_up() (processus du pool de rendu) charge
+imports et métriques des polices avant la première demande.
+"""
+
 import os
 from decimal import Decimal
+from functools import lru_cache
 from io import BytesIO
 
 from django.conf import settings
 from django.contrib.staticfiles import finders
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.template.loader import render_to_string
 from xhtml2pdf import pisa
 
+from .totals import batch_totals, cents_to_decimal, item_line
+
 Q2 = Decimal("0.01")
 
+# mémoïsation désactivable (bench_pdf : mesure avant / après)
+ASSET_CACHE = True
 
-def link_callback(uri, rel):
+
+@lru_cache(maxsize=256)
+def resolve_static(uri):
     """
-    Résout une URI statique en chemin local pour xhtml2pdf.
+    Résout une URI statique en chemin local (mémoïsé par processus) ;
+    URI renvoyée telle quelle si ce n'est pas un fichier statique trouvé.
     """
     static_url = settings.STATIC_URL or "static/"
     if not static_url.endswith("/"):
@@ -43,12 +61,26 @@ def link_callback(uri, rel):
     return uri
 
 
-def render_pdf_from_template(template_name: str, context: dict) -> bytes:
+@receiver(setting_changed)
+def _static_settings_changed(setting, **kwargs):
+    if setting.startswith("STATIC"):
+        resolve_static.cache_clear()
+
+
+def link_callback(uri, rel):
+    """
+    Résout une URI statique en chemin local pour xhtml2pdf.
+    """
+    if not ASSET_CACHE:
+        return resolve_static.__wrapped__(uri)
+    return resolve_static(uri)
+
+
+def html_to_pdf(html: str) -> bytes:
     """
-    Rend un template en HTML puis convertit en PDF (bytes) en utilisant xhtml2pdf.
+    Convertit du HTML en PDF (bytes) avec xhtml2pdf.
     Passe link_callback pour résoudre correctement les assets statiques.
     """
-    html = render_to_string(template_name, context)
     result = BytesIO()
     pisa_status = pisa.CreatePDF(
         html, dest=result, encoding="utf-8", link_callback=link_callback
@@ -59,3 +91,64 @@ def render_pdf_from_template(template_name: str, context: dict) -> bytes:
         raise RuntimeError("Erreur lors de la génération PDF (xhtml2pdf).")
 
     return result.getvalue()
+
+
+def warm_up(template_name="pdf/invoice.html"):
+    """Premier rendu à vide (imports, polices, assets)."""
+    try:
+        html_to_pdf(render_to_string(template_name, {}))
+    except Exception:
+        pass  # simple préchauffage : le vrai rendu signalera l'erreur
+
+
+def render_pdf_from_template(
+    template_name: str, context: dict, use_cache: bool = False
+) -> bytes:
+    """
+    Rend un template en HTML puis convertit en PDF (bytes), dans le processus
+    courant. Depuis une vue, passer par core.pdf_service.render_pdf.
+    use_cache : PDF repris du cache adressé par contenu (core.pdf_cache) si ce
+    HTML a déjà été converti.
+    """
+    html = render_to_string(template_name, context)
+    if not use_cache:
+        return html_to_pdf(html)
+    from .pdf_cache import cached_render
+
+    return cached_render(template_name, html, html_to_pdf)
+
+
+def invoice_pdf_context(inv):
+    """
+    Contexte du template pdf/invoice.html : lignes, totaux HT/TVA/TTC, client.
+    Montants calculés par le noyau en centimes (arrondi par ligne).
+    `inv` doit avoir customer/company chargés et ses lignes préchargées.
+    """
+    items = list(inv.items.all())
+    per_line, documents = batch_totals((inv.pk, *item_line(it)) for it in items)
+    lines = []
+    for it, lt in zip(items, per_line):
+        lines.append(
+            {
+                "description": it.description,
+                "quantity": Decimal(it.quantity),
+                "unit_ht": cents_to_decimal(it.unit_price_cents),
+                "base_ht": cents_to_decimal(lt.base),
+                "discount_pct": float(it.discount_pct or 0),
+                "discount_amt": cents_to_decimal(lt.discount),
+                "line_ht": cents_to_decimal(lt.ht),
+                "vat_rate": float(it.vat_rate or 0),
+                "vat_amt": cents_to_decimal(lt.vat),
+                "total_ht": cents_to_decimal(lt.ht),
+            }
+        )
+    doc = documents.get(inv.pk)
+    return {
+        "invoice": inv,
+        "company": inv.company,
+        "customer": inv.customer,
+        "lines": lines,
+        "subtotal": cents_to_decimal(doc.subtotal if doc else 0),
+        "vat_total": cents_to_decimal(doc.tax if doc else 0),
+        "total_ttc": cents_to_decimal(doc.total if doc else 0),
+    }
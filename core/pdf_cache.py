@@ -0,0 +1,196 @@
+# core/pdf_cache.py
+"""
+Cache disque des PDF, adressé par contenu (MEDIA_ROOT/pdf_cache).
+
+La clé est le SHA-256 du HTML rendu, du nom et de la version (mtime) du
+template, de la version des assets statiques référencés par le HTML (CSS,
+images : chemin, taille, mtime) et de celle de xhtml2pdf : un même HTML donne
+le même PDF, seul un cache manquant passe par pisa.CreatePDF. Aucune
+invalidation n'est nécessaire (un document modifié donne un autre HTML).
+
+Taille bornée (PDF_CACHE_MAX_BYTES, 0 = cache désactivé) : au-delà, les
+fichiers les moins récemment utilisés sont supprimés (un hit rafraîchit la
+date de modification du fichier). Compteurs hits / misses / evictions dans le
+cache Django.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import xhtml2pdf
+from django.conf import settings
+from django.core.cache import cache
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+
+from .pdf import link_callback
+
+# à incrémenter pour invalider tout le cache (ex. changement de rendu)
+PDF_CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+EVICT_TARGET = 0.8  # après éviction : 80 % du plafond
+
+SIZE_KEY = "pdf:cache:bytes"
+STATS_KEY = "pdf:cache:{}"
+STATS_FIELDS = ("hits", "misses", "evictions")
+
+_ASSET_RE = re.compile(r"""(?:href|src)\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+
+def cache_dir():
+    return Path(settings.MEDIA_ROOT) / "pdf_cache"
+
+
+def max_bytes():
+    return getattr(settings, "PDF_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+
+
+def _count(field, delta=1):
+    key = STATS_KEY.format(field)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def cache_stats():
+    values = cache.get_many([STATS_KEY.format(f) for f in STATS_FIELDS])
+    return {f"cache_{f}": values.get(STATS_KEY.format(f), 0) for f in STATS_FIELDS}
+
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _template_version(template_name):
+    try:
+        origin = get_template(template_name).origin.name
+    except (TemplateDoesNotExist, AttributeError):
+        return "-"
+    return _file_version(origin)
+
+
+def _assets_version(html):
+    parts = []
+    for uri in sorted(set(_ASSET_RE.findall(html))):
+        path = link_callback(uri, None)
+        if path != uri:  # asset statique résolu en fichier local
+            parts.append(f"{uri}={_file_version(path)}")
+    return "|".join(parts)
+
+
+def pdf_cache_key(template_name, html):
+    digest = hashlib.sha256()
+    for part in (
+        f"v{PDF_CACHE_VERSION}",
+        xhtml2pdf.__version__,
+        template_name,
+        _template_version(template_name),
+        _assets_version(html),
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(html.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _path(key):
+    return cache_dir() / key[:2] / f"{key}.pdf"
+
+
+def get_cached_pdf(key):
+    """Octets du PDF en cache pour `key`, ou None (compté en hit / miss)."""
+    path = _path(key)
+    try:
+        pdf = path.read_bytes()
+    except OSError:
+        _count("misses")
+        return None
+    try:
+        os.utime(path)  # récemment utilisé (LRU)
+    except OSError:
+        pass
+    _count("hits")
+    return pdf
+
+
+def store_pdf(key, pdf):
+    """Enregistre le PDF (écriture atomique) puis applique le plafond de taille."""
+    path = _path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(pdf)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    try:
+        total = cache.incr(SIZE_KEY, len(pdf))
+    except ValueError:
+        total = None  # taille inconnue (cache vidé) : recalculée par evict
+    if total is None or total > max_bytes():
+        evict()
+
+
+def evict(limit=None):
+    """
+    Supprime les PDF les moins récemment utilisés jusqu'à EVICT_TARGET du
+    plafond si celui-ci est dépassé ; renvoie le nombre de fichiers supprimés.
+    """
+    limit = max_bytes() if limit is None else limit
+    files = []
+    root = cache_dir()
+    if root.is_dir():
+        for sub in os.scandir(root):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".pdf"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    if total > limit:
+        target = limit * EVICT_TARGET
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            _count("evictions", removed)
+    cache.set(SIZE_KEY, total, None)
+    return removed
+
+
+def cached_render(template_name, html, convert):
+    """
+    PDF de `html` depuis le cache, ou convert(html) puis mise en cache.
+    Cache désactivé (PDF_CACHE_MAX_BYTES = 0) : convert(html).
+    """
+    if not max_bytes():
+        return convert(html)
+    key = pdf_cache_key(template_name, html)
+    pdf = get_cached_pdf(key)
+    if pdf is None:
+        pdf = convert(html)
+        try:
+            store_pdf(key, pdf)
+        except OSError:
+            pass  # disque plein / lecture seule : le PDF est servi quand même
+    return pdf
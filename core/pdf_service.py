@@ -0,0 +1,316 @@
+# core/pdf_service.py
+"""
+Service de rendu PDF des vues (factures, devis, récapitulatif URSSAF).
+
+xhtml2pdf est lent et garde le GIL : exécuté dans la vue, il bloque le worker
+web pendant tout le rendu. Ici le template est rendu en HTML dans la vue
+(accès base, contexte), puis la conversion HTML -> PDF part dans un pool de
+processus borné (PDF_RENDER_WORKERS), avec :
+- une limite globale de rendus en cours ou en attente (PDF_RENDER_QUEUE_LIMIT),
+  places partagées dans le cache (Redis, une clé à TTL par place) par tous
+  les processus web : un worker gunicorn synchrone n'a qu'un rendu à la fois,
+  une limite par processus ne serait jamais atteinte. Au-delà, PdfServiceBusy (la vue
+  répond 503 + Retry-After) plutôt que d'empiler les requêtes ;
+- un délai max par rendu (PDF_RENDER_TIMEOUT) : PdfRenderTimeout ;
+- des mesures par rendu (attente, conversion, taille) : journal "core.pdf"
+  et compteurs cumulés dans le cache (pdf_stats, commande pdf_stats) ;
+- en option (use_cache), le cache disque adressé par contenu core.pdf_cache :
+  un HTML déjà converti ne repasse pas par le pool.
+
+PDF_RENDER_WORKERS = 0 : conversion dans le processus courant (dev, tests),
+toujours bornée et mesurée.
+
+Lots (export ZIP, worker RQ) : convert_many, pool dédié de
+PDF_BUNDLE_WORKERS processus, résultats dans l'ordre, fenêtre bornée.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .pdf import html_to_pdf, warm_up
+from .pdf_cache import cache_stats, cached_render
+
+logger = logging.getLogger("core.pdf")
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_LIMIT = 8
+DEFAULT_TIMEOUT = 30  # secondes
+DEFAULT_RETRY_AFTER = 5  # secondes
+DEFAULT_BUNDLE_WORKERS = min(4, os.cpu_count() or 1)
+
+STATS_KEY = "pdf:stats:{}"
+INFLIGHT_KEY = "pdf:inflight"
+STATS_FIELDS = ("renders", "errors", "rejected", "timeouts", "render_ms", "wait_ms")
+
+
+class PdfServiceUnavailable(Exception):
+    """Rendu refusé ou abandonné : réessayer dans `retry_after` secondes."""
+
+    def __init__(self, message, retry_after=DEFAULT_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PdfServiceBusy(PdfServiceUnavailable):
+    pass
+
+
+class PdfRenderTimeout(PdfServiceUnavailable):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+_lock = threading.Lock()
+_state = {"pool": None, "workers": None}
+
+
+def _init_worker():
+    # processus démarré sans fork (spawn/forkserver) : Django à initialiser
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    warm_up()  # la première vraie demande ne paie pas le démarrage à froid
+
+
+def _timed_html_to_pdf(html):
+    # exécuté dans un processus du pool
+    start = time.perf_counter()
+    pdf = html_to_pdf(html)
+    return pdf, time.perf_counter() - start
+
+
+def _get_pool(workers):
+    with _lock:
+        if _state["pool"] is None or _state["workers"] != workers:
+            if _state["pool"] is not None:
+                _state["pool"].shutdown(wait=False)
+            _state["pool"] = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            )
+            _state["workers"] = workers
+        return _state["pool"]
+
+
+def _reset_pool(pool):
+    # pool cassé (processus tué, ex. OOM) : recréé au prochain rendu
+    with _lock:
+        if _state["pool"] is pool:
+            _state["pool"] = None
+    pool.shutdown(wait=False)
+
+
+def shutdown_pool(wait=True):
+    """Arrête le pool (recréé au prochain rendu)."""
+    with _lock:
+        pool, _state["pool"] = _state["pool"], None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+def _slot_ttl():
+    # place perdue (processus tué en plein rendu) : expire seule après ce délai
+    return 4 * _setting("PDF_RENDER_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def _slot_keys(limit):
+    return [f"{INFLIGHT_KEY}:{i}" for i in range(limit)]
+
+
+def inflight(limit=None):
+    """Rendus en cours ou en attente, tous processus web confondus."""
+    if limit is None:
+        limit = _setting("PDF_RENDER_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)
+    return len(cache.get_many(_slot_keys(limit)))
+
+
+def _acquire_slot(limit):
+    """
+    Prend une des `limit` places (une clé par place, add atomique) ; renvoie
+    (clé, jeton) ou None si toutes sont prises. Chaque place a son propre
+    TTL : une place jamais rendue expire seule, quel que soit le trafic.
+    """
+    keys = _slot_keys(limit)
+    start = random.randrange(limit) if limit else 0
+    token = uuid.uuid4().hex
+    for key in keys[start:] + keys[:start]:
+        if cache.add(key, token, _slot_ttl()):
+            return key, token
+    return None
+
+
+def _release_slot(slot, _future=None):
+    key, token = slot
+    # place expirée puis reprise par un autre rendu : ne pas la lui retirer
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def _count(**deltas):
+    for field, delta in deltas.items():
+        key = STATS_KEY.format(field)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, None):
+                cache.incr(key, delta)
+
+
+def pdf_stats():
+    """Compteurs cumulés du service ({champ: valeur}) + moyennes en ms."""
+    values = cache.get_many([STATS_KEY.format(f) for f in STATS_FIELDS])
+    stats = {f: values.get(STATS_KEY.format(f), 0) for f in STATS_FIELDS}
+    renders = stats["renders"] or 1
+    stats["avg_render_ms"] = round(stats["render_ms"] / renders, 1)
+    stats["avg_wait_ms"] = round(stats["wait_ms"] / renders, 1)
+    stats.update(cache_stats())
+    return stats
+
+
+def _submit(workers, html):
+    pool = _get_pool(workers)
+    try:
+        return pool, pool.submit(_timed_html_to_pdf, html)
+    except (BrokenProcessPool, RuntimeError):
+        _reset_pool(pool)
+        pool = _get_pool(workers)
+        return pool, pool.submit(_timed_html_to_pdf, html)
+
+
+def _convert(html, workers, timeout, retry_after, slot):
+    if not workers:
+        try:
+            start = time.perf_counter()
+            pdf = html_to_pdf(html)
+            return pdf, time.perf_counter() - start
+        finally:
+            _release_slot(slot)
+    try:
+        pool, future = _submit(workers, html)
+    except Exception:
+        _release_slot(slot)
+        raise
+    # place libérée à la fin réelle du rendu (même abandonné par la vue)
+    future.add_done_callback(partial(_release_slot, slot))
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()  # encore en attente : retiré de la file
+        raise PdfRenderTimeout(
+            f"rendu PDF non terminé après {timeout} s", retry_after
+        ) from None
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise PdfServiceUnavailable("pool de rendu PDF indisponible", retry_after)
+
+
+def render_pdf(template_name, context, timeout=None, use_cache=False):
+    """
+    Rend `template_name` en PDF (bytes) via le pool de rendu.
+    Lève PdfServiceBusy si la file est pleine, PdfRenderTimeout au-delà du
+    délai ; RuntimeError si xhtml2pdf échoue.
+    - use_cache : PDF servi depuis le cache adressé par contenu
+      (core.pdf_cache) si le même HTML a déjà été converti
+    """
+    workers = _setting("PDF_RENDER_WORKERS", DEFAULT_WORKERS)
+    limit = _setting("PDF_RENDER_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)
+    timeout = timeout or _setting("PDF_RENDER_TIMEOUT", DEFAULT_TIMEOUT)
+    retry_after = _setting("PDF_RENDER_RETRY_AFTER", DEFAULT_RETRY_AFTER)
+    timings = {"render": 0.0, "wait": 0.0}
+
+    def convert(html):
+        # seul un cache manquant occupe une place du pool
+        slot = _acquire_slot(limit)
+        if slot is None:
+            _count(rejected=1)
+            logger.warning(
+                "pdf: rejected %s (queue full, limit %s)", template_name, limit
+            )
+            raise PdfServiceBusy("file de rendu PDF pleine", retry_after)
+        start = time.perf_counter()
+        try:
+            pdf, timings["render"] = _convert(html, workers, timeout, retry_after, slot)
+        except PdfRenderTimeout:
+            _count(timeouts=1)
+            raise
+        except Exception:
+            _count(errors=1)
+            raise
+        timings["wait"] = time.perf_counter() - start - timings["render"]
+        _count(
+            renders=1,
+            render_ms=round(timings["render"] * 1000),
+            wait_ms=round(timings["wait"] * 1000),
+        )
+        return pdf
+
+    start = time.perf_counter()
+    html = render_to_string(template_name, context)
+    html_s = time.perf_counter() - start
+    pdf = cached_render(template_name, html, convert) if use_cache else convert(html)
+    logger.info(
+        "pdf: rendered %s html=%.0fms wait=%.0fms render=%.0fms size=%s%s",
+        template_name,
+        html_s * 1000,
+        timings["wait"] * 1000,
+        timings["render"] * 1000,
+        len(pdf),
+        "" if timings["render"] else " (cached)",
+    )
+    return pdf
+
+
+def convert_many(items, workers=None, window=None, timeout=None):
+    """
+    Convertit un flux de (meta, html) en (meta, PDF), dans l'ordre d'entrée,
+    sur `workers` processus (PDF_BUNDLE_WORKERS). Au plus `window` conversions
+    en cours ou terminées non lues (défaut 2 x workers) : la mémoire reste
+    bornée quel que soit le nombre de documents, `items` est lu au fil de
+    l'eau. Un `html` de type bytes est un PDF déjà prêt, rendu tel quel.
+    """
+    workers = workers or _setting("PDF_BUNDLE_WORKERS", DEFAULT_BUNDLE_WORKERS)
+    timeout = timeout or _setting("PDF_RENDER_TIMEOUT", DEFAULT_TIMEOUT)
+    if workers <= 1:
+        for meta, payload in items:
+            if not isinstance(payload, bytes):
+                payload, render_s = _timed_html_to_pdf(payload)
+                _count(renders=1, render_ms=round(render_s * 1000))
+            yield meta, payload
+        return
+    window = window or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for meta, payload in items:
+            if not isinstance(payload, bytes):
+                payload = pool.submit(_timed_html_to_pdf, payload)
+            pending.append((meta, payload))
+            if len(pending) >= window:
+                yield _pop_result(pending, timeout)
+        while pending:
+            yield _pop_result(pending, timeout)
+
+
+def _pop_result(pending, timeout):
+    meta, payload = pending.popleft()
+    if isinstance(payload, bytes):
+        return meta, payload
+    pdf, render_s = payload.result(timeout=timeout)
+    _count(renders=1, render_ms=round(render_s * 1000))
+    return meta, pdf
@@ -0,0 +1,77 @@
+# core/pdf_store.py
+"""
+PDF enregistrés des factures émises et des devis envoyés (champs `pdf`).
+
+Rendu une seule fois, à la première demande, puis servi tel quel : le nom du
+fichier contient l'empreinte (SHA-256 tronqué) du PDF, qui sert d'ETag et de
+version d'URL (?v=...). Toute modification du document ou de ses lignes
+efface le fichier enregistré (portal.signals) : le prochain téléchargement le
+régénère, sous un autre nom. L'enregistrement est conditionné à updated_at :
+un rendu fait avant une modification n'est jamais conservé.
+"""
+
+import hashlib
+import re
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+
+from .models import Invoice, Quote
+
+# statuts dont le PDF est figé et enregistré (les brouillons sont rendus à la volée)
+PERSISTED_STATUSES = {
+    Invoice: ("ISSUED", "PAID", "OVERDUE"),
+    Quote: ("SENT", "ACCEPTED", "DECLINED", "EXPIRED"),
+}
+
+_DIGEST_RE = re.compile(r"-([0-9a-f]{16})(?:_[A-Za-z0-9]+)?\.pdf$")
+
+
+def is_persisted(doc):
+    return doc.status in PERSISTED_STATUSES.get(type(doc), ())
+
+
+def pdf_version(name):
+    """Empreinte du PDF enregistré `name` (ETag, ?v=), ou "" si inconnue."""
+    m = _DIGEST_RE.search(name or "")
+    return m.group(1) if m else ""
+
+
+def _safe(value):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", value or "") or "doc"
+
+
+def store_document_pdf(doc, pdf):
+    """
+    Enregistre `pdf` dans doc.pdf (sans signal : update) ; renvoie le nom.
+    Enregistrement conditionnel : seulement si le document n'a pas changé
+    depuis sa lecture (updated_at) et qu'aucun autre rendu n'a été enregistré
+    entre-temps. Sinon le fichier écrit est supprimé et None est renvoyé (le
+    PDF, rendu d'un état périmé ou en double, est servi sans être conservé).
+    """
+    previous = doc.pdf.name or ""
+    digest = hashlib.sha256(pdf).hexdigest()[:16]
+    name = f"{doc.company_id}/{_safe(doc.number)}-{digest}.pdf"
+    doc.pdf.save(name, ContentFile(pdf), save=False)
+    # pas de PDF enregistré : "" ou NULL (lignes antérieures au champ)
+    unchanged = Q(pdf=previous) if previous else Q(pdf="") | Q(pdf__isnull=True)
+    stored = (
+        type(doc)
+        .objects.filter(unchanged, pk=doc.pk, updated_at=doc.updated_at)
+        .update(pdf=doc.pdf.name)
+    )
+    if not stored:
+        doc.pdf.storage.delete(doc.pdf.name)
+        doc.pdf.name = previous or None
+        return None
+    return doc.pdf.name
+
+
+def clear_document_pdf(model, pk):
+    """Efface le PDF enregistré du document (fichier et champ), s'il y en a un."""
+    name = model.objects.filter(pk=pk).values_list("pdf", flat=True).first()
+    if not name:
+        return False
+    model.objects.filter(pk=pk).update(pdf="")
+    model._meta.get_field("pdf").storage.delete(name)
+    return True
@@ -0,0 +1,223 @@
+# core/revenue.py
+"""
+Agrégat mensuel de CA (CompanyMonthlyRevenue) : mise à jour incrémentale,
+reconstruction et lecture de périodes ; ventilation HT/TVA par taux.
+"""
+
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import CompanyMonthlyRevenue, Invoice
+from .totals import line_totals, to_bp, to_hundredths
+
+SUM_FIELDS = ("subtotal_cents", "tax_cents", "total_cents")
+
+
+def month_start(d):
+    return d.replace(day=1)
+
+
+def month_end(d):
+    nxt = date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+    return nxt - timedelta(days=1)
+
+
+def _aggregates():
+    aggs = {f: Sum(f) for f in SUM_FIELDS}
+    aggs["invoice_count"] = Count("id")
+    return aggs
+
+
+def refresh_monthly_revenue(company_id, year, month):
+    """
+    Recalcule les lignes d'agrégat d'un (company, mois) : une requête GROUP BY
+    statut sur l'index (company, issue_date), puis upsert/suppression.
+    """
+    first = date(year, month, 1)
+    rows = {
+        r["status"]: r
+        for r in Invoice.objects.filter(
+            company_id=company_id,
+            issue_date__gte=first,
+            issue_date__lte=month_end(first),
+        )
+        .values("status")
+        .annotate(**_aggregates())
+        .order_by()
+    }
+    with transaction.atomic():
+        CompanyMonthlyRevenue.objects.filter(
+            company_id=company_id, year=year, month=month
+        ).exclude(status__in=list(rows)).delete()
+        for status, r in rows.items():
+            CompanyMonthlyRevenue.objects.update_or_create(
+                company_id=company_id,
+                year=year,
+                month=month,
+                status=status,
+                defaults={
+                    "subtotal_cents": r["subtotal_cents"] or 0,
+                    "tax_cents": r["tax_cents"] or 0,
+                    "total_cents": r["total_cents"] or 0,
+                    "invoice_count": r["invoice_count"],
+                },
+            )
+
+
+def refresh_monthly_revenue_for_invoice(invoice_id):
+    """
+    Rafraîchit le mois de la facture (ex. après modification de ses lignes).
+    Renvoie le company_id de la facture (None si elle n'existe plus).
+    """
+    row = (
+        Invoice.objects.filter(pk=invoice_id)
+        .values_list("company_id", "issue_date")
+        .first()
+    )
+    if not row:
+        return None
+    if row[1]:
+        refresh_monthly_revenue(row[0], row[1].year, row[1].month)
+    return row[0]
+
+
+def rebuild_monthly_revenue(company_id=None):
+    """
+    Reconstruit l'agrégat (backfill) en une requête GROUP BY company/année/mois/statut.
+    Renvoie le nombre de lignes écrites.
+    """
+    qs = Invoice.objects.all()
+    target = CompanyMonthlyRevenue.objects.all()
+    if company_id is not None:
+        qs = qs.filter(company_id=company_id)
+        target = target.filter(company_id=company_id)
+    rows = (
+        qs.annotate(y=ExtractYear("issue_date"), m=ExtractMonth("issue_date"))
+        .values("company_id", "y", "m", "status")
+        .annotate(**_aggregates())
+        .order_by()
+    )
+    objs = [
+        CompanyMonthlyRevenue(
+            company_id=r["company_id"],
+            year=r["y"],
+            month=r["m"],
+            status=r["status"],
+            subtotal_cents=r["subtotal_cents"] or 0,
+            tax_cents=r["tax_cents"] or 0,
+            total_cents=r["total_cents"] or 0,
+            invoice_count=r["invoice_count"],
+        )
+        for r in rows.iterator(chunk_size=2000)
+    ]
+    with transaction.atomic():
+        target.delete()
+        CompanyMonthlyRevenue.objects.bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def _month_range_q(first, last):
+    """Q() sélectionnant les lignes d'agrégat entre deux mois inclus."""
+    return (Q(year__gt=first.year) | Q(year=first.year, month__gte=first.month)) & (
+        Q(year__lt=last.year) | Q(year=last.year, month__lte=last.month)
+    )
+
+
+def monthly_totals(company, first, last, statuses=None, field="total_cents"):
+    """
+    {(année, mois): centimes} lus dans l'agrégat, mois `first` à `last` inclus.
+    """
+    qs = CompanyMonthlyRevenue.objects.filter(
+        _month_range_q(first, last), company=company
+    )
+    if statuses is not None:
+        qs = qs.filter(status__in=statuses)
+    return {
+        (r["year"], r["month"]): r["total"]
+        for r in qs.values("year", "month").annotate(total=Sum(field)).order_by()
+    }
+
+
+def period_total_cents(company, start, end, statuses=None, field="total_cents"):
+    """
+    Total (centimes) des factures émises entre `start` et `end` inclus.
+    Les mois complets sont lus dans l'agrégat ; les mois partiels en bordure
+    sont agrégés directement sur Invoice (une requête au plus).
+    """
+    if start > end:
+        return 0
+    full_first = start if start.day == 1 else month_end(start) + timedelta(days=1)
+    full_last = end if end == month_end(end) else month_start(end) - timedelta(days=1)
+
+    total = 0
+    edges = Q(issue_date__gte=start, issue_date__lte=end)
+    if full_first <= full_last:
+        total += sum(
+            monthly_totals(
+                company, full_first, full_last, statuses=statuses, field=field
+            ).values()
+        )
+        edges = Q(issue_date__gte=start, issue_date__lt=full_first) | Q(
+            issue_date__gt=full_last, issue_date__lte=end
+        )
+    if full_first != start or full_last != end or full_first > full_last:
+        qs = Invoice.objects.filter(edges, company=company)
+        if statuses is not None:
+            qs = qs.filter(status__in=statuses)
+        total += qs.aggregate(t=Sum(field))["t"] or 0
+    return total
+
+
+class PeriodRevenue:
+    """
+    CA d'une company entre deux dates (period_total_cents : agrégat mensuel +
+    mois partiels en bordure), mémoïsé par (début, fin, statuts).
+    Une instance par requête HTTP (portal.services.request_revenue) : les
+    calculs qui relisent la même période (CA cumulé, période URSSAF, seuils)
+    ne refont pas la requête.
+    """
+
+    def __init__(self, company):
+        self.company = company
+        self._memo = {}
+
+    def cents(self, start, end, statuses=None, field="total_cents"):
+        key = (start, end, tuple(statuses) if statuses else None, field)
+        if key not in self._memo:
+            self._memo[key] = period_total_cents(
+                self.company, start, end, statuses=statuses, field=field
+            )
+        return self._memo[key]
+
+
+def vat_by_rate(items):
+    """
+    {taux (points de base): [HT, TVA] en centimes} des lignes `items`
+    (queryset d'InvoiceItem, filtré sur la facture par jointure).
+
+    Une seule requête GROUP BY sur la forme des lignes (taux, quantité, prix,
+    remise) avec COUNT : chaque forme est arrondie une fois par le noyau
+    core.totals puis multipliée par son nombre d'occurrences, ce qui donne
+    exactement la somme des lignes arrondies une à une.
+    """
+    shapes = (
+        items.values("vat_rate", "quantity", "unit_price_cents", "discount_pct")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    rates = {}
+    for shape in shapes:
+        bp = to_bp(shape["vat_rate"])
+        lt = line_totals(
+            shape["unit_price_cents"],
+            to_hundredths(shape["quantity"]),
+            to_bp(shape["discount_pct"]),
+            bp,
+        )
+        acc = rates.setdefault(bp, [0, 0])
+        acc[0] += lt.ht * shape["n"]
+        acc[1] += lt.vat * shape["n"]
+    return dict(sorted(rates.items()))
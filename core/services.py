@@ -1,9 +1,9 @@
-from decimal import ROUND_HALF_UP, Decimal
-
 from django.db.models import Max
 from django.utils import timezone
 
 from .models import Invoice, Quote, Ticket, TicketEvent
+from .revenue import refresh_monthly_revenue
+from .totals import batch_sums, document_totals
 
 
 def log_event(ticket: Ticket, type_: str, message: str, actor=None):
@@ -69,24 +69,104 @@ def next_invoice_number(company):
 def compute_totals(items):
     """
     items: iterable d'objets avec quantity, unit_price_cents, vat_rate, discount_pct
-    Renvoie (subtotal_cents, tax_cents, total_cents)
+    Renvoie (subtotal_cents, tax_cents, total_cents) — voir core.totals.
+    """
+    return tuple(document_totals(items))
+
+
+# --- Totaux dénormalisés (Invoice/Quote.subtotal_cents, tax_cents, total_cents) ---
+def _item_model(document_model):
+    return document_model._meta.get_field("items").related_model
+
+
+def refresh_document_totals(document_model, pk, instance=None):
     """
-    subtotal = Decimal("0")
-    tax = Decimal("0")
-    for it in items:
-        q = Decimal(it.quantity)
-        unit = Decimal(it.unit_price_cents) / 100
-        disc = Decimal(it.discount_pct or 0) / 100
-        line_ht = q * unit * (Decimal("1") - disc)
-        line_tax = line_ht * Decimal(it.vat_rate or 0) / 100
-        subtotal += line_ht
-        tax += line_tax
-    subtotal_c = int((subtotal * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
-    tax_c = int((tax * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
-    total_c = subtotal_c + tax_c
+    Recalcule et persiste les totaux d'un devis/facture à partir de ses lignes.
+    Appelé au commit après ajout/modification/suppression de lignes (signaux).
+    Si `instance` est fourni (objet déjà en mémoire), ses attributs sont mis à jour.
+    """
+    item_model = _item_model(document_model)
+    fk_name = document_model._meta.get_field("items").field.name
+    items = item_model.objects.filter(**{f"{fk_name}_id": pk}).only(
+        "quantity", "unit_price_cents", "vat_rate", "discount_pct"
+    )
+    subtotal_c, tax_c, total_c = compute_totals(items)
+    # updated_at : lignes modifiées = document modifié (PDF enregistré périmé)
+    updated_at = timezone.now()
+    document_model.objects.filter(pk=pk).update(
+        subtotal_cents=subtotal_c,
+        tax_cents=tax_c,
+        total_cents=total_c,
+        updated_at=updated_at,
+    )
+    if instance is not None:
+        instance.subtotal_cents = subtotal_c
+        instance.tax_cents = tax_c
+        instance.total_cents = total_c
+        instance.updated_at = updated_at
     return subtotal_c, tax_c, total_c
 
 
+def rebuild_document_totals(queryset, batch_size=500, dry_run=False):
+    """
+    Recalcule les totaux d'un queryset de devis/factures par lots (keyset sur pk).
+    Utilisable après un import en masse (bulk_create ne déclenche pas les signaux) :
+    les documents corrigés ont leur updated_at mis à jour et, pour les factures,
+    les mois d'agrégat concernés (CompanyMonthlyRevenue) sont rafraîchis.
+    Renvoie (nb contrôlés, liste des pk incohérents, company_id corrigées) ;
+    l'invalidation des caches dashboard revient à l'appelant (portal).
+    """
+    model = queryset.model
+    fields = list(model.TOTALS_FIELDS)
+    is_invoice = model is Invoice
+    item_model = _item_model(model)
+    fk_id = model._meta.get_field("items").field.attname
+    checked = 0
+    mismatched = []
+    companies = set()
+    months = set()
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "company_id", "issue_date", *fields)[:batch_size]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        # lignes brutes du lot -> sommes par document (vectorisées si lot volumineux)
+        sums = batch_sums(
+            item_model.objects.filter(
+                **{f"{fk_id}__in": [doc.pk for doc in batch]}
+            ).values_list(
+                fk_id, "quantity", "unit_price_cents", "discount_pct", "vat_rate"
+            )
+        )
+        stale = []
+        for doc in batch:
+            s = sums.get(doc.pk)
+            expected = (s.ht, s.vat, s.ttc) if s else (0, 0, 0)
+            if expected != tuple(getattr(doc, f) for f in fields):
+                doc.subtotal_cents, doc.tax_cents, doc.total_cents = expected
+                stale.append(doc)
+        checked += len(batch)
+        mismatched.extend(doc.pk for doc in stale)
+        if stale and not dry_run:
+            now = timezone.now()
+            for doc in stale:
+                doc.updated_at = now  # PDF enregistré périmé (core.pdf_store)
+                companies.add(doc.company_id)
+                if is_invoice and doc.issue_date:
+                    months.add(
+                        (doc.company_id, doc.issue_date.year, doc.issue_date.month)
+                    )
+            model.objects.bulk_update(stale, [*fields, "updated_at"])
+    for month in sorted(months):
+        refresh_monthly_revenue(*month)
+    return checked, mismatched, companies
+
+
 # --- Gating par plan d'abonnement (simple, via Subscription.plan) ---
 FEATURES_BY_PLAN = {
     "BASIC": {"tickets": True, "quotes": True, "invoices": False},
@@ -0,0 +1,95 @@
+# core/singleflight.py
+"""
+Single-flight sur le cache : quand une clé coûteuse manque, un seul worker la
+recalcule (verrou Redis via django_redis) pendant que les autres attendent
+brièvement qu'elle réapparaisse, ou reçoivent tout de suite une valeur périmée.
+"""
+
+import time
+import uuid
+
+from django.core.cache import cache
+
+_MISSING = object()
+
+
+class _AddLock:
+    """Verrou de repli (backends sans .lock(), ex. LocMemCache en dev) basé sur cache.add."""
+
+    def __init__(self, key, timeout):
+        self.key = key
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+
+    def acquire(self, blocking=False):
+        return cache.add(self.key, self.token, self.timeout)
+
+    def release(self):
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+def _lock(key, timeout):
+    if hasattr(cache, "lock"):
+        # django_redis : redis-py Lock (SET NX PX + release atomique par token)
+        return cache.lock(key, timeout=timeout, thread_local=False)
+    return _AddLock(key, timeout)
+
+
+def single_flight(
+    key,
+    compute,
+    timeout,
+    *,
+    fresh=None,
+    stale=_MISSING,
+    lock_timeout=30,
+    wait_timeout=5.0,
+    poll_interval=0.05,
+):
+    """
+    Renvoie la valeur en cache de `key`, ou la calcule via `compute()` en
+    garantissant qu'un seul appelant à la fois exécute le calcul.
+
+    - timeout : TTL de la valeur mise en cache
+    - fresh : prédicat appliqué à la valeur en cache (défaut : toute valeur présente)
+    - stale : valeur servie immédiatement aux appelants qui n'ont pas le verrou
+    - lock_timeout : durée de vie du verrou (libère un leader mort/bloqué)
+    - wait_timeout : attente max d'un non-leader ; au-delà il calcule lui-même
+      plutôt que d'échouer (disponibilité > économie)
+    """
+
+    def _cached():
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING and (fresh is None or fresh(value)):
+            return value
+        return _MISSING
+
+    value = _cached()
+    if value is not _MISSING:
+        return value
+
+    lock = _lock(f"sf:{key}", lock_timeout)
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        if lock.acquire(blocking=False):
+            try:
+                # double vérification : le leader précédent vient peut-être de finir
+                value = _cached()
+                if value is _MISSING:
+                    value = compute()
+                    cache.set(key, value, timeout)
+                return value
+            finally:
+                try:
+                    lock.release()
+                except Exception:
+                    pass  # verrou expiré entre-temps (lock_timeout trop court)
+        if stale is not _MISSING:
+            return stale
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(poll_interval)
+        value = _cached()
+        if value is not _MISSING:
+            return value
@@ -0,0 +1,182 @@
+# core/totals.py
+"""
+Noyau de calcul des totaux HT/TVA/TTC, en entiers uniquement :
+- montants en centimes
+- quantité en centièmes (1,5 -> 150)
+- remise et TVA en points de base (20 % -> 2000)
+
+Règle d'arrondi unique (demi vers le haut, à chaque ligne, comme sur le PDF) :
+    base     = arrondi(prix unitaire × quantité)
+    remise   = arrondi(base × remise)
+    HT       = base − remise
+    TVA      = arrondi(HT × taux)
+Les totaux d'un document sont la somme de ses lignes arrondies.
+"""
+
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+try:
+    import numpy as np
+except ImportError:  # dépendance optionnelle : repli sur le calcul scalaire
+    np = None
+
+LineTotals = namedtuple("LineTotals", "base discount ht vat ttc")
+Totals = namedtuple("Totals", "subtotal tax total")
+
+_ONE = Decimal("1")
+
+# nb de lignes à partir duquel le calcul vectorisé (NumPy) est utilisé
+VECTOR_THRESHOLD = 5000
+# borne des produits intermédiaires pour rester exact en int64
+_INT64_SAFE = 2**62
+
+
+def _scaled(value, exp):
+    """Décimal -> entier ×10**exp, arrondi demi vers le haut (None -> 0)."""
+    if not value:
+        return 0
+    d = value if isinstance(value, Decimal) else Decimal(str(value))
+    scaled = d.scaleb(exp)
+    i = int(scaled)
+    if i != scaled:  # plus de décimales que l'échelle : arrondi explicite
+        i = int(scaled.quantize(_ONE, rounding=ROUND_HALF_UP))
+    return i
+
+
+def to_hundredths(quantity):
+    return _scaled(quantity, 2)
+
+
+def to_bp(pct):
+    """Pourcentage (20, "5.5", Decimal) -> points de base."""
+    return _scaled(pct, 2)
+
+
+def div_round(n, d):
+    """n / d arrondi demi vers le haut (en valeur absolue), d > 0 pair."""
+    if n >= 0:
+        return (n + d // 2) // d
+    return -((d // 2 - n) // d)
+
+
+def line_totals(unit_cents, qty_h, discount_bp=0, vat_bp=0):
+    base = div_round(unit_cents * qty_h, 100)
+    discount = div_round(base * discount_bp, 10000)
+    ht = base - discount
+    vat = div_round(ht * vat_bp, 10000)
+    return LineTotals(base, discount, ht, vat, ht + vat)
+
+
+def item_line(item):
+    """(qté centièmes, prix centimes, remise bp, TVA bp) d'une ligne de devis/facture."""
+    return (
+        to_hundredths(item.quantity),
+        item.unit_price_cents,
+        to_bp(item.discount_pct),
+        to_bp(item.vat_rate),
+    )
+
+
+def batch_totals(lines):
+    """
+    Totaux de nombreuses lignes, de plusieurs documents, en un appel.
+    lines : itérable de (doc_id, qty_h, unit_cents, discount_bp, vat_bp)
+    Renvoie (totaux par ligne [LineTotals], {doc_id: Totals}) ;
+    l'ordre des documents suit leur première apparition.
+    """
+    per_line = []
+    acc = {}
+    for doc_id, qty_h, unit_cents, discount_bp, vat_bp in lines:
+        lt = line_totals(unit_cents, qty_h, discount_bp, vat_bp)
+        per_line.append(lt)
+        sums = acc.get(doc_id)
+        if sums is None:
+            acc[doc_id] = [lt.ht, lt.vat]
+        else:
+            sums[0] += lt.ht
+            sums[1] += lt.vat
+    documents = {k: Totals(ht, vat, ht + vat) for k, (ht, vat) in acc.items()}
+    return per_line, documents
+
+
+def document_totals(items):
+    """(subtotal_cents, tax_cents, total_cents) d'un document à partir de ses lignes."""
+    _, documents = batch_totals((None, *item_line(it)) for it in items)
+    return documents.get(None, Totals(0, 0, 0))
+
+
+# --- Lots de lignes brutes (values_list) : sommes par document ---
+def _scalar_sums(rows):
+    acc = {}
+    for doc_id, qty, unit_cents, discount_pct, vat_rate in rows:
+        lt = line_totals(
+            unit_cents, to_hundredths(qty), to_bp(discount_pct), to_bp(vat_rate)
+        )
+        sums = acc.get(doc_id)
+        acc[doc_id] = lt if sums is None else LineTotals(*map(sum, zip(sums, lt)))
+    return acc
+
+
+def _np_div_round(n, d):
+    half = d // 2
+    return np.where(n >= 0, (n + half) // d, -((half - n) // d))
+
+
+def _np_scaled(values):
+    # champs DecimalField à 2 décimales : ×100 tombe à 1e-6 près sur un entier
+    try:
+        arr = np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+    except TypeError:  # valeurs NULL
+        arr = np.array([float(v or 0) for v in values], dtype=np.float64)
+    return np.rint(arr * 100).astype(np.int64)
+
+
+def _vector_sums(rows):
+    doc_ids, qty, unit, disc, vat = ([r[i] for r in rows] for i in range(5))
+    qty_h = _np_scaled(qty)
+    unit = np.fromiter(unit, dtype=np.int64, count=len(unit))
+    disc_bp, vat_bp = _np_scaled(disc), _np_scaled(vat)
+    if int(np.abs(unit).max()) * int(np.abs(qty_h).max()) * 10000 >= _INT64_SAFE:
+        # montants hors norme : le calcul scalaire (entiers Python) s'impose
+        return None
+
+    base = _np_div_round(unit * qty_h, 100)
+    discount = _np_div_round(base * disc_bp, 10000)
+    ht = base - discount
+    vat_amt = _np_div_round(ht * vat_bp, 10000)
+    columns = (base, discount, ht, vat_amt, ht + vat_amt)
+
+    # regroupement par document : sommes par segment (reduceat) ; les lignes
+    # arrivent en général triées par document (values_list ordonné), sinon tri stable
+    ids = np.asarray(doc_ids)
+    if ids.dtype != object and not np.all(ids[1:] >= ids[:-1]):
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        columns = [col[order] for col in columns]
+    elif ids.dtype == object:
+        return None  # identifiants non numériques : calcul scalaire
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    sums = zip(*(np.add.reduceat(col, starts).tolist() for col in columns))
+    return dict(zip(ids[starts].tolist(), map(LineTotals._make, sums)))
+
+
+def batch_sums(rows, threshold=VECTOR_THRESHOLD):
+    """
+    Sommes par document des montants de ligne (LineTotals : base, remise, HT,
+    TVA, TTC) pour des lignes brutes telles que renvoyées par
+    values_list(doc_id, "quantity", "unit_price_cents", "discount_pct", "vat_rate").
+    Au-delà de `threshold` lignes, calcul vectorisé NumPy (mêmes centimes
+    que le calcul scalaire) ; repli scalaire si NumPy est absent.
+    """
+    rows = list(rows)
+    if np is not None and rows and len(rows) >= threshold:
+        sums = _vector_sums(rows)
+        if sums is not None:
+            return sums
+    return _scalar_sums(rows)
+
+
+def cents_to_decimal(cents):
+    """Centimes (int/None) -> Decimal euros à 2 décimales."""
+    return (Decimal(cents or 0) / 100).quantize(Decimal("0.01"))
@@ -19,6 +19,9 @@ def invoice_total(inv):
     S'adapte à quantité/prix/taxe si certains champs n'existent pas.
     """
     # 1) Si la facture possède déjà un champ total, on l'utilise.
+    cents = getattr(inv, "total_cents", None)
+    if cents is not None:
+        return (Decimal(cents) / Decimal(100)).quantize(Decimal("0.01"))
     for attr in ("total_ttc", "total", "amount"):
         if hasattr(inv, attr) and getattr(inv, attr) is not None:
             try:
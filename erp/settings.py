@@ -32,6 +32,20 @@ RQ_QUEUES = {
     }
 }
 
+# Rendu PDF des vues (core.pdf_service) : pool de processus borné
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+# rendus en cours ou en attente, tous workers web confondus (places dans Redis)
+PDF_RENDER_QUEUE_LIMIT = int(os.getenv("PDF_RENDER_QUEUE_LIMIT", "8"))
+PDF_RENDER_TIMEOUT = 30  # secondes, au-delà : 503
+PDF_RENDER_RETRY_AFTER = 5  # secondes (en-tête Retry-After des 503)
+# export ZIP des PDF (worker RQ) : processus de conversion en parallèle
+PDF_BUNDLE_WORKERS = int(os.getenv("PDF_BUNDLE_WORKERS", "4"))
+# cache disque des PDF (MEDIA_ROOT/pdf_cache, core.pdf_cache) ; 0 = désactivé
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# exports (ExportJob) : file RQ injoignable -> export exécuté dans la requête
+# web plutôt qu'en échec (toujours le cas en DEBUG)
+EXPORT_INLINE_FALLBACK = os.getenv("EXPORT_INLINE_FALLBACK", "0") == "1"
+
 # Ensure django_rq in INSTALLED_APPS
 if "django_rq" not in INSTALLED_APPS:
     INSTALLED_APPS += ["django_rq"]
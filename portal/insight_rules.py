@@ -0,0 +1,293 @@
+# portal/insight_rules.py
+"""
+Moteur de règles d'insights.
+
+Chaque règle (InsightRule enregistrée via @register) déclare les champs de
+facture dont elle a besoin (`fields`), dont les sommes de lignes calculées par
+le noyau core.totals. Le moteur lit l'union de ces champs en
+UNE requête, parcourue par `.iterator(chunk_size=...)`, et passe chaque ligne à
+toutes les règles : ajouter une règle n'ajoute pas de parcours des factures.
+Une règle sans `fields` n'est pas alimentée : elle interroge elle-même, dans
+results(), les factures retenues (`self.invoices`) par un agrégat SQL.
+Les règles peuvent restreindre le parcours à certains statuts (`statuses`) :
+le moteur ne lit que l'union des statuts des règles alimentées.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import Customer, Invoice
+from core.totals import VECTOR_THRESHOLD, batch_sums
+
+logger = logging.getLogger(__name__)
+
+Q2 = Decimal("0.01")
+CHUNK_SIZE = 2000
+
+
+def _quantize(d):
+    return (d if isinstance(d, Decimal) else Decimal(d)).quantize(
+        Q2, rounding=ROUND_HALF_UP
+    )
+
+
+# champs calculés disponibles en plus des champs de Invoice : sommes par facture
+# des montants de ligne du noyau core.totals (centimes, arrondis par ligne)
+LINE_FIELDS = {
+    "items_base": "base",
+    "items_discount": "discount",
+    "items_ht": "ht",
+    "items_vat": "vat",
+}
+_ITEM_COLUMNS = (
+    "items__quantity",
+    "items__unit_price_cents",
+    "items__discount_pct",
+    "items__vat_rate",
+)
+
+
+# lignes accumulées avant calcul des sommes : au-delà de VECTOR_THRESHOLD le
+# calcul est vectorisé (core.totals.batch_sums)
+LINE_BUFFER = 4 * VECTOR_THRESHOLD
+
+
+def _flush(invoices, lines):
+    sums = batch_sums(lines)
+    for row in invoices:
+        lt = sums.get(row["pk"])
+        for field, attr in LINE_FIELDS.items():
+            row[field] = getattr(lt, attr) if lt else 0
+    return invoices
+
+
+def _with_line_totals(rows, buffer_size=LINE_BUFFER):
+    """
+    Regroupe les lignes (facture LEFT JOIN lignes, triées par facture) en une
+    ligne par facture portant les sommes LINE_FIELDS, calculées par paquets
+    d'environ `buffer_size` lignes.
+    """
+    invoices, lines = [], []
+    for pk, group in groupby(rows, key=itemgetter("pk")):
+        row = None
+        for r in group:
+            if row is None:
+                row = {k: v for k, v in r.items() if k not in _ITEM_COLUMNS}
+            if r["items__unit_price_cents"] is not None:  # sinon : facture sans ligne
+                lines.append((pk, *(r[c] for c in _ITEM_COLUMNS)))
+        invoices.append(row)
+        if len(lines) >= buffer_size:
+            yield from _flush(invoices, lines)
+            invoices, lines = [], []
+    yield from _flush(invoices, lines)
+
+
+def lost_cutoff(today, lost_months):
+    return today - timedelta(days=30 * lost_months)  # approximation 30j/mois
+
+
+# nom -> classe de règle ; l'ordre d'enregistrement est l'ordre d'affichage
+RULES = {}
+
+
+def register(rule_cls):
+    RULES[rule_cls.name] = rule_cls
+    return rule_cls
+
+
+class InsightRule:
+    """
+    Règle d'insight alimentée ligne à ligne.
+    - name : type d'insight produit
+    - subject : clé du sujet dans les dicts produits ("invoice_id" / "customer_id")
+    - fields : champs de facture lus (values()) ou sommes de lignes (LINE_FIELDS) ;
+      vide : règle hors parcours, calculée dans results() sur self.invoices
+      (factures de la company, restreintes comme le parcours)
+    - statuses : statuts de facture utiles à la règle (vide : tous) ; le parcours
+      étant partagé, feed() peut recevoir d'autres statuts et doit les ignorer
+    """
+
+    name = ""
+    subject = "invoice_id"
+    fields = ()
+    statuses = ()
+
+    def __init__(self, company, today):
+        self.company = company
+        self.today = today
+        self.invoices = Invoice.objects.filter(company=company)
+
+    def feed(self, row):
+        pass
+
+    def results(self):
+        return []
+
+
+@register
+class LowMarginRule(InsightRule):
+    """
+    Marge faible : remise importante (proxy de marge) sur une facture ISSUED/PAID.
+    Le ratio porte sur les remises arrondies par ligne (celles de la facture).
+
+    NOTE : le modèle actuel ne contient pas de `unit_cost_cents`, on utilise donc la
+    **remise appliquée** comme proxy de marge faible.
+    """
+
+    name = "low_margin_invoice"
+    subject = "invoice_id"
+    fields = ("number", "status", "items_base", "items_discount")
+    statuses = ("ISSUED", "PAID")
+
+    def __init__(self, company, today, threshold_pct=20):
+        super().__init__(company, today)
+        self.threshold = Decimal(threshold_pct)
+        self.found = []
+
+    def feed(self, row):
+        if row["status"] not in ("ISSUED", "PAID"):
+            return
+        # évite la division par zéro (facture sans ligne ou à 0)
+        base = row["items_base"]
+        if base <= 0:
+            return
+        discount = row["items_discount"]
+        # remise/base >= seuil, comparé sans division
+        if discount * 100 < base * self.threshold:
+            return
+        disc_ratio = float(_quantize(Decimal(discount) * 100 / base))
+        self.found.append(
+            {
+                "type": self.name,
+                "title": "Marge faible",
+                "invoice_id": row["pk"],
+                "invoice_number": row["number"],
+                "discount_pct": disc_ratio,
+                "severity": "warning",
+                "message": f"Remise {disc_ratio:.1f}% sur la facture {row['number']}",
+            }
+        )
+
+    def results(self):
+        return self.found
+
+
+@register
+class LostClientRule(InsightRule):
+    """
+    Client perdu : pas de facture (tous statuts) depuis N mois.
+    lost_since : ne garde que les clients dont la dernière facture est >= cette
+    date (clients devenus "perdus" depuis un seuil précédent).
+    """
+
+    name = "lost_client"
+    subject = "customer_id"
+
+    def __init__(self, company, today, lost_months=6, lost_since=None):
+        super().__init__(company, today)
+        self.cutoff = lost_cutoff(today, lost_months)
+        self.lost_since = lost_since
+
+    def results(self):
+        # une requête : dernière date de facture par client, filtrée sur le seuil
+        last_dates = (
+            self.invoices.filter(customer_id__isnull=False)
+            .values("customer_id")
+            .annotate(last=Max("issue_date"))
+            .filter(last__lt=self.cutoff)
+            .order_by()
+        )
+        if self.lost_since is not None:
+            last_dates = last_dates.filter(last__gte=self.lost_since)
+        lost = {r["customer_id"]: r["last"] for r in last_dates}
+        ids = sorted(lost)
+        names = {}
+        for i in range(0, len(ids), 500):
+            names.update(
+                Customer.objects.filter(
+                    company=self.company, pk__in=ids[i : i + 500]
+                ).values_list("pk", "name")
+            )
+        return [
+            {
+                "type": self.name,
+                "title": "Client potentiellement perdu",
+                "customer_id": cid,
+                "customer_name": names[cid],
+                "last_invoice_date": lost[cid].isoformat(),
+                "severity": "info",
+                "message": f"Aucune facturation depuis le {lost[cid].isoformat()} pour {names[cid]}",
+            }
+            for cid in ids
+            if cid in names
+        ]
+
+
+def run_rules(
+    company,
+    names=None,
+    invoice_filter=None,
+    params=None,
+    chunk_size=CHUNK_SIZE,
+    timings=None,
+):
+    """
+    Évalue les règles `names` (défaut : toutes) en un seul parcours des factures
+    de la company (restreint par le Q() `invoice_filter`).
+    - params : {nom de règle: kwargs du constructeur}
+    - timings : dict rempli avec le temps passé par règle (+ "scan" : total)
+    Renvoie {nom de règle: [insights]}.
+    """
+    params = params or {}
+    today = timezone.now().date()
+    rules = [RULES[n](company, today, **params.get(n, {})) for n in names or RULES]
+
+    qs = Invoice.objects.filter(company=company)
+    if invoice_filter is not None:
+        qs = qs.filter(invoice_filter)
+    for rule in rules:
+        rule.invoices = qs
+    fed = [r for r in rules if r.fields]
+    if fed and all(r.statuses for r in fed):
+        # une règle sans restriction de statut impose le parcours complet
+        qs = qs.filter(status__in=sorted(set().union(*(r.statuses for r in fed))))
+    wanted = set().union(*(r.fields for r in fed))
+    with_lines = bool(wanted & set(LINE_FIELDS))
+    columns = sorted(wanted - set(LINE_FIELDS))
+    if with_lines:
+        # une seule requête : factures LEFT JOIN lignes, regroupées à la volée
+        qs = qs.values("pk", *columns, *_ITEM_COLUMNS).order_by("pk", "items__id")
+    else:
+        qs = qs.values("pk", *columns).order_by("pk")
+
+    spent = {r.name: 0.0 for r in rules}
+    start_scan = time.perf_counter()
+    # aucune règle à alimenter (ex. seulement "lost_client") : pas de parcours
+    rows = qs.iterator(chunk_size=chunk_size) if fed else ()
+    for row in _with_line_totals(rows) if with_lines else rows:
+        for rule in fed:
+            start = time.perf_counter()
+            rule.feed(row)
+            spent[rule.name] += time.perf_counter() - start
+    results = {}
+    for rule in rules:
+        start = time.perf_counter()
+        results[rule.name] = rule.results()
+        spent[rule.name] += time.perf_counter() - start
+    spent["scan"] = time.perf_counter() - start_scan
+
+    logger.debug(
+        "insights company=%s %s",
+        company.pk,
+        " ".join(f"{k}={v * 1000:.1f}ms" for k, v in spent.items()),
+    )
+    if timings is not None:
+        timings.update(spent)
+    return results
@@ -0,0 +1,100 @@
+# portal/management/commands/bench_pdf.py
+import random
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from core import pdf
+from core.pdf import html_to_pdf, resolve_static
+
+TEMPLATES = ("pdf/invoice.html", "pdf/quote.html")
+
+
+def synthetic_document(lines, seed):
+    """Document non enregistré (variables `q` des templates pdf/*.html)."""
+    rnd = random.Random(seed)
+    items = []
+    for i in range(lines):
+        qty = Decimal(rnd.randint(1, 1000)) / 100
+        unit = Decimal(rnd.randint(100, 500_000)) / 100
+        rate = Decimal(rnd.choice(["0", "5.5", "10", "20"]))
+        line_ht = qty * unit
+        items.append(
+            SimpleNamespace(
+                description=f"Prestation {i + 1}",
+                quantity=qty,
+                unit_ht=unit,
+                discount_ht=Decimal("0"),
+                line_ht=line_ht,
+                vat_rate=rate,
+                vat_amt=line_ht * rate / 100,
+            )
+        )
+    subtotal = sum(it.line_ht for it in items)
+    vat_total = sum(it.vat_amt for it in items)
+    return SimpleNamespace(
+        number="BENCH-0001",
+        issue_date=date(2025, 3, 1),
+        valid_until=date(2025, 4, 1),
+        company=SimpleNamespace(name="Bench SARL", email="bench@example.com"),
+        customer=SimpleNamespace(
+            name="Client", billing_address="1 rue X\n75000 Paris", vat_number="FR00"
+        ),
+        items=items,
+        subtotal_ht=subtotal,
+        vat_total=vat_total,
+        total_ttc=subtotal + vat_total,
+        footer_note="",
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the HTML -> PDF conversion of pdf/invoice.html and"
+        " pdf/quote.html without (before) and with (after) the per-process"
+        " static asset resolver"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--renders", type=int, default=20)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--lines", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _timed(self, html, renders, cached):
+        pdf.ASSET_CACHE = cached
+        resolve_static.cache_clear()
+        html_to_pdf(html)  # hors mesure : remplit les caches du mode "après"
+        start = time.perf_counter()
+        for _ in range(renders):
+            html_to_pdf(html)
+        return (time.perf_counter() - start) / renders
+
+    def handle(self, *args, **options):
+        renders, rounds = options["renders"], options["rounds"]
+        doc = synthetic_document(options["lines"], options["seed"])
+        self.stdout.write(
+            f"{rounds} x {renders} renders per template and mode,"
+            f" {options['lines']} lines (best round)"
+        )
+        try:
+            for template_name in TEMPLATES:
+                html = render_to_string(template_name, {"q": doc})
+                html_to_pdf(html)  # imports, polices
+                # avant / après alternés : le bruit (CPU, GC) touche les deux
+                before, after = [], []
+                for _ in range(rounds):
+                    before.append(self._timed(html, renders, cached=False))
+                    after.append(self._timed(html, renders, cached=True))
+                before, after = min(before), min(after)
+                self.stdout.write(
+                    f"{template_name:18}: before {before * 1000:7.1f} ms,"
+                    f" after {after * 1000:7.1f} ms"
+                    f" ({(before - after) / before:+.1%}, {before / after:.2f}x)"
+                )
+        finally:
+            pdf.ASSET_CACHE = True
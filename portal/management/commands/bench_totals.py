@@ -0,0 +1,111 @@
+# portal/management/commands/bench_totals.py
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from core.totals import batch_sums, batch_totals, item_line, np
+
+Q2 = Decimal("0.01")
+
+
+def legacy_decimal_totals(docs):
+    """Boucle Decimal historique (quantize à chaque étape, comme l'ancien invoice_pdf)."""
+    out = {}
+    for doc_id, items in docs:
+        subtotal = Decimal("0.00")
+        vat_total = Decimal("0.00")
+        for it in items:
+            qty = Decimal(it.quantity)
+            unit_ht = (Decimal(it.unit_price_cents) / Decimal(100)).quantize(
+                Q2, rounding=ROUND_HALF_UP
+            )
+            base_ht = (unit_ht * qty).quantize(Q2, rounding=ROUND_HALF_UP)
+            discount_pct = Decimal(it.discount_pct or 0) / Decimal(100)
+            discount_amt = (base_ht * discount_pct).quantize(Q2, rounding=ROUND_HALF_UP)
+            line_ht = (base_ht - discount_amt).quantize(Q2, rounding=ROUND_HALF_UP)
+            vat_rate = Decimal(it.vat_rate or 0) / Decimal(100)
+            vat_amt = (line_ht * vat_rate).quantize(Q2, rounding=ROUND_HALF_UP)
+            subtotal += line_ht
+            vat_total += vat_amt
+        out[doc_id] = (subtotal, vat_total, subtotal + vat_total)
+    return out
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the integer-cents totals kernel (scalar and NumPy batch)"
+        " against the legacy Decimal loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=1_000_000)
+        parser.add_argument("--lines-per-doc", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        n, per_doc = options["lines"], options["lines_per_doc"]
+        items = [
+            SimpleNamespace(
+                quantity=Decimal(rnd.randint(1, 10_000)) / 100,
+                unit_price_cents=rnd.randint(1, 500_000),
+                discount_pct=Decimal(
+                    rnd.choice(["0", "0", "5", "10", "12.5", "33.33"])
+                ),
+                vat_rate=Decimal(rnd.choice(["0", "5.5", "10", "20"])),
+            )
+            for _ in range(n)
+        ]
+        docs = [(i // per_doc, items[i : i + per_doc]) for i in range(0, n, per_doc)]
+        self.stdout.write(f"{n} lines, {len(docs)} documents")
+
+        start = time.perf_counter()
+        legacy = legacy_decimal_totals(docs)
+        legacy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lines = [(i // per_doc, *item_line(it)) for i, it in enumerate(items)]
+        convert_s = time.perf_counter() - start
+        start = time.perf_counter()
+        _, documents = batch_totals(lines)
+        kernel_s = time.perf_counter() - start
+
+        # lignes brutes (comme values_list) -> sommes par document
+        raw = [
+            (
+                i // per_doc,
+                it.quantity,
+                it.unit_price_cents,
+                it.discount_pct,
+                it.vat_rate,
+            )
+            for i, it in enumerate(items)
+        ]
+        start = time.perf_counter()
+        vector = batch_sums(raw, threshold=0 if np is not None else len(raw) + 1)
+        vector_s = time.perf_counter() - start
+
+        mismatched = sum(
+            1
+            for doc_id, (ht, vat, ttc) in legacy.items()
+            if (int(ht * 100), int(vat * 100), int(ttc * 100))
+            != tuple(documents[doc_id])
+            or tuple(documents[doc_id]) != tuple(vector[doc_id][2:])
+        )
+        self.stdout.write(f"legacy Decimal loop : {legacy_s:8.3f}s")
+        self.stdout.write(
+            f"kernel (batch)      : {kernel_s:8.3f}s"
+            f" (+ {convert_s:.3f}s converting model fields)"
+        )
+        self.stdout.write(
+            f"speed-up            : {legacy_s / kernel_s:8.1f}x"
+            f" ({legacy_s / (kernel_s + convert_s):.1f}x incl. conversion)"
+        )
+        self.stdout.write(
+            f"batch_sums ({'numpy' if np is not None else 'scalar'}) : {vector_s:8.3f}s"
+            f" (from raw Decimal rows, {legacy_s / vector_s:.1f}x)"
+        )
+        self.stdout.write(f"documents differing : {mismatched}")
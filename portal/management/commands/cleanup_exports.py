@@ -0,0 +1,36 @@
+# portal/management/commands/cleanup_exports.py
+from django.core.management.base import BaseCommand
+
+from portal.services_exports import EXPORT_RETENTION_HOURS, cleanup_exports
+
+
+class Command(BaseCommand):
+    help = "Expire old export jobs and delete their files from MEDIA_ROOT/exports"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-hours",
+            type=int,
+            default=EXPORT_RETENTION_HOURS,
+            help="Keep export files finished less than this many hours ago",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Run as an RQ job on the 'default' queue instead of inline",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            import django_rq
+
+            from portal.tasks import cleanup_export_files
+
+            job = django_rq.get_queue("default").enqueue(
+                cleanup_export_files, options["retention_hours"]
+            )
+            self.stdout.write(f"Cleanup job enqueued: {job.id}")
+            return
+
+        removed = cleanup_exports(options["retention_hours"])
+        self.stdout.write(f"{removed} export file(s) removed")
@@ -0,0 +1,42 @@
+# portal/management/commands/export_fec.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fec import FEC_COLUMNS, SEPARATOR, FecValidator, fec_rows
+from core.models import Company
+from portal.services_exports import create_export
+
+
+class Command(BaseCommand):
+    help = "Export the sales FEC (fichier des écritures comptables) of a fiscal year"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, required=True)
+        parser.add_argument("--year", type=int, required=True)
+        parser.add_argument(
+            "--output",
+            help="Write the file here inline instead of running an export job",
+        )
+
+    def handle(self, *args, **options):
+        company = Company.objects.filter(pk=options["company"]).first()
+        if company is None:
+            raise CommandError(f"Unknown company {options['company']}")
+        year = options["year"]
+
+        if not options["output"]:
+            job = create_export(company, "FEC", {"year": year})
+            self.stdout.write(
+                f"FEC export #{job.pk}: {job.status} {job.error}".rstrip()
+            )
+            return
+
+        validator = FecValidator(year)
+        with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+            fh.write(SEPARATOR.join(FEC_COLUMNS) + "\r\n")
+            for fields in validator.check(fec_rows(company, year)):
+                fh.write(SEPARATOR.join(fields) + "\r\n")
+        if not validator.close():
+            raise CommandError("Unbalanced FEC: " + "; ".join(validator.errors))
+        self.stdout.write(
+            f"{validator.entries} entries, {validator.lines} lines written to {options['output']}"
+        )
@@ -0,0 +1,24 @@
+# portal/management/commands/pdf_stats.py
+from django.core.management.base import BaseCommand
+
+from core.pdf_service import pdf_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the cumulative counters and average timings of the PDF rendering service"
+    )
+
+    def handle(self, *args, **options):
+        stats = pdf_stats()
+        self.stdout.write(
+            f"{stats['renders']} render(s), {stats['errors']} error(s), "
+            f"{stats['rejected']} rejected (queue full), {stats['timeouts']} timeout(s)"
+        )
+        self.stdout.write(
+            f"avg render {stats['avg_render_ms']} ms, avg wait {stats['avg_wait_ms']} ms"
+        )
+        self.stdout.write(
+            f"cache: {stats['cache_hits']} hit(s), {stats['cache_misses']} miss(es), "
+            f"{stats['cache_evictions']} eviction(s)"
+        )
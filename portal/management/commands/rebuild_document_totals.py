@@ -0,0 +1,51 @@
+# portal/management/commands/rebuild_document_totals.py
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import rebuild_document_totals
+from portal.services import INVOICE_SECTIONS, invalidate_dashboard_cache
+
+MODELS = {"invoice": "Invoice", "quote": "Quote"}
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) denormalized subtotal/tax/total columns on invoices and quotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model", choices=["invoice", "quote", "all"], default="all"
+        )
+        parser.add_argument("--company", type=int, help="Restrict to one company id")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report inconsistent documents, do not write",
+        )
+
+    def handle(self, *args, **options):
+        keys = MODELS if options["model"] == "all" else [options["model"]]
+        total_mismatched = 0
+        for key in keys:
+            model = apps.get_model("core", MODELS[key])
+            qs = model.objects.all()
+            if options["company"]:
+                qs = qs.filter(company_id=options["company"])
+            checked, mismatched, companies = rebuild_document_totals(
+                qs, batch_size=options["batch_size"], dry_run=options["verify"]
+            )
+            if key == "invoice":
+                # CA, URSSAF, séries, TVA en cache : calculés sur les anciens totaux
+                for company_id in companies:
+                    invalidate_dashboard_cache(company_id, INVOICE_SECTIONS)
+            total_mismatched += len(mismatched)
+            verb = "inconsistent" if options["verify"] else "fixed"
+            self.stdout.write(
+                f"{MODELS[key]}: {checked} checked, {len(mismatched)} {verb}"
+            )
+            if mismatched and options["verify"]:
+                self.stdout.write(
+                    "  pk: " + ", ".join(str(pk) for pk in mismatched[:50])
+                )
+        if options["verify"] and total_mismatched:
+            raise CommandError(f"{total_mismatched} document(s) with stale totals")
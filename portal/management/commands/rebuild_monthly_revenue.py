@@ -0,0 +1,15 @@
+# portal/management/commands/rebuild_monthly_revenue.py
+from django.core.management.base import BaseCommand
+
+from core.revenue import rebuild_monthly_revenue
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CompanyMonthlyRevenue rollup from invoices (backfill)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Restrict to one company id")
+
+    def handle(self, *args, **options):
+        written = rebuild_monthly_revenue(company_id=options["company"])
+        self.stdout.write(f"{written} monthly revenue row(s) written")
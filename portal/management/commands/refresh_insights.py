@@ -0,0 +1,27 @@
+# portal/management/commands/refresh_insights.py
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from portal.tasks import refresh_company_insights
+
+Company = apps.get_model("core", "Company")
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-evaluate persisted dashboard insights (daily: picks up newly lost clients)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Restrict to one company id")
+        parser.add_argument(
+            "--full", action="store_true", help="Re-evaluate every invoice and customer"
+        )
+
+    def handle(self, *args, **options):
+        companies = Company.objects.filter(active=True).order_by("pk")
+        if options["company"]:
+            companies = Company.objects.filter(pk=options["company"])
+        for company_id in companies.values_list("pk", flat=True).iterator():
+            written = refresh_company_insights(company_id, full=options["full"])
+            self.stdout.write(f"{company_id}: {written} insight(s) written")
@@ -0,0 +1,60 @@
+# portal/management/commands/warm_dashboard_cache.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.services import warm_caches
+
+
+class Command(BaseCommand):
+    help = "Pre-compute dashboard KPIs, insights and accounting figures of active companies"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--concurrency", type=int, default=4, help="Companies warmed in parallel"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Also recompute companies without activity since the last warm-up",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Run as an RQ job on the 'default' queue instead of inline",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            import django_rq
+
+            from portal.tasks import warm_dashboard_caches
+
+            job = django_rq.get_queue("default").enqueue(
+                warm_dashboard_caches,
+                options["batch_size"],
+                options["concurrency"],
+                options["force"],
+            )
+            self.stdout.write(f"Warm-up job enqueued: {job.id}")
+            return
+
+        start = time.perf_counter()
+        warmed = skipped = 0
+        for company, did_warm, seconds in warm_caches(
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            force=options["force"],
+        ):
+            if did_warm:
+                warmed += 1
+                self.stdout.write(
+                    f"{company.pk} {company.name}: warmed in {seconds:.3f}s"
+                )
+            else:
+                skipped += 1
+                self.stdout.write(f"{company.pk} {company.name}: skipped (no activity)")
+        self.stdout.write(
+            f"{warmed} warmed, {skipped} skipped in {time.perf_counter() - start:.2f}s"
+        )
@@ -0,0 +1,82 @@
+# portal/pagination.py
+"""
+Pagination par curseur (keyset) sur (issue_date, id), ordre décroissant.
+Chaque page est lue par une requête bornée sur l'index (company, issue_date),
+sans OFFSET : temps constant quelle que soit la page, et pas de ligne sautée
+ou dupliquée quand des factures sont ajoutées entre deux pages.
+
+Le curseur transmis dans l'URL est opaque (base64) : "n" = page suivante
+(après la ligne), "p" = page précédente (avant la ligne).
+"""
+
+import base64
+import binascii
+from datetime import date
+
+from django.db.models import Q
+
+
+def encode_cursor(direction, issue_date, pk):
+    raw = f"{direction}:{issue_date.isoformat()}:{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Curseur -> (direction, issue_date, pk), ou None si absent/invalide."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        direction, day, pk = raw.split(":")
+        if direction not in ("n", "p"):
+            return None
+        return direction, date.fromisoformat(day), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def keyset_page(qs, cursor=None, page_size=50):
+    """
+    Page de `qs` triée par (-issue_date, -id) à partir du curseur `cursor`.
+    Renvoie (lignes, curseur suivant ou None, curseur précédent ou None).
+    Un curseur invalide, ou dont la plage est désormais vide, donne la première page.
+    """
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        rows = list(qs.order_by("-issue_date", "-pk")[: page_size + 1])
+        has_next, has_prev = len(rows) > page_size, False
+        rows = rows[:page_size]
+    elif decoded[0] == "n":
+        _, day, pk = decoded
+        rows = list(
+            qs.filter(Q(issue_date__lt=day) | Q(issue_date=day, pk__lt=pk)).order_by(
+                "-issue_date", "-pk"
+            )[: page_size + 1]
+        )
+        has_next, has_prev = len(rows) > page_size, True
+        rows = rows[:page_size]
+    else:
+        _, day, pk = decoded
+        rows = list(
+            qs.filter(Q(issue_date__gt=day) | Q(issue_date=day, pk__gt=pk)).order_by(
+                "issue_date", "pk"
+            )[: page_size + 1]
+        )
+        has_next, has_prev = True, len(rows) > page_size
+        rows = rows[:page_size][::-1]
+    if decoded is not None and not rows:
+        # curseur valide mais plage vidée (factures supprimées) : première page,
+        # comme pour un curseur invalide, plutôt qu'une page sans lien
+        return keyset_page(qs, None, page_size)
+
+    next_cursor = (
+        encode_cursor("n", rows[-1].issue_date, rows[-1].pk)
+        if rows and has_next
+        else None
+    )
+    prev_cursor = (
+        encode_cursor("p", rows[0].issue_date, rows[0].pk)
+        if rows and has_prev
+        else None
+    )
+    return rows, next_cursor, prev_cursor
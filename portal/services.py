@@ -1,14 +1,30 @@
 # portal/services.py
-from collections import defaultdict
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 from decimal import ROUND_HALF_UP, Decimal
 
 from django.core.cache import cache
-from django.db.models import Sum
+from django.db import connection
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
 
-from core.models import Invoice, TurnoverEntry
-from core.utils import invoice_total  # garde le calcul centralisé
+from core.accounting import compute_contributions, get_thresholds, tables_version
+from core.models import Company, Invoice, InvoiceItem, TurnoverEntry
+from core.revenue import PeriodRevenue, monthly_totals, vat_by_rate
+from core.singleflight import single_flight
+
+from .services_exports import accounting_invoices
+from .services_insights import (
+    FULL_PENDING_TTL,
+    insights_ever_computed,
+    insights_full_pending_key,
+    persisted_insights,
+    schedule_insights_refresh,
+)
+
+logger = logging.getLogger(__name__)
 
 Q2 = Decimal("0.01")
 
@@ -36,125 +52,604 @@ def _month_bounds(today, months_back):
     return start, end
 
 
-def invalidate_dashboard_cache(company_id):
-    cache.delete(f"dash:{company_id}")
+def _cents_to_euros(cents):
+    return _decimal(Decimal(cents or 0) / 100)
+
+
+# --- Cache du dashboard : namespace versionné par company + une entrée par section ---
+# Invalider = incrémenter un compteur (O(1)), jamais parcourir/supprimer des clés :
+# les anciennes entrées deviennent inaccessibles et expirent d'elles-mêmes.
+INVOICE_SECTIONS = (
+    "aging",
+    "series",
+    "top_customers",
+    "recent_invoices",
+    "accounting",
+    "period_totals",
+    "vat",
+)
+
 
+def _version_key(company_id, section=None):
+    return f"dash:{company_id}:ver:{section or 'ns'}"
 
-def compute_dashboard(company, page_size=5, use_cache=True, ttl=600):
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # compteur absent : la prochaine lecture en créera un nouveau (horodaté)
+        pass
+
+
+def invalidate_dashboard_cache(company_id, sections=None):
     """
-    Calcule les KPIs du dashboard.
-    - Cache par company (TTL par défaut: 10 min)
-    - Optimisations ORM (select_related)
+    Invalide le cache dashboard d'une company.
+    - sections=None : tout le namespace (bump du compteur de namespace)
+    - sections=[...] : seulement les sections indiquées
     """
-    cache_key = f"dash:{company.id}"
-    if use_cache:
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
+    if sections is None:
+        _bump_version(_version_key(company_id))
+        return
+    for section in sections:
+        _bump_version(_version_key(company_id, section))
 
-    today = timezone.now().date()
 
-    # --- Trésorerie estimée (remplace par comptes bancaires si tu en as) ---
+def _current_versions(company_id, sections):
+    """{clé de version: valeur} du namespace et des sections (un aller-retour cache)."""
+    version_keys = [_version_key(company_id)] + [
+        _version_key(company_id, s) for s in sections
+    ]
+    versions = cache.get_many(version_keys)
+    for key in version_keys:
+        if key not in versions:
+            # compteur absent (jamais créé ou évincé) : valeur horodatée, pour ne
+            # jamais retomber sur une ancienne entrée encore en cache
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def dashboard_cache_keys(company_id, sections, suffix=""):
+    """Clés de cache courantes {section: clé} (un seul aller-retour cache)."""
+    versions = _current_versions(company_id, sections)
+    ns = versions[_version_key(company_id)]
+    keys = {}
+    for s in sections:
+        sv = versions[_version_key(company_id, s)]
+        keys[s] = f"dash:{company_id}:{ns}:{s}:{sv}{suffix}"
+    return keys
+
+
+# --- Sections du dashboard ---
+def _section_cash(company, today, page_size):
+    # Trésorerie estimée (remplace par comptes bancaires si tu en as)
     cash_agg = TurnoverEntry.objects.filter(company=company).aggregate(
         total=Sum("amount")
     )
-    cash_balance = _decimal(cash_agg.get("total") or Decimal("0.00"))
-
-    # --- CA mois courant ---
-    start_month = today.replace(day=1)
-    invoices_month = Invoice.objects.filter(
-        company=company, issue_date__gte=start_month, status="ISSUED"
-    ).select_related("customer")
-    ca_month = sum(
-        (invoice_total(inv) for inv in invoices_month), Decimal("0.00")
-    ).quantize(Q2)
-
-    # --- Factures ouvertes ---
-    invoices_open_qs = Invoice.objects.filter(
-        company=company, status="ISSUED"
-    ).select_related("customer")
-    invoices_open_total = sum(
-        (invoice_total(inv) for inv in invoices_open_qs), Decimal("0.00")
-    ).quantize(Q2)
-
-    # clients > 30j (distinct)
-    clients_over_30 = set()
-    for inv in invoices_open_qs:
-        if inv.due_at:
-            age = (today - inv.due_at).days
-            if age > 30 and inv.customer_id:
-                clients_over_30.add(inv.customer_id)
-    clients_over_30_count = len(clients_over_30)
-
-    # --- Factures récentes (évite N+1) ---
+    return {"cash_balance": _decimal(cash_agg.get("total") or Decimal("0.00"))}
+
+
+def _section_aging(company, today, page_size):
+    # Factures ouvertes + aging : une seule requête conditionnelle
+    d30 = today - timedelta(days=30)
+    d60 = today - timedelta(days=60)
+    d90 = today - timedelta(days=90)
+    issued = Invoice.objects.filter(company=company, status="ISSUED").aggregate(
+        open_total=Sum("total_cents"),
+        a0_30=Sum("total_cents", filter=Q(issue_date__gte=d30)),
+        a31_60=Sum("total_cents", filter=Q(issue_date__lt=d30, issue_date__gte=d60)),
+        a61_90=Sum("total_cents", filter=Q(issue_date__lt=d60, issue_date__gte=d90)),
+        gt_90=Sum("total_cents", filter=Q(issue_date__lt=d90)),
+    )
+    # clients > 30j après échéance (distinct)
+    clients_over_30 = (
+        Invoice.objects.filter(
+            company=company,
+            status="ISSUED",
+            due_at__lt=d30,
+            customer__isnull=False,
+        )
+        .values("customer_id")
+        .distinct()
+        .count()
+    )
+    return {
+        "invoices_open_total": _cents_to_euros(issued["open_total"]),
+        "clients_over_30": clients_over_30,
+        "aging": {
+            "0_30": _cents_to_euros(issued["a0_30"]),
+            "31_60": _cents_to_euros(issued["a31_60"]),
+            "61_90": _cents_to_euros(issued["a61_90"]),
+            "gt_90": _cents_to_euros(issued["gt_90"]),
+        },
+    }
+
+
+def _section_series(company, today, page_size):
+    # CA mois courant (sans borne haute, comme avant) + série 12 mois (agrégat mensuel)
+    ca_month = Invoice.objects.filter(
+        company=company, status="ISSUED", issue_date__gte=today.replace(day=1)
+    ).aggregate(total=Sum("total_cents"))["total"]
+    series_start, _ = _month_bounds(today, 11)
+    by_month = monthly_totals(company, series_start, today, statuses=["ISSUED"])
+    ca_series = []
+    for i in range(11, -1, -1):
+        start, _ = _month_bounds(today, i)
+        ca_series.append(_cents_to_euros(by_month.get((start.year, start.month))))
+    return {"ca_month": _cents_to_euros(ca_month), "ca_series": ca_series}
+
+
+def _section_top_customers(company, today, page_size):
+    # Top clients (90j)
+    top_rows = (
+        Invoice.objects.filter(
+            company=company,
+            issue_date__gte=today - timedelta(days=90),
+            customer__isnull=False,
+        )
+        .values("customer_id", "customer__name")
+        .annotate(total=Sum("total_cents"))
+        .order_by("-total")[:5]
+    )
+    return {
+        "top_customers": [
+            {
+                "id": row["customer_id"],
+                "name": row["customer__name"] or "",
+                "total": _cents_to_euros(row["total"]),
+            }
+            for row in top_rows
+        ]
+    }
+
+
+def _section_recent_invoices(company, today, page_size):
+    # Factures récentes (évite N+1)
     recent_invoices = list(
         Invoice.objects.filter(company=company)
         .select_related("customer")
         .order_by("-issue_date")[:page_size]
     )
     for inv in recent_invoices:
-        inv.computed_total = invoice_total(inv)  # pas d'underscore -> template-safe
-
-    # --- Aging buckets ---
-    aging = {
-        "0_30": Decimal("0.00"),
-        "31_60": Decimal("0.00"),
-        "61_90": Decimal("0.00"),
-        "gt_90": Decimal("0.00"),
+        # pas d'underscore -> template-safe
+        inv.computed_total = _cents_to_euros(inv.total_cents)
+    return {"recent_invoices": recent_invoices}
+
+
+def _section_insights(company, today, page_size):
+    # table core.Insight alimentée en tâche de fond (refresh_company_insights)
+    # premier calcul complet : un seul job en file, pas un par recalcul de section
+    if not insights_ever_computed(company.id) and cache.add(
+        insights_full_pending_key(company.id), 1, FULL_PENDING_TTL
+    ):
+        schedule_insights_refresh(company.id, full=True)
+    return {"insights": persisted_insights(company)}
+
+
+# section -> (fonction de calcul, TTL "soft" de fraîcheur, TTL "hard" d'expiration)
+DASHBOARD_SECTIONS = {
+    "cash": (_section_cash, 600, 6 * 3600),
+    "aging": (_section_aging, 300, 6 * 3600),
+    "series": (_section_series, 1800, 12 * 3600),
+    "top_customers": (_section_top_customers, 900, 6 * 3600),
+    "recent_invoices": (_section_recent_invoices, 300, 6 * 3600),
+    "insights": (_section_insights, 900, 12 * 3600),
+}
+
+
+def _last_key(company_id, section, suffix=""):
+    # dernière valeur connue, indépendante des versions : servie en mode
+    # stale-while-revalidate quand la clé versionnée est invalidée/expirée
+    return f"dash:{company_id}:last:{section}{suffix}"
+
+
+def _hard_ttl(section, ttl=None):
+    return max(DASHBOARD_SECTIONS[section][2], ttl or 0)
+
+
+def _section_entry(company, section, today, page_size):
+    return {
+        "at": time.time(),
+        "values": DASHBOARD_SECTIONS[section][0](company, today, page_size),
     }
-    for inv in invoices_open_qs:
-        amt = invoice_total(inv)
-        age_days = (today - (inv.issue_date or today)).days
-        if age_days <= 30:
-            aging["0_30"] += amt
-        elif age_days <= 60:
-            aging["31_60"] += amt
-        elif age_days <= 90:
-            aging["61_90"] += amt
-        else:
-            aging["gt_90"] += amt
-    for k in aging:
-        aging[k] = aging[k].quantize(Q2)
-
-    # --- Top clients (90j) ---
-    top_map = defaultdict(Decimal)
-    start_90 = today - timedelta(days=90)
-    for inv in Invoice.objects.filter(
-        company=company, issue_date__gte=start_90
-    ).select_related("customer"):
-        if inv.customer_id:
-            top_map[
-                (inv.customer_id, getattr(inv.customer, "name", ""))
-            ] += invoice_total(inv)
-    top_customers = sorted(
-        [
-            {"id": cid, "name": name, "total": amt.quantize(Q2)}
-            for (cid, name), amt in top_map.items()
-        ],
-        key=lambda x: x["total"],
-        reverse=True,
-    )[:5]
-
-    # --- Série CA 12 mois ---
-    ca_series = []
-    for i in range(11, -1, -1):
-        start, end = _month_bounds(today, i)
-        invs = Invoice.objects.filter(
-            company=company, issue_date__gte=start, issue_date__lte=end, status="ISSUED"
+
+
+def _store_sections(company_id, keys, entries, suffix, ttl=None):
+    for section, entry in entries.items():
+        cache.set_many(
+            {keys[section]: entry, _last_key(company_id, section, suffix): entry},
+            _hard_ttl(section, ttl),
         )
-        s = sum((invoice_total(inv) for inv in invs), Decimal("0.00")).quantize(Q2)
-        ca_series.append(s)
-
-    data = {
-        "cash_balance": cash_balance,
-        "ca_month": ca_month,
-        "invoices_open_total": invoices_open_total,
-        "clients_over_30": clients_over_30_count,
-        "recent_invoices": recent_invoices,
-        "aging": aging,
-        "top_customers": top_customers,
-        "ca_series": ca_series,
-    }
+
+
+def _single_flight_section(company, keys, section, suffix, today, page_size, ttl):
+    """Calcul synchrone d'une section : un seul worker par clé (anti-stampede)."""
+    soft_ttl = ttl or DASHBOARD_SECTIONS[section][1]
+    hard_ttl = _hard_ttl(section, ttl)
+
+    def compute():
+        entry = _section_entry(company, section, today, page_size)
+        cache.set(_last_key(company.id, section, suffix), entry, hard_ttl)
+        return entry
+
+    return single_flight(
+        keys[section],
+        compute,
+        hard_ttl,
+        fresh=lambda e: time.time() - e["at"] <= soft_ttl,
+    )
+
+
+def refresh_dashboard_sections(company, sections=None, page_size=5):
+    """Recalcule et met en cache des sections (utilisé par le job RQ de refresh)."""
+    sections = list(sections or DASHBOARD_SECTIONS)
+    suffix = f":{page_size}"
+    keys = dashboard_cache_keys(company.id, sections, suffix=suffix)
+    today = timezone.now().date()
+    entries = {s: _section_entry(company, s, today, page_size) for s in sections}
+    _store_sections(company.id, keys, entries, suffix)
+    return entries
+
+
+REFRESH_LOCK_TTL = 120
+
+
+def dashboard_refresh_flag_key(company_id, page_size):
+    return f"dash:{company_id}:refreshing:{page_size}"
+
+
+def _schedule_refresh(company, sections, page_size):
+    """
+    Place un recalcul en file RQ "default" (au plus un en vol par company).
+    Renvoie False si la mise en file a échoué (l'appelant recalcule alors lui-même).
+    """
+    flag = dashboard_refresh_flag_key(company.id, page_size)
+    if not cache.add(flag, 1, REFRESH_LOCK_TTL):
+        return True  # un refresh est déjà en cours
+    try:
+        import django_rq
+
+        from .tasks import refresh_dashboard
+
+        django_rq.get_queue("default").enqueue(
+            refresh_dashboard, company.id, list(sections), page_size
+        )
+    except Exception:
+        cache.delete(flag)
+        return False
+    return True
+
+
+def compute_dashboard(
+    company,
+    page_size=5,
+    use_cache=True,
+    ttl=None,
+    stale_while_revalidate=False,
+    sections=None,
+):
+    """
+    Calcule les KPIs du dashboard.
+    - Cache par company et par section (TTL soft propre à chaque section, ou `ttl`)
+    - Seules les sections invalidées/expirées sont recalculées
+    - stale_while_revalidate=True : une section périmée (TTL soft dépassé ou
+      invalidée) est servie telle quelle et recalculée en tâche de fond (RQ) ;
+      `stale_seconds` indique l'âge de la plus vieille section servie périmée.
+    - sections : sous-ensemble de DASHBOARD_SECTIONS à calculer (défaut : toutes)
+    - Agrégats SQL sur les totaux dénormalisés (Invoice.total_cents)
+    """
+    today = timezone.now().date()
+    now = time.time()
+    sections = list(sections or DASHBOARD_SECTIONS)
+    suffix = f":{page_size}"
+    cached, last = {}, {}
     if use_cache:
-        cache.set(cache_key, data, ttl)
+        keys = dashboard_cache_keys(company.id, sections, suffix=suffix)
+        wanted = list(keys.values())
+        if stale_while_revalidate:
+            wanted += [_last_key(company.id, s, suffix) for s in sections]
+        found = cache.get_many(wanted)
+        cached = {s: found[k] for s, k in keys.items() if k in found}
+        last = {
+            s: found[_last_key(company.id, s, suffix)]
+            for s in sections
+            if _last_key(company.id, s, suffix) in found
+        }
+
+    def _compute(section):
+        if use_cache:
+            return _single_flight_section(
+                company, keys, section, suffix, today, page_size, ttl
+            )
+        return _section_entry(company, section, today, page_size)
+
+    data = {}
+    stale = []
+    stale_seconds = 0
+    for section in sections:
+        soft_ttl = ttl or DASHBOARD_SECTIONS[section][1]
+        entry = cached.get(section)
+        if entry is not None and now - entry["at"] <= soft_ttl:
+            data.update(entry["values"])
+            continue
+        entry = entry or last.get(section)
+        if stale_while_revalidate and entry is not None:
+            data.update(entry["values"])
+            stale.append(section)
+            stale_seconds = max(stale_seconds, round(now - entry["at"], 1))
+            continue
+        data.update(_compute(section)["values"])
+
+    if stale and not _schedule_refresh(company, stale, page_size):
+        # file indisponible : on retombe sur un calcul synchrone
+        for section in stale:
+            data.update(_compute(section)["values"])
+        stale, stale_seconds = [], 0
+    if stale and stale_seconds:
+        logger.info(
+            "dashboard: served stale sections %s for company %s (%ss old)",
+            ",".join(stale),
+            company.id,
+            stale_seconds,
+        )
+    data["stale_seconds"] = stale_seconds
     return data
+
+
+# --- Chiffres comptables (micro-entreprise / URSSAF) ---
+ACCOUNTING_SOFT_TTL = 600
+ACCOUNTING_HARD_TTL = 6 * 3600
+
+
+def current_urssaf_period(company, today):
+    """(début, fin) de la période URSSAF en cours (mensuelle ou trimestrielle)."""
+    if company.urssaf_frequency == "MENSUEL":
+        return today.replace(day=1), today
+    q = (today.month - 1) // 3
+    return today.replace(month=q * 3 + 1, day=1), today
+
+
+def request_revenue(request, company):
+    """PeriodRevenue de `company`, mémoïsé pour la durée de la requête."""
+    memo = request.__dict__.setdefault("_period_revenue", {})
+    if company.pk not in memo:
+        memo[company.pk] = PeriodRevenue(company)
+    return memo[company.pk]
+
+
+def _progress(amount, cap):
+    return round(float(amount / Decimal(cap) * 100), 2) if cap else 0.0
+
+
+def compute_accounting_figures(company, today=None, revenue=None):
+    """
+    CA cumulé, plafonds micro / franchise TVA et estimation URSSAF de la période.
+    Tous les CA de période passent par `revenue` (PeriodRevenue, mémoïsé).
+    """
+    today = today or timezone.now().date()
+    revenue = revenue or PeriodRevenue(company)
+    th = get_thresholds(today.year)
+
+    # CA cumulé depuis le 1er janvier (factures) + saisies manuelles éventuelles
+    year_start = today.replace(month=1, day=1)
+    inv_sum = _cents_to_euros(revenue.cents(year_start, today))
+    manual_sum = TurnoverEntry.objects.filter(
+        company=company, period_start__gte=year_start, period_end__lte=today
+    ).aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+    ca_ytd = inv_sum + manual_sum
+
+    # Plafonds micro
+    micro_cap = (
+        th.micro_cap_sales
+        if company.activity_kind == "VENTES"
+        else th.micro_cap_services
+    )
+
+    # Franchise TVA (selon activité, base + tolérance)
+    if company.activity_kind == "VENTES":
+        vat_base, vat_tol = th.vat_base_sales, th.vat_base_sales_tol
+    else:
+        vat_base, vat_tol = th.vat_base_services, th.vat_base_services_tol
+
+    # URSSAF – estimation période courante
+    period_start, period_end = current_urssaf_period(company, today)
+    # (au 1er trimestre / en janvier, même période que le CA cumulé : mémoïsé)
+    period_ca = _cents_to_euros(revenue.cents(period_start, period_end))
+    contrib, rate_label = compute_contributions(
+        company.activity_kind, period_ca, period_start.year
+    )
+
+    return {
+        "year": today.year,
+        "ca_ytd": ca_ytd,
+        "micro_cap": micro_cap,
+        "micro_progress": _progress(ca_ytd, micro_cap),
+        "vat_base": vat_base,
+        "vat_tol": vat_tol,
+        "vat_progress": _progress(ca_ytd, vat_base),
+        "period_start": period_start,
+        "period_end": period_end,
+        "period_ca": period_ca,
+        "contrib": contrib,
+        "urssaf_rate_label": rate_label,
+    }
+
+
+def _accounting_entry(company, today, revenue=None):
+    return {
+        "at": time.time(),
+        "values": compute_accounting_figures(company, today, revenue),
+    }
+
+
+def _accounting_key(company_id, today):
+    # version des plafonds / taux dans la clé : une modification admin est
+    # visible sans attendre l'expiration
+    suffix = f":{today.isoformat()}:{tables_version()}"
+    return dashboard_cache_keys(company_id, ["accounting"], suffix=suffix)["accounting"]
+
+
+def accounting_figures(company, use_cache=True, revenue=None):
+    """
+    compute_accounting_figures mis en cache (section "accounting" du namespace
+    dashboard, invalidée par les factures / saisies de CA), en single-flight.
+    - revenue : PeriodRevenue de la requête (request_revenue), partagé avec
+      les autres calculs de CA de la même requête
+    """
+    today = timezone.now().date()
+    if not use_cache:
+        return compute_accounting_figures(company, today, revenue)
+    entry = single_flight(
+        _accounting_key(company.id, today),
+        lambda: _accounting_entry(company, today, revenue),
+        ACCOUNTING_HARD_TTL,
+        fresh=lambda e: time.time() - e["at"] <= ACCOUNTING_SOFT_TTL,
+    )
+    return entry["values"]
+
+
+# --- Totaux de la période filtrée (page Comptabilité) ---
+PERIOD_TOTALS_TTL = 3600
+
+
+def compute_period_totals(company, start=None, end=None, client=None):
+    """
+    Totaux de toutes les factures du filtre (pas seulement de la page affichée),
+    par requêtes d'agrégat :
+    - HT / TVA / TTC / nombre, et ventilation par statut : colonnes dénormalisées
+    - ventilation par taux de TVA : core.revenue.vat_by_rate (GROUP BY exact)
+    """
+    qs = accounting_invoices(company, start, end, client)
+    sums = {
+        "count": Count("id"),
+        "ht": Sum("subtotal_cents"),
+        "tax": Sum("tax_cents"),
+        "ttc": Sum("total_cents"),
+    }
+    totals = qs.aggregate(**sums)
+    labels = dict(Invoice.STATUS)
+    by_status = [
+        {
+            "status": row["status"],
+            "label": labels.get(row["status"], row["status"]),
+            "count": row["count"],
+            "subtotal": _cents_to_euros(row["ht"]),
+            "vat_total": _cents_to_euros(row["tax"]),
+            "total_ttc": _cents_to_euros(row["ttc"]),
+        }
+        for row in qs.order_by().values("status").annotate(**sums).order_by("status")
+    ]
+
+    rates = vat_by_rate(
+        InvoiceItem.objects.filter(invoice__in=qs.order_by().values("pk"))
+    )
+    by_vat_rate = [
+        {
+            "rate": Decimal(bp) / 100,
+            "base": _cents_to_euros(ht),
+            "vat": _cents_to_euros(vat),
+        }
+        for bp, (ht, vat) in rates.items()
+    ]
+    return {
+        "count": totals["count"],
+        "subtotal": _cents_to_euros(totals["ht"]),
+        "vat_total": _cents_to_euros(totals["tax"]),
+        "total_ttc": _cents_to_euros(totals["ttc"]),
+        "by_status": by_status,
+        "by_vat_rate": by_vat_rate,
+    }
+
+
+def period_totals(company, start=None, end=None, client=None, use_cache=True):
+    """
+    compute_period_totals mis en cache par (company, filtre) ; section
+    "period_totals" du namespace dashboard, invalidée par les factures.
+    """
+    if not use_cache:
+        return compute_period_totals(company, start, end, client)
+    suffix = f":{start or ''}:{end or ''}:{client or ''}"
+    key = dashboard_cache_keys(company.id, ["period_totals"], suffix)["period_totals"]
+    return single_flight(
+        key,
+        lambda: compute_period_totals(company, start, end, client),
+        PERIOD_TOTALS_TTL,
+    )
+
+
+# --- Pré-chauffage du cache (commande warm_dashboard_cache / job RQ) ---
+WARMUP_SECTIONS = (*DASHBOARD_SECTIONS, "accounting")
+WARMUP_MARKER_TTL = 30 * 24 * 3600
+
+
+def _warmup_marker_key(company_id, page_size):
+    return f"dash:{company_id}:warmed:{page_size}"
+
+
+def warm_company_cache(company, page_size=5, force=False):
+    """
+    Pré-calcule dashboard (KPIs + insights) et chiffres comptables d'une company.
+    Sans activité depuis le dernier pré-chauffage (compteurs de version
+    inchangés), rien n'est recalculé : on prolonge seulement les dernières
+    valeurs connues, servies en stale-while-revalidate (les chiffres comptables,
+    dont la clé porte la date du jour, sont toutefois calculés s'ils manquent).
+    Renvoie True si la company a été recalculée, False si elle a été sautée.
+    """
+    suffix = f":{page_size}"
+    marker_key = _warmup_marker_key(company.id, page_size)
+    versions = _current_versions(company.id, WARMUP_SECTIONS)
+    last_keys = [_last_key(company.id, s, suffix) for s in DASHBOARD_SECTIONS]
+    today = timezone.now().date()
+    accounting_key = _accounting_key(company.id, today)
+    if not force and cache.get(marker_key) == versions:
+        # touch() renvoie False si la clé a disparu : il faut alors recalculer
+        if all(
+            cache.touch(k, _hard_ttl(s)) for k, s in zip(last_keys, DASHBOARD_SECTIONS)
+        ):
+            # clé comptable datée : froide à chaque nouveau jour, même sans activité
+            if not cache.touch(accounting_key, ACCOUNTING_HARD_TTL):
+                cache.set(
+                    accounting_key,
+                    _accounting_entry(company, today),
+                    ACCOUNTING_HARD_TTL,
+                )
+            return False
+
+    refresh_dashboard_sections(company, page_size=page_size)
+    cache.set(accounting_key, _accounting_entry(company, today), ACCOUNTING_HARD_TTL)
+    # versions lues AVANT le calcul : une écriture concurrente relancera le prochain run
+    cache.set(marker_key, versions, WARMUP_MARKER_TTL)
+    return True
+
+
+def warm_caches(batch_size=100, concurrency=4, page_size=5, force=False):
+    """
+    Parcourt les companies actives par lots (keyset sur pk) et les pré-chauffe,
+    au plus `concurrency` en parallèle. Génère (company, recalculée, secondes).
+    """
+
+    def _warm(company):
+        start = time.perf_counter()
+        try:
+            warmed = warm_company_cache(company, page_size=page_size, force=force)
+        finally:
+            if concurrency > 1:
+                connection.close()  # connexion propre au thread du pool
+        return company, warmed, time.perf_counter() - start
+
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        while True:
+            batch = list(
+                Company.objects.filter(active=True, pk__gt=last_pk).order_by("pk")[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            if concurrency > 1:
+                yield from pool.map(_warm, batch)
+            else:
+                yield from map(_warm, batch)
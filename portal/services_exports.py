@@ -0,0 +1,443 @@
+# portal/services_exports.py
+"""
+Exports comptables.
+- CSV comptable : lignes produites par un générateur qui lit les factures par
+  paquets (`.iterator(chunk_size=...)`) ; la mémoire reste constante quel que
+  soit le nombre de factures (StreamingHttpResponse ou fichier d'export).
+- Exports longs (ExportJob) : exécutés par un worker RQ, avancement suivi en
+  base, fichier produit sous MEDIA_ROOT/exports et expiré par cleanup_exports.
+"""
+
+import csv
+import io
+import os
+import time
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import pdf_cache
+from core.fec import (
+    FEC_COLUMNS,
+    SEPARATOR,
+    FecError,
+    FecValidator,
+    fec_filename,
+    fec_invoices,
+    fec_rows,
+)
+from core.models import (
+    Company,
+    Customer,
+    ExportJob,
+    Invoice,
+    InvoiceItem,
+    Quote,
+    QuoteItem,
+    TurnoverEntry,
+)
+from core.pdf import invoice_pdf_context
+from core.pdf_service import convert_many
+from core.pdf_store import is_persisted, store_document_pdf
+from core.totals import cents_to_decimal
+
+CHUNK_SIZE = 2000
+# factures lues (avec leurs lignes) par paquets de PDF_BUNDLE_CHUNK
+PDF_BUNDLE_CHUNK = 100
+
+ACCOUNTING_CSV_HEADER = [
+    "Invoice",
+    "Date",
+    "Customer",
+    "Status",
+    "Total HT (€)",
+    "TVA (€)",
+    "Total TTC (€)",
+]
+_ACCOUNTING_COLUMNS = (
+    "number",
+    "issue_date",
+    "customer__name",
+    "status",
+    "subtotal_cents",
+    "tax_cents",
+    "total_cents",
+)
+
+
+def parse_accounting_filters(params):
+    """
+    Filtres GET de la page Comptabilité -> (start, end, client_id) ;
+    valeurs invalides ignorées (None).
+    """
+    start = parse_date(params.get("start_date") or "")
+    end = parse_date(params.get("end_date") or "")
+    try:
+        client = int(params.get("client"))
+    except (ValueError, TypeError):
+        client = None
+    return start, end, client
+
+
+def accounting_invoices(company, start=None, end=None, client=None):
+    qs = Invoice.objects.filter(company=company)
+    if start:
+        qs = qs.filter(issue_date__gte=start)
+    if end:
+        qs = qs.filter(issue_date__lte=end)
+    if client is not None:
+        qs = qs.filter(customer_id=client)
+    return qs
+
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def accounting_csv_rows(qs, chunk_size=CHUNK_SIZE):
+    """
+    Génère le CSV comptable (BOM Excel, en-tête puis une ligne par facture).
+    Totaux lus depuis les colonnes dénormalisées : aucune lecture des lignes.
+    """
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(ACCOUNTING_CSV_HEADER)
+    rows = (
+        qs.order_by("-issue_date", "-pk")
+        .values_list(*_ACCOUNTING_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for number, issued, customer, status, ht, tax, ttc in rows:
+        yield writer.writerow(
+            [
+                number,
+                issued.isoformat() if issued else "",
+                customer or "",
+                status,
+                f"{cents_to_decimal(ht):.2f}",
+                f"{cents_to_decimal(tax):.2f}",
+                f"{cents_to_decimal(ttc):.2f}",
+            ]
+        )
+
+
+# --- Exports en tâche de fond (ExportJob) ---
+# chaque exportateur écrit le fichier de l'export et signale son avancement :
+#   exporter(job, out, progress) -> nb de lignes écrites
+#   out : fichier binaire ouvert en écriture ; progress(done, total=None)
+# `filename(job)` (optionnel) donne le nom du fichier téléchargé
+EXPORTERS = {}
+
+# délai de conservation des fichiers d'export (tâche cleanup_exports)
+EXPORT_RETENTION_HOURS = getattr(settings, "EXPORT_RETENTION_HOURS", 24)
+# fréquence d'écriture de l'avancement en base (secondes)
+PROGRESS_INTERVAL = 1.0
+
+
+def exporter(kind, extension, filename=None):
+    def register(func):
+        EXPORTERS[kind] = (func, extension, filename)
+        return func
+
+    return register
+
+
+def export_filename(job):
+    """Nom de téléchargement d'un export terminé."""
+    filename = EXPORTERS.get(job.kind, (None, None, None))[2]
+    return filename(job) if filename else os.path.basename(job.file.name)
+
+
+def exports_dir():
+    return os.path.join(settings.MEDIA_ROOT, "exports")
+
+
+class _Progress:
+    """Avancement d'un ExportJob, écrit en base au plus toutes les PROGRESS_INTERVAL s."""
+
+    def __init__(self, job, interval=PROGRESS_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.last = 0.0
+
+    def __call__(self, done, total=None, force=False):
+        job = self.job
+        job.rows_done = done
+        if total is not None:
+            job.rows_total = total
+        if job.rows_total:
+            job.progress = min(99, done * 100 // job.rows_total)
+        now = time.monotonic()
+        if force or now - self.last >= self.interval:
+            self.last = now
+            ExportJob.objects.filter(pk=job.pk).update(
+                rows_done=job.rows_done,
+                rows_total=job.rows_total,
+                progress=job.progress,
+                updated_at=timezone.now(),
+            )
+
+
+EXPORT_QUEUE_UNAVAILABLE = "File d'export indisponible, réessayez plus tard."
+
+
+def create_export(company, kind, params=None, user=None):
+    """
+    Crée un ExportJob et le place en file RQ "default".
+    File injoignable : job en échec ("file d'export indisponible"), sauf en
+    DEBUG ou avec EXPORT_INLINE_FALLBACK où l'export est exécuté sur place
+    (FEC d'une année, ZIP de PDF : plusieurs minutes dans la requête web).
+    """
+    if kind not in EXPORTERS:
+        raise ValueError(f"Type d'export non disponible : {kind}")
+    job = ExportJob.objects.create(
+        company=company, kind=kind, params=params or {}, requested_by=user
+    )
+    try:
+        import django_rq
+
+        from .tasks import run_export_job
+
+        rq_job = django_rq.get_queue("default").enqueue(run_export_job, job.pk)
+    except Exception:
+        if settings.DEBUG or getattr(settings, "EXPORT_INLINE_FALLBACK", False):
+            run_export(job)
+        else:
+            job.status, job.error = "FAILED", EXPORT_QUEUE_UNAVAILABLE
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+    else:
+        ExportJob.objects.filter(pk=job.pk).update(rq_job_id=rq_job.id)
+        job.rq_job_id = rq_job.id
+    return job
+
+
+def run_export(job):
+    """Exécute l'export `job` (worker) : fichier sous MEDIA_ROOT/exports, statut final."""
+    func, extension, _ = EXPORTERS[job.kind]
+    job.status, job.started_at, job.error = "RUNNING", timezone.now(), ""
+    job.save(update_fields=["status", "started_at", "error", "updated_at"])
+
+    os.makedirs(exports_dir(), exist_ok=True)
+    filename = f"{job.company_id}_{job.kind.lower()}_{job.pk}.{extension}"
+    path = os.path.join(exports_dir(), filename)
+    progress = _Progress(job)
+    try:
+        with open(path, "wb") as out:
+            rows = func(job, out, progress)
+    except Exception as exc:
+        if os.path.exists(path):
+            os.remove(path)
+        job.status, job.error = "FAILED", f"{type(exc).__name__}: {exc}"
+    else:
+        job.status, job.progress, job.rows_done = "SUCCESS", 100, rows
+        job.file.name = f"exports/{filename}"
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def cleanup_exports(retention_hours=None, now=None):
+    """
+    Expire les exports terminés depuis plus de `retention_hours` (fichier supprimé,
+    statut EXPIRED) et supprime les fichiers orphelins de MEDIA_ROOT/exports.
+    Renvoie le nombre de fichiers supprimés.
+    """
+    hours = EXPORT_RETENTION_HOURS if retention_hours is None else retention_hours
+    cutoff = (now or timezone.now()) - timedelta(hours=hours)
+    removed = 0
+    expired = ExportJob.objects.filter(
+        status__in=("SUCCESS", "FAILED"), finished_at__lt=cutoff
+    )
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+            removed += 1
+        job.status = "EXPIRED"
+        job.save(update_fields=["status", "file", "updated_at"])
+
+    # fichiers sans ExportJob actif (anciens exports, jobs supprimés)
+    directory = exports_dir()
+    if os.path.isdir(directory):
+        kept = set(
+            ExportJob.objects.exclude(file="")
+            .exclude(file__isnull=True)
+            .values_list("file", flat=True)
+        )
+        for entry in os.scandir(directory):
+            if (
+                entry.is_file()
+                and f"exports/{entry.name}" not in kept
+                and entry.stat().st_mtime < cutoff.timestamp()
+            ):
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+# --- Exportateurs ---
+@exporter("ACCOUNTING_CSV", "csv")
+def export_accounting_csv(job, out, progress):
+    qs = accounting_invoices(job.company, *parse_accounting_filters(job.params))
+    total = qs.count()
+    progress(0, total)
+    rows = accounting_csv_rows(qs)
+    out.write(next(rows).encode("utf-8"))  # en-tête
+    done = 0
+    for done, line in enumerate(rows, 1):
+        out.write(line.encode("utf-8"))
+        progress(done)
+    return done
+
+
+def bundle_invoices(company, params):
+    """
+    Factures d'un export PDF_BUNDLE : `invoice_ids`, ou filtres de la page
+    Comptabilité (start_date, end_date, client) et `status` ("ISSUED,PAID"...).
+    """
+    qs = accounting_invoices(company, *parse_accounting_filters(params))
+    if params.get("invoice_ids"):
+        qs = qs.filter(pk__in=params["invoice_ids"])
+    known = dict(Invoice.STATUS)
+    statuses = [s for s in str(params.get("status") or "").split(",") if s in known]
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+    return qs
+
+
+def _bundle_sources(invoices):
+    """
+    ((facture, clé du cache PDF à alimenter), PDF enregistré / en cache, ou
+    HTML à convertir) par facture : seules les factures sans PDF disponible
+    passent par xhtml2pdf.
+    """
+    use_cache = bool(pdf_cache.max_bytes())
+    for chunk in _chunks(invoices, PDF_BUNDLE_CHUNK):
+        for inv in chunk:
+            if is_persisted(inv) and inv.pdf:
+                try:
+                    with inv.pdf.open("rb") as fh:
+                        yield (inv, None), fh.read()
+                    continue
+                except FileNotFoundError:
+                    pass
+            html = render_to_string("pdf/invoice.html", invoice_pdf_context(inv))
+            cached = None
+            key = (
+                pdf_cache.pdf_cache_key("pdf/invoice.html", html) if use_cache else None
+            )
+            if key:
+                cached = pdf_cache.get_cached_pdf(key)
+            if cached is not None:
+                yield (inv, None), cached
+            else:
+                yield (inv, key), html
+
+
+@exporter("PDF_BUNDLE", "zip")
+def export_pdf_bundle(job, out, progress):
+    """
+    Archive ZIP des PDF des factures filtrées (bundle_invoices), écrite
+    entrée par entrée dans le fichier d'export. Conversions en parallèle sur
+    PDF_BUNDLE_WORKERS processus (core.pdf_service.convert_many) ; seuls
+    quelques PDF sont en mémoire à la fois. Les PDF produits alimentent le
+    cache et le champ `pdf` des factures émises.
+    """
+    qs = bundle_invoices(job.company, job.params)
+    total = qs.count()
+    progress(0, total)
+    invoices = (
+        qs.select_related("customer", "company")
+        .prefetch_related("items")
+        .order_by("issue_date", "pk")
+        .iterator(chunk_size=PDF_BUNDLE_CHUNK)
+    )
+    names = set()
+    done = 0
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        for (inv, key), pdf in convert_many(_bundle_sources(invoices)):
+            if key:
+                pdf_cache.store_pdf(key, pdf)
+            if is_persisted(inv) and not inv.pdf:
+                store_document_pdf(inv, pdf)
+            name = f"invoice_{inv.number}.pdf"
+            if name in names:  # numéros en double : suffixe par id
+                name = f"invoice_{inv.number}_{inv.pk}.pdf"
+            names.add(name)
+            archive.writestr(name, pdf)
+            done += 1
+            progress(done)
+    return done
+
+
+def _fec_year(job):
+    return int(job.params.get("year") or timezone.now().year - 1)
+
+
+@exporter("FEC", "txt", lambda job: fec_filename(job.company, _fec_year(job)))
+def export_fec(job, out, progress):
+    """
+    FEC des ventes de l'exercice `params["year"]` (défaut : année précédente),
+    produit par paquets et contrôlé au fil de l'eau (équilibre par écriture) ;
+    un fichier déséquilibré fait échouer l'export.
+    """
+    year = _fec_year(job)
+    progress(0, fec_invoices(job.company, year).count())
+    validator = FecValidator(year)
+    out.write((SEPARATOR.join(FEC_COLUMNS) + "\r\n").encode("utf-8"))
+    rows = fec_rows(job.company, year, progress=progress)
+    for fields in validator.check(rows):
+        out.write((SEPARATOR.join(fields) + "\r\n").encode("utf-8"))
+    if not validator.close():
+        raise FecError("; ".join(validator.errors))
+    return validator.lines
+
+
+# données d'une company, dans l'ordre de rechargement (loaddata)
+TENANT_MODELS = (
+    (Company, "pk"),
+    (Customer, "company"),
+    (Quote, "company"),
+    (QuoteItem, "quote__company"),
+    (Invoice, "company"),
+    (InvoiceItem, "invoice__company"),
+    (TurnoverEntry, "company"),
+)
+
+
+@exporter("TENANT_DUMP", "jsonl")
+def export_tenant_dump(job, out, progress):
+    """Dump JSON Lines (format loaddata "jsonl") des données de la company."""
+    querysets = [
+        model.objects.filter(**{lookup: job.company.pk}).order_by("pk")
+        for model, lookup in TENANT_MODELS
+    ]
+    total = sum(qs.count() for qs in querysets)
+    progress(0, total)
+    stream = io.TextIOWrapper(out, encoding="utf-8", write_through=True)
+    done = 0
+    for qs in querysets:
+        for chunk in _chunks(qs.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+            serializers.serialize("jsonl", chunk, stream=stream)
+            done += len(chunk)
+            progress(done)
+    stream.detach()  # laisse `out` ouvert pour run_export
+    return done
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for obj in iterable:
+        chunk.append(obj)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -4,89 +4,181 @@ Calcul d'insights pour le dashboard.
 Contient des règles simples (extensibles) :
 - marge faible : lorsqu'une facture applique une remise importante (proxy de marge)
 - client perdu : client sans facturation depuis N mois
-"""
-from datetime import timedelta
-from decimal import ROUND_HALF_UP, Decimal
 
+Les insights affichés sont persistés (core.Insight) par refresh_insights,
+exécuté en tâche de fond pour les seules factures / clients modifiés.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from core.models import Customer, Invoice
+from core.models import Insight
 
-Q2 = Decimal("0.01")
+from .insight_rules import RULES, lost_cutoff, run_rules
 
+LOW_MARGIN_THRESHOLD_PCT = 20
+LOST_MONTHS = 6
+# durée max du drapeau "premier calcul complet en file" (job perdu / worker arrêté)
+FULL_PENDING_TTL = 600
+
+# sujet d'une règle -> filtre des factures à relire pour ces sujets
+SUBJECT_SCOPES = {
+    "invoice_id": "pk__in",
+    "customer_id": "customer_id__in",
+}
 
-def _quantize(d):
-    return (d if isinstance(d, Decimal) else Decimal(d)).quantize(
-        Q2, rounding=ROUND_HALF_UP
-    )
 
+def _rule_params(low_margin_threshold_pct, lost_months, lost_since=None):
+    return {
+        "low_margin_invoice": {"threshold_pct": low_margin_threshold_pct},
+        "lost_client": {"lost_months": lost_months, "lost_since": lost_since},
+    }
 
-def compute_insights(company, low_margin_threshold_pct=20, lost_months=6):
+
+def compute_insights(
+    company,
+    low_margin_threshold_pct=LOW_MARGIN_THRESHOLD_PCT,
+    lost_months=LOST_MONTHS,
+    timings=None,
+):
     """
-    Retourne une liste d'insights (dict).
+    Retourne une liste d'insights (dict), toutes règles de portal.insight_rules
+    évaluées en un seul parcours des factures.
     Paramètres :
       - low_margin_threshold_pct : seuil (%) de remise qui déclenche "marge faible"
       - lost_months : nombre de mois sans facturation pour considérer un client "perdu"
+      - timings : dict optionnel rempli avec le temps passé par règle
+    """
+    results = run_rules(
+        company,
+        params=_rule_params(low_margin_threshold_pct, lost_months),
+        timings=timings,
+    )
+    return [i for name in RULES for i in results[name]]
+
+
+# --- Persistance (core.Insight) et réévaluation incrémentale ---
+def _last_run_key(company_id):
+    return f"insights:{company_id}:last_run"
+
+
+def insights_full_pending_key(company_id):
+    return f"insights:{company_id}:full_pending"
+
+
+def _store_insights(company, insight_type, insights, subject_ids=None):
+    """Remplace les insights d'un type (tous, ou seulement ceux des sujets donnés)."""
+    subject_key = RULES[insight_type].subject
+    now = timezone.now()
+    with transaction.atomic():
+        qs = Insight.objects.filter(company=company, type=insight_type)
+        if subject_ids is not None:
+            qs = qs.filter(subject_id__in=subject_ids)
+        qs.delete()
+        Insight.objects.bulk_create(
+            [
+                Insight(
+                    company=company,
+                    type=insight_type,
+                    subject_id=i[subject_key],
+                    severity=i["severity"],
+                    payload=i,
+                    computed_at=now,
+                )
+                for i in insights
+            ],
+            # deux jobs concurrents sur les mêmes sujets : le second est ignoré
+            ignore_conflicts=True,
+        )
+
 
-    NOTE : le modèle actuel ne contient pas de `unit_cost_cents`, on utilise donc la
-    **remise appliquée** comme proxy de marge faible. Si tu ajoutes plus tard
-    un champ coût, on pourra basculer sur une marge réelle coût/prix.
+def refresh_insights(company, invoice_ids=None, customer_ids=None, full=False):
+    """
+    Met à jour la table d'insights d'une company.
+    - full=True (ou premier passage) : réévalue toutes les règles
+    - sinon : seulement les factures / clients indiqués (un parcours restreint
+      par type de sujet), plus les clients devenus "perdus" par simple
+      écoulement du temps depuis le dernier passage
+    Renvoie le nombre d'insights écrits.
     """
-    insights = []
     today = timezone.now().date()
+    last_run = cache.get(_last_run_key(company.id))
+    params = _rule_params(LOW_MARGIN_THRESHOLD_PCT, LOST_MONTHS)
+    written = 0
+    if full or last_run is None:
+        for name, insights in run_rules(company, params=params).items():
+            _store_insights(company, name, insights)
+            written += len(insights)
+    else:
+        subjects = {
+            "invoice_id": set(invoice_ids or ()),
+            "customer_id": set(customer_ids or ()),
+        }
+        if last_run < today:
+            drift = run_rules(
+                company,
+                ["lost_client"],
+                params=_rule_params(
+                    LOW_MARGIN_THRESHOLD_PCT,
+                    LOST_MONTHS,
+                    lost_since=lost_cutoff(last_run, LOST_MONTHS),
+                ),
+            )["lost_client"]
+            subjects["customer_id"] |= {i["customer_id"] for i in drift}
+        for subject, ids in subjects.items():
+            names = [n for n, rule in RULES.items() if rule.subject == subject]
+            if not ids or not names:
+                continue
+            scope = Q(**{SUBJECT_SCOPES[subject]: ids})
+            results = run_rules(company, names, invoice_filter=scope, params=params)
+            for name, insights in results.items():
+                _store_insights(company, name, insights, ids)
+                written += len(insights)
+    cache.set(_last_run_key(company.id), today, None)
+    return written
 
-    # --- Règle 1 : marge faible (proxy = remise importante) ---
-    inv_qs = Invoice.objects.filter(
-        company=company, status__in=["ISSUED", "PAID"]
-    ).prefetch_related("items")
-    for inv in inv_qs:
-        subtotal = Decimal("0.00")
-        discount_total = Decimal("0.00")
-        for it in inv.items.all():
-            q = Decimal(it.quantity)
-            unit = Decimal(it.unit_price_cents) / Decimal(100)
-            base = q * unit
-            disc_pct = Decimal(it.discount_pct or 0) / Decimal(100)
-            discount = base * disc_pct
-            subtotal += base
-            discount_total += discount
-
-        # évite la division par zéro
-        if subtotal > Decimal("0.00"):
-            disc_ratio = (discount_total / subtotal) * Decimal("100")
-            if disc_ratio >= Decimal(low_margin_threshold_pct):
-                insights.append(
-                    {
-                        "type": "low_margin_invoice",
-                        "title": "Marge faible",
-                        "invoice_id": inv.pk,
-                        "invoice_number": inv.number,
-                        "discount_pct": float(_quantize(disc_ratio)),
-                        "severity": "warning",
-                        "message": f"Remise {float(_quantize(disc_ratio)):.1f}% sur la facture {inv.number}",
-                    }
-                )
 
-    # --- Règle 2 : client perdu (pas de facture depuis N mois) ---
-    cutoff = today - timedelta(days=30 * lost_months)  # approximation 30j/mois
-    customers = Customer.objects.filter(company=company)
-    for c in customers:
-        last_inv = (
-            Invoice.objects.filter(company=company, customer=c)
-            .order_by("-issue_date")
-            .first()
-        )
-        if last_inv:
-            if last_inv.issue_date < cutoff:
-                insights.append(
-                    {
-                        "type": "lost_client",
-                        "title": "Client potentiellement perdu",
-                        "customer_id": c.pk,
-                        "customer_name": c.name,
-                        "last_invoice_date": last_inv.issue_date.isoformat(),
-                        "severity": "info",
-                        "message": f"Aucune facturation depuis le {last_inv.issue_date.isoformat()} pour {c.name}",
-                    }
-                )
-    return insights
+def persisted_insights(company):
+    """Insights lus dans la table (même format que compute_insights)."""
+    order = {t: n for n, t in enumerate(RULES)}
+    rows = (
+        Insight.objects.filter(company=company)
+        .order_by("subject_id")
+        .values_list("type", "payload")
+    )
+    return [p for _, p in sorted(rows, key=lambda r: order.get(r[0], len(order)))]
+
+
+def insights_ever_computed(company_id):
+    return cache.get(_last_run_key(company_id)) is not None
+
+
+def schedule_insights_refresh(
+    company_id, invoice_ids=None, customer_ids=None, full=False
+):
+    """
+    Place une réévaluation en file RQ "default", après commit de la transaction
+    courante (le job doit voir les écritures).
+    """
+
+    def _enqueue():
+        try:
+            import django_rq
+
+            from .tasks import refresh_company_insights
+
+            django_rq.get_queue("default").enqueue(
+                refresh_company_insights,
+                company_id,
+                sorted(invoice_ids or ()),
+                sorted(customer_ids or ()),
+                full,
+            )
+        except Exception:
+            # file indisponible : le prochain passage sera complet
+            cache.delete_many(
+                [_last_run_key(company_id), insights_full_pending_key(company_id)]
+            )
+
+    transaction.on_commit(_enqueue)
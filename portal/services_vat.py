@@ -0,0 +1,134 @@
+# portal/services_vat.py
+"""
+Déclaration de TVA (CA3) : base HT et TVA collectée par taux, sur un mois ou
+un trimestre, pour les factures comptabilisées de la période (mêmes statuts
+que l'export FEC : la TVA déclarée se rapproche des soldes 4457x).
+
+Le rapport d'une période close (terminée avant aujourd'hui) est mis en cache
+dans la section "vat" du namespace dashboard : une facture créée, re-datée,
+modifiée ou annulée dans la période l'invalide ; la période en cours est
+recalculée.
+"""
+
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.fec import POSTED_STATUSES
+from core.models import InvoiceItem
+from core.revenue import month_end, month_start, vat_by_rate
+from core.totals import cents_to_decimal
+
+from .services import dashboard_cache_keys
+
+# factures retenues pour la TVA collectée : celles passées en écriture (FEC)
+VAT_STATUSES = POSTED_STATUSES
+VAT_REPORT_TTL = 30 * 24 * 3600
+
+VatPeriod = namedtuple("VatPeriod", "key label start end")
+
+_MONTHS = (
+    "janvier",
+    "février",
+    "mars",
+    "avril",
+    "mai",
+    "juin",
+    "juillet",
+    "août",
+    "septembre",
+    "octobre",
+    "novembre",
+    "décembre",
+)
+_PERIOD_RE = re.compile(r"^(\d{4})-(?:(0[1-9]|1[0-2])|Q([1-4]))$")
+
+
+def month_period(year, month):
+    start = date(year, month, 1)
+    return VatPeriod(
+        f"{year}-{month:02d}", f"{_MONTHS[month - 1]} {year}", start, month_end(start)
+    )
+
+
+def quarter_period(year, quarter):
+    start = date(year, 3 * quarter - 2, 1)
+    end = month_end(date(year, 3 * quarter, 1))
+    return VatPeriod(f"{year}-Q{quarter}", f"T{quarter} {year}", start, end)
+
+
+def parse_vat_period(value, today=None):
+    """
+    "AAAA-MM" (mois) ou "AAAA-Qn" (trimestre) -> VatPeriod.
+    Valeur absente ou invalide : mois précédent.
+    """
+    m = _PERIOD_RE.match(value or "")
+    if m:
+        year = int(m.group(1))
+        if m.group(2):
+            return month_period(year, int(m.group(2)))
+        return quarter_period(year, int(m.group(3)))
+    today = today or timezone.now().date()
+    previous = month_start(today) - timedelta(days=1)
+    return month_period(previous.year, previous.month)
+
+
+def recent_vat_periods(today, months=12, quarters=6):
+    """Périodes closes proposées au choix : derniers mois et derniers trimestres."""
+    month_list, quarter_list = [], []
+    year, month = today.year, today.month
+    for _ in range(months):
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        month_list.append(month_period(year, month))
+    year, quarter = today.year, (today.month - 1) // 3 + 1
+    for _ in range(quarters):
+        year, quarter = (year, quarter - 1) if quarter > 1 else (year - 1, 4)
+        quarter_list.append(quarter_period(year, quarter))
+    return month_list, quarter_list
+
+
+def compute_vat_report(company, period):
+    rates = vat_by_rate(
+        InvoiceItem.objects.filter(
+            invoice__company=company,
+            invoice__status__in=VAT_STATUSES,
+            invoice__issue_date__gte=period.start,
+            invoice__issue_date__lte=period.end,
+        )
+    )
+    rows = [
+        {
+            "rate": Decimal(bp) / 100,
+            "base": cents_to_decimal(ht),
+            "vat": cents_to_decimal(vat),
+        }
+        for bp, (ht, vat) in rates.items()
+    ]
+    return {
+        "period": period,
+        "rows": rows,
+        "total_base": cents_to_decimal(sum(ht for ht, _ in rates.values())),
+        "total_vat": cents_to_decimal(sum(vat for _, vat in rates.values())),
+    }
+
+
+def _vat_key(company_id, period):
+    return dashboard_cache_keys(company_id, ["vat"], f":{period.key}")["vat"]
+
+
+def vat_report(company, period, today=None, use_cache=True):
+    """Rapport de TVA de `period` ; mis en cache une fois la période close."""
+    today = today or timezone.now().date()
+    closed = period.end < today
+    if not (use_cache and closed):
+        return compute_vat_report(company, period)
+    key = _vat_key(company.id, period)
+    report = cache.get(key)
+    if report is None:
+        report = compute_vat_report(company, period)
+        cache.set(key, report, VAT_REPORT_TTL)
+    return report
@@ -1,13 +1,33 @@
 # portal/signals.py
+import threading
+
 from django.apps import apps as django_apps
-from django.db.models.signals import post_delete, post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
+from core.accounting import invalidate_accounting_tables
+from core.pdf_store import clear_document_pdf
+from core.revenue import (
+    refresh_monthly_revenue,
+    refresh_monthly_revenue_for_invoice,
+)
+from core.services import refresh_document_totals
+
 # Import de la fonction d'invalidation (doit exister dans portal/services.py)
-from .services import invalidate_dashboard_cache
+from .services import INVOICE_SECTIONS, invalidate_dashboard_cache
+from .services_insights import schedule_insights_refresh
 
 # Récupère les modèles dynamiquement pour éviter ImportError si absent
+Company = django_apps.get_model("core", "Company")
+Customer = django_apps.get_model("core", "Customer")
 Invoice = django_apps.get_model("core", "Invoice")
+InvoiceItem = django_apps.get_model("core", "InvoiceItem")
+Quote = django_apps.get_model("core", "Quote")
+QuoteItem = django_apps.get_model("core", "QuoteItem")
+TurnoverEntry = django_apps.get_model("core", "TurnoverEntry")
+LegalThresholds = django_apps.get_model("core", "LegalThresholds")
+UrssafRate = django_apps.get_model("core", "UrssafRate")
 Payment = None
 try:
     Payment = django_apps.get_model("core", "Payment")
@@ -15,18 +35,183 @@ except LookupError:
     Payment = None
 
 
+def _invoice_sections(*statuses):
+    # aging/série ne portent que sur les factures ISSUED : une facture qui ne l'est
+    # ni avant ni après la modification ne touche que les listes.
+    if "ISSUED" in statuses:
+        return INVOICE_SECTIONS
+    return ("top_customers", "recent_invoices", "accounting", "period_totals", "vat")
+
+
+@receiver(pre_save, sender=Invoice)
+def invoice_pre_save(sender, instance, **kwargs):
+    # mémorise le mois d'origine : une facture re-datée touche deux mois d'agrégat
+    instance._old_month = None
+    instance._old_status = None
+    instance._old_customer_id = None
+    if instance.pk:
+        old = (
+            Invoice.objects.filter(pk=instance.pk)
+            .values_list("company_id", "issue_date", "status", "customer_id")
+            .first()
+        )
+        if old:
+            instance._old_status = old[2]
+            instance._old_customer_id = old[3]
+            if old[1]:
+                instance._old_month = (old[0], old[1].year, old[1].month)
+
+
 @receiver(post_save, sender=Invoice)
 def invoice_saved(sender, instance, **kwargs):
-    company = getattr(instance, "company", None)
-    if company:
-        invalidate_dashboard_cache(company.id)
+    invalidate_dashboard_cache(
+        instance.company_id,
+        _invoice_sections(getattr(instance, "_old_status", None), instance.status),
+    )
+    months = {getattr(instance, "_old_month", None)}
+    # to_python : accepte aussi une date brute (chaîne, datetime par défaut)
+    issue_date = Invoice._meta.get_field("issue_date").to_python(instance.issue_date)
+    if issue_date:
+        months.add((instance.company_id, issue_date.year, issue_date.month))
+    for month in months - {None}:
+        refresh_monthly_revenue(*month)
+    customers = {getattr(instance, "_old_customer_id", None), instance.customer_id}
+    schedule_insights_refresh(
+        instance.company_id,
+        invoice_ids=[instance.pk],
+        customer_ids=customers - {None},
+    )
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Quote)
+def document_edited(sender, instance, created, **kwargs):
+    # PDF enregistré périmé : régénéré au prochain téléchargement
+    # (l'enregistrement du PDF lui-même passe par update(), sans signal)
+    if not created:
+        clear_document_pdf(sender, instance.pk)
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Quote)
+def document_deleted_pdf(sender, instance, **kwargs):
+    if instance.pdf:
+        instance.pdf.delete(save=False)
 
 
 @receiver(post_delete, sender=Invoice)
 def invoice_deleted(sender, instance, **kwargs):
-    company = getattr(instance, "company", None)
-    if company:
-        invalidate_dashboard_cache(company.id)
+    invalidate_dashboard_cache(instance.company_id, _invoice_sections(instance.status))
+    if instance.issue_date:
+        refresh_monthly_revenue(
+            instance.company_id, instance.issue_date.year, instance.issue_date.month
+        )
+    schedule_insights_refresh(
+        instance.company_id,
+        invoice_ids=[instance.pk],
+        customer_ids=[instance.customer_id] if instance.customer_id else None,
+    )
+
+
+@receiver(post_save, sender=TurnoverEntry)
+@receiver(post_delete, sender=TurnoverEntry)
+def turnover_entry_changed(sender, instance, **kwargs):
+    invalidate_dashboard_cache(instance.company_id, ["cash", "accounting"])
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, **kwargs):
+    # nom du client repris dans l'insight "client perdu"
+    if not created:
+        schedule_insights_refresh(instance.company_id, customer_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Company)
+def company_saved(sender, instance, created, **kwargs):
+    # activité / périodicité URSSAF modifiées : plafonds et période changent
+    if not created:
+        invalidate_dashboard_cache(instance.pk, ["accounting"])
+
+
+@receiver(post_save, sender=LegalThresholds)
+@receiver(post_delete, sender=LegalThresholds)
+@receiver(post_save, sender=UrssafRate)
+@receiver(post_delete, sender=UrssafRate)
+def accounting_tables_changed(sender, instance, **kwargs):
+    # tables en mémoire de chaque processus + figures "accounting" en cache
+    # (la version des tables fait partie de leur clé)
+    invalidate_accounting_tables()
+
+
+# --- Totaux dénormalisés : recalculés après chaque changement de lignes ---
+# (formsets, inlines admin, suppressions en cascade ; bulk_create → rebuild_document_totals)
+# Les documents touchés sont regroupés par transaction : N lignes enregistrées
+# donnent un seul recalcul / rafraîchissement du mois / invalidation / job
+# insights par document, au commit. Les lignes d'une facture elle-même en cours
+# de suppression sont ignorées (invoice_deleted rafraîchit déjà le mois).
+_changed = threading.local()
+
+
+def _state():
+    if not hasattr(_changed, "docs"):
+        _changed.docs = {Invoice: set(), Quote: set()}
+        _changed.deleting = {Invoice: set(), Quote: set()}
+    return _changed
+
+
+def _item_changed(model, document_id):
+    state = _state()
+    if document_id in state.deleting[model]:
+        return
+    state.docs[model].add(document_id)
+    # un rappel par ligne, le premier traite tout le lot (les suivants : lot vide)
+    transaction.on_commit(_flush_changed_documents)
+
+
+def _flush_changed_documents():
+    state = _state()
+    quote_ids, state.docs[Quote] = state.docs[Quote], set()
+    invoice_ids, state.docs[Invoice] = state.docs[Invoice], set()
+    for pk in quote_ids:
+        refresh_document_totals(Quote, pk)
+        clear_document_pdf(Quote, pk)
+    by_company = {}
+    for pk in invoice_ids:
+        refresh_document_totals(Invoice, pk)
+        clear_document_pdf(Invoice, pk)
+        company_id = refresh_monthly_revenue_for_invoice(pk)
+        if company_id:
+            by_company.setdefault(company_id, []).append(pk)
+    for company_id, pks in by_company.items():
+        invalidate_dashboard_cache(company_id, INVOICE_SECTIONS)
+        schedule_insights_refresh(company_id, invoice_ids=pks)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def invoice_item_changed(sender, instance, **kwargs):
+    _item_changed(Invoice, instance.invoice_id)
+
+
+@receiver(post_save, sender=QuoteItem)
+@receiver(post_delete, sender=QuoteItem)
+def quote_item_changed(sender, instance, **kwargs):
+    _item_changed(Quote, instance.quote_id)
+
+
+@receiver(pre_delete, sender=Invoice)
+@receiver(pre_delete, sender=Quote)
+def document_deleting(sender, instance, **kwargs):
+    # envoyé avant la suppression en cascade des lignes
+    _state().deleting[sender].add(instance.pk)
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Quote)
+def document_deleted(sender, instance, **kwargs):
+    state = _state()
+    state.deleting[sender].discard(instance.pk)
+    state.docs[sender].discard(instance.pk)
 
 
 # Si Payment existe, on connecte les handlers aussi
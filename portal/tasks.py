@@ -2,35 +2,83 @@
 """
 Tâches background liées à l'export / traitements longs.
 """
-import os
-
-from django.conf import settings
-from django.utils import timezone
-
-from core.models import Invoice
-
-
-def heavy_export_invoice(invoice_pk: int) -> str:
-    """
-    Tâche longue (exécutée par RQ) qui exporte une facture.
-    Implémentation minimale : crée un fichier texte dans MEDIA_ROOT/exports/
-    pour prouver que la tâche a bien été exécutée par le worker.
-
-    Remarque : remplacer par génération PDF réelle si tu veux.
-    Retourne le chemin du fichier écrit.
-    """
-    inv = Invoice.objects.get(pk=invoice_pk)
-    out_dir = os.path.join(settings.MEDIA_ROOT, "exports")
-    os.makedirs(out_dir, exist_ok=True)
-    filename = os.path.join(
-        out_dir, f"invoice_{inv.pk}_{timezone.now().strftime('%Y%m%d%H%M%S')}.txt"
-    )
-    content = (
-        f"Export de la facture {inv.number}\n"
-        f"Entreprise: {inv.company}\n"
-        f"Client: {getattr(inv.customer, 'name', '—')}\n"
-        f"Issue date: {inv.issue_date}\n"
-    ).encode("utf-8")
-    with open(filename, "wb") as fh:
-        fh.write(content)
-    return filename
+
+from django.core.cache import cache
+
+from core.models import Company, ExportJob
+
+from .services import (
+    dashboard_refresh_flag_key,
+    invalidate_dashboard_cache,
+    refresh_dashboard_sections,
+    warm_caches,
+)
+from .services_exports import cleanup_exports, run_export
+from .services_insights import insights_full_pending_key, refresh_insights
+
+
+def run_export_job(job_id: int) -> str:
+    """
+    Exécute un ExportJob (CSV comptable, lot de PDF, dump…) ; voir
+    portal.services_exports. Renvoie le statut final.
+    """
+    job = ExportJob.objects.select_related("company").filter(pk=job_id).first()
+    if job is None or job.status != "PENDING":
+        return job.status if job else "MISSING"
+    return run_export(job).status
+
+
+def cleanup_export_files(retention_hours=None) -> int:
+    """
+    Expire les exports anciens et supprime leurs fichiers de MEDIA_ROOT/exports
+    (commande `cleanup_exports --enqueue`, cron / rq-scheduler).
+    """
+    return cleanup_exports(retention_hours)
+
+
+def refresh_dashboard(company_id: int, sections=None, page_size: int = 5) -> list:
+    """
+    Recalcule en tâche de fond les sections périmées du dashboard
+    (mode stale-while-revalidate de portal.services.compute_dashboard).
+    """
+    try:
+        company = Company.objects.get(pk=company_id)
+        return list(refresh_dashboard_sections(company, sections, page_size))
+    finally:
+        cache.delete(dashboard_refresh_flag_key(company_id, page_size))
+
+
+def refresh_company_insights(
+    company_id: int, invoice_ids=None, customer_ids=None, full: bool = False
+) -> int:
+    """
+    Réévalue les insights persistés d'une company (factures / clients touchés,
+    ou tout si full) puis invalide la section "insights" du dashboard.
+    """
+    try:
+        company = Company.objects.filter(pk=company_id).first()
+        if company is None:
+            return 0
+        written = refresh_insights(
+            company, invoice_ids=invoice_ids, customer_ids=customer_ids, full=full
+        )
+        invalidate_dashboard_cache(company_id, ["insights"])
+        return written
+    finally:
+        cache.delete(insights_full_pending_key(company_id))
+
+
+def warm_dashboard_caches(
+    batch_size: int = 100, concurrency: int = 4, force: bool = False
+) -> dict:
+    """
+    Pré-chauffe les caches (dashboard, insights, chiffres comptables) de toutes
+    les companies actives ; à planifier avant le pic du matin
+    (commande `warm_dashboard_cache --enqueue`, cron / rq-scheduler).
+    """
+    warmed, skipped = [], []
+    for company, did_warm, _ in warm_caches(
+        batch_size=batch_size, concurrency=concurrency, force=force
+    ):
+        (warmed if did_warm else skipped).append(company.id)
+    return {"warmed": warmed, "skipped": skipped}
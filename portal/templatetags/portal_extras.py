@@ -3,6 +3,7 @@ from decimal import Decimal, InvalidOperation
 from django import template
 
 from core.models import Membership
+from core.pdf_store import pdf_version as _pdf_version
 
 register = template.Library()
 
@@ -12,6 +13,13 @@ def get_item(d, key):
     return d.get(key, [])
 
 
+@register.filter
+def pdf_version(fieldfile):
+    """ "?v=<empreinte>" du PDF enregistré (URL en cache longue durée), sinon ""."""
+    version = _pdf_version(getattr(fieldfile, "name", ""))
+    return f"?v={version}" if version else ""
+
+
 @register.simple_tag(takes_context=True)
 def nav_active(context, target: str, cls="nav-active"):
     req = context.get("request")
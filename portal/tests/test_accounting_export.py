@@ -0,0 +1,72 @@
+# portal/tests/test_accounting_export.py
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Company, Customer, Invoice, InvoiceItem, Membership
+from portal.services_exports import accounting_csv_rows, accounting_invoices
+
+
+class AccountingCsvExportTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="CsvCo")
+        self.user = User.objects.create_user(username="csv", password="pw")
+        Membership.objects.create(user=self.user, company=self.company)
+        self.c1 = Customer.objects.create(company=self.company, name="Alpha")
+        self.c2 = Customer.objects.create(company=self.company, name="Beta")
+        self._invoice("F-1", self.c1, date(2025, 1, 10), 10000)
+        self._invoice("F-2", self.c2, date(2025, 2, 10), 20000)
+        self._invoice("F-3", self.c1, date(2025, 3, 10), 30000)
+        self.client.force_login(self.user)
+
+    def _invoice(self, number, customer, issued, cents):
+        inv = Invoice.objects.create(
+            company=self.company,
+            customer=customer,
+            number=number,
+            issue_date=issued,
+            status="ISSUED",
+        )
+        # lignes : totaux recalculés au commit
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv, description="x", unit_price_cents=cents, vat_rate=20
+            )
+        return inv
+
+    def _export(self, **params):
+        resp = self.client.get(
+            reverse("portal:accounting"), {"export": "csv", **params}
+        )
+        self.assertIsInstance(resp, StreamingHttpResponse)
+        body = b"".join(resp.streaming_content).decode("utf-8")
+        return body.lstrip("\ufeff").splitlines()
+
+    def test_streams_all_invoices(self):
+        lines = self._export()
+        self.assertTrue(lines[0].startswith("Invoice,Date,Customer"))
+        self.assertEqual(
+            lines[1:],
+            [
+                "F-3,2025-03-10,Alpha,ISSUED,300.00,60.00,360.00",
+                "F-2,2025-02-10,Beta,ISSUED,200.00,40.00,240.00",
+                "F-1,2025-01-10,Alpha,ISSUED,100.00,20.00,120.00",
+            ],
+        )
+
+    def test_honors_date_and_client_filters(self):
+        lines = self._export(
+            start_date="2025-01-01", end_date="2025-02-28", client=str(self.c1.pk)
+        )
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], ["F-1"])
+
+    def test_rows_read_in_chunks_without_items(self):
+        qs = accounting_invoices(self.company)
+        # une requête par paquet (sans lecture des lignes de facture)
+        with self.assertNumQueries(1):
+            rows = list(accounting_csv_rows(qs, chunk_size=2))
+        self.assertEqual(len(rows), 4)
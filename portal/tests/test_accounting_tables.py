@@ -0,0 +1,68 @@
+# portal/tests/test_accounting_tables.py
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.accounting import (
+    compute_contributions,
+    get_thresholds,
+    get_urssaf_rates,
+    invalidate_accounting_tables,
+)
+from core.models import LegalThresholds, UrssafRate
+
+
+class AccountingTablesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_accounting_tables()
+
+    def tearDown(self):
+        invalidate_accounting_tables()
+        cache.clear()
+
+    def test_seeded_rates_then_pure_memory_lookup(self):
+        self.assertEqual(get_urssaf_rates(2025)["SERVICES_BIC"], Decimal("0.212"))
+        # tables de l'année en mémoire : plus aucune requête
+        with self.assertNumQueries(0):
+            contrib, label = compute_contributions(
+                "SERVICES_BIC", Decimal("1000.00"), 2025
+            )
+            get_thresholds(2025)
+        self.assertEqual(contrib, Decimal("212.00"))
+        self.assertEqual(label, "21,2 %")
+
+    def test_missing_year_uses_defaults_without_insert(self):
+        th = get_thresholds(2019)
+        self.assertIsNone(th.pk)
+        self.assertEqual(th.micro_cap_services, 77700)
+        self.assertFalse(LegalThresholds.objects.exists())
+        # taux : dernière année saisie antérieure, à défaut les valeurs par défaut
+        self.assertEqual(get_urssaf_rates(2027)["VENTES"], Decimal("0.123"))
+
+    def test_historical_year_uses_its_own_rates(self):
+        UrssafRate.objects.create(
+            year=2024, activity_kind="SERVICES_BIC", rate=Decimal("0.2120")
+        )
+        UrssafRate.objects.filter(year=2025, activity_kind="SERVICES_BIC").update(
+            rate=Decimal("0.2200")
+        )
+        invalidate_accounting_tables()  # update() ne passe pas par les signaux
+        self.assertEqual(
+            compute_contributions("SERVICES_BIC", Decimal("100"), 2024),
+            (Decimal("21.20"), "21,2 %"),
+        )
+        self.assertEqual(
+            compute_contributions("SERVICES_BIC", Decimal("100"), 2025),
+            (Decimal("22.00"), "22 %"),
+        )
+
+    def test_admin_edit_invalidates_memory_tables(self):
+        self.assertEqual(get_thresholds(2025).micro_cap_services, 77700)
+        LegalThresholds.objects.create(year=2025, micro_cap_services=83600)
+        self.assertEqual(get_thresholds(2025).micro_cap_services, 83600)
+        rate = UrssafRate.objects.get(year=2025, activity_kind="VENTES")
+        rate.rate = Decimal("0.1240")
+        rate.save()
+        self.assertEqual(get_urssaf_rates(2025)["VENTES"], Decimal("0.1240"))
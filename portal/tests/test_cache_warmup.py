@@ -0,0 +1,67 @@
+# portal/tests/test_cache_warmup.py
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Company, Customer, Invoice
+from portal.services import _accounting_key, compute_dashboard, warm_caches
+
+
+class CacheWarmupTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="WarmCo")
+        self.customer = Customer.objects.create(company=self.company, name="C")
+        Company.objects.create(name="Dormant", active=False)
+
+    def tearDown(self):
+        # les "dernières valeurs" ne sont pas versionnées : pas de fuite vers
+        # les tests suivants (ids de company réutilisés)
+        cache.clear()
+
+    def _warm(self, **kwargs):
+        return [
+            (c.name, warmed) for c, warmed, _ in warm_caches(concurrency=1, **kwargs)
+        ]
+
+    def test_warms_active_companies_then_skips_without_activity(self):
+        self.assertEqual(self._warm(), [("WarmCo", True)])
+        # dashboard servi entièrement depuis le cache
+        with self.assertNumQueries(0):
+            compute_dashboard(self.company)
+        self.assertEqual(self._warm(), [("WarmCo", False)])
+
+        Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number="W-1",
+            issue_date=timezone.now().date(),
+            status="ISSUED",
+        )
+        self.assertEqual(self._warm(), [("WarmCo", True)])
+        self.assertEqual(self._warm(force=True), [("WarmCo", True)])
+
+    def test_recomputes_when_last_values_evicted(self):
+        self._warm()
+        cache.clear()
+        self.assertEqual(self._warm(), [("WarmCo", True)])
+
+    def test_skipped_company_gets_accounting_of_the_new_day(self):
+        self._warm()
+        tomorrow = timezone.now() + timedelta(days=1)
+        key = _accounting_key(self.company.id, tomorrow.date())
+        self.assertIsNone(cache.get(key))
+        with patch("django.utils.timezone.now", return_value=tomorrow):
+            self.assertEqual(self._warm(), [("WarmCo", False)])
+        self.assertIsNotNone(cache.get(key))
+
+    def test_command_reports_timing(self):
+        out = StringIO()
+        call_command("warm_dashboard_cache", "--concurrency", "1", stdout=out)
+        self.assertIn("WarmCo: warmed in", out.getvalue())
+        self.assertIn("1 warmed, 0 skipped", out.getvalue())
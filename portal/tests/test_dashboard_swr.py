@@ -0,0 +1,73 @@
+# portal/tests/test_dashboard_swr.py
+import time
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Company, Customer, Invoice, InvoiceItem
+from portal import tasks
+from portal.services import compute_dashboard, dashboard_refresh_flag_key
+
+
+class DashboardStaleWhileRevalidateTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="SwrCo")
+        self.customer = Customer.objects.create(company=self.company, name="C")
+        self._invoice("SWR-1")
+        cache.delete(dashboard_refresh_flag_key(self.company.id, 5))
+
+    def _invoice(self, number):
+        inv = Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number=number,
+            issue_date=timezone.now().date(),
+            status="ISSUED",
+        )
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv, description="X", unit_price_cents=10000, vat_rate=20
+            )
+
+    def test_cold_cache_computes_synchronously(self):
+        data = compute_dashboard(self.company, stale_while_revalidate=True)
+        self.assertEqual(data["stale_seconds"], 0)
+        self.assertEqual(str(data["invoices_open_total"]), "120.00")
+
+    @patch("django_rq.get_queue")
+    def test_invalidated_section_served_stale_and_refreshed(self, mock_get_queue):
+        fake_queue = MagicMock()
+        mock_get_queue.return_value = fake_queue
+        compute_dashboard(self.company, stale_while_revalidate=True)
+        self._invoice("SWR-2")  # bump des versions -> sections invalidées
+
+        with patch("portal.services.time.time", return_value=time.time() + 42):
+            data = compute_dashboard(self.company, stale_while_revalidate=True)
+        self.assertEqual(str(data["invoices_open_total"]), "120.00")
+        self.assertGreaterEqual(data["stale_seconds"], 42)
+        fake_queue.enqueue.assert_called_once()
+        func, company_id, sections, page_size = fake_queue.enqueue.call_args[0]
+        self.assertIs(func, tasks.refresh_dashboard)
+        self.assertIn("aging", sections)
+        self.assertNotIn("cash", sections)
+
+        # second hit pendant le refresh : pas de nouveau job
+        compute_dashboard(self.company, stale_while_revalidate=True)
+        fake_queue.enqueue.assert_called_once()
+
+        # le worker exécute le job : le résultat frais remplace l'ancien
+        tasks.refresh_dashboard(company_id, sections, page_size)
+        data = compute_dashboard(self.company, stale_while_revalidate=True)
+        self.assertEqual(str(data["invoices_open_total"]), "240.00")
+        self.assertEqual(data["stale_seconds"], 0)
+
+    @patch("django_rq.get_queue", side_effect=ConnectionError("redis down"))
+    def test_soft_ttl_expiry_falls_back_to_sync_when_queue_unavailable(self, _):
+        compute_dashboard(self.company, stale_while_revalidate=True)
+        Invoice.objects.filter(company=self.company).update(total_cents=0)
+        with patch("portal.services.time.time", return_value=time.time() + 3600):
+            data = compute_dashboard(self.company, stale_while_revalidate=True)
+        self.assertEqual(str(data["invoices_open_total"]), "0.00")
+        self.assertEqual(data["stale_seconds"], 0)
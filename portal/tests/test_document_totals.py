@@ -0,0 +1,131 @@
+# portal/tests/test_document_totals.py
+from contextlib import contextmanager
+from datetime import date
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Company, Customer, Invoice, InvoiceItem, Quote, QuoteItem
+from core.revenue import period_total_cents
+from portal.services import INVOICE_SECTIONS
+
+
+class DocumentTotalsTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="TotCo")
+        self.customer = Customer.objects.create(company=self.company, name="C")
+        self.inv = Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number="TOT-1",
+            issue_date=timezone.now().date(),
+            status="ISSUED",
+        )
+
+    @contextmanager
+    def _committed(self):
+        # lignes regroupées par transaction : totaux recalculés au commit
+        with patch("django_rq.get_queue") as get_queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                yield get_queue.return_value
+
+    def _db(self, inv):
+        return Invoice.objects.values_list(
+            "subtotal_cents", "tax_cents", "total_cents"
+        ).get(pk=inv.pk)
+
+    def test_item_add_edit_delete_maintains_totals(self):
+        with self._committed():
+            it = InvoiceItem.objects.create(
+                invoice=self.inv,
+                description="A",
+                quantity=2,
+                unit_price_cents=5000,
+                vat_rate=20,
+            )
+        self.assertEqual(self._db(self.inv), (10000, 2000, 12000))
+        with self._committed():
+            it.discount_pct = 10
+            it.save()
+        self.assertEqual(self._db(self.inv), (9000, 1800, 10800))
+        with self._committed():
+            it.delete()
+        self.assertEqual(self._db(self.inv), (0, 0, 0))
+
+    def test_stale_instance_save_keeps_totals(self):
+        stale = Invoice.objects.get(pk=self.inv.pk)
+        with self._committed():
+            InvoiceItem.objects.create(
+                invoice=self.inv, description="A", quantity=1, unit_price_cents=1000
+            )
+        stale.notes = "edit"
+        stale.save()
+        self.assertEqual(self._db(self.inv), (1000, 200, 1200))
+
+    def test_quote_totals(self):
+        q = Quote.objects.create(
+            company=self.company, customer=self.customer, number="Q1"
+        )
+        with self._committed():
+            QuoteItem.objects.create(
+                quote=q, description="A", quantity=1, unit_price_cents=1000, vat_rate=10
+            )
+        q.refresh_from_db()
+        self.assertEqual(
+            (q.subtotal_cents, q.tax_cents, q.total_cents), (1000, 100, 1100)
+        )
+
+    def test_rebuild_command_fixes_bulk_created_lines(self):
+        InvoiceItem.objects.bulk_create(
+            [InvoiceItem(invoice=self.inv, description="B", unit_price_cents=500)]
+        )
+        with self.assertRaises(CommandError):
+            call_command("rebuild_document_totals", "--verify")
+        call_command("rebuild_document_totals", "--batch-size", "1")
+        self.assertEqual(self._db(self.inv), (500, 100, 600))
+        call_command("rebuild_document_totals", "--verify")
+
+    def test_rebuild_command_refreshes_rollup_and_dashboard(self):
+        inv = Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number="TOT-2",
+            issue_date=date(2025, 3, 10),
+            status="ISSUED",
+        )
+        InvoiceItem.objects.bulk_create(
+            [InvoiceItem(invoice=inv, description="B", unit_price_cents=500)]
+        )
+        start, end = date(2025, 3, 1), date(2025, 3, 31)  # mois complet : agrégat
+        self.assertEqual(period_total_cents(self.company, start, end), 0)
+        with patch(
+            "portal.management.commands.rebuild_document_totals"
+            ".invalidate_dashboard_cache"
+        ) as invalidate:
+            call_command("rebuild_document_totals", "--model", "invoice")
+        self.assertEqual(period_total_cents(self.company, start, end), 600)
+        invalidate.assert_called_once_with(self.company.id, INVOICE_SECTIONS)
+
+    def test_lines_of_one_transaction_refreshed_once(self):
+        with patch("portal.signals.refresh_document_totals") as refresh:
+            with self._committed() as queue:
+                for i in range(5):
+                    InvoiceItem.objects.create(
+                        invoice=self.inv, description=f"L{i}", unit_price_cents=100
+                    )
+        refresh.assert_called_once_with(Invoice, self.inv.pk)
+        self.assertEqual(queue.enqueue.call_count, 1)
+
+    def test_cascade_delete_skips_line_refresh(self):
+        with self._committed():
+            for i in range(3):
+                InvoiceItem.objects.create(
+                    invoice=self.inv, description=f"L{i}", unit_price_cents=100
+                )
+        with patch("portal.signals.refresh_document_totals") as refresh:
+            with self._committed():
+                self.inv.delete()
+        refresh.assert_not_called()
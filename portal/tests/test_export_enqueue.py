@@ -1,11 +1,12 @@
 # portal/tests/test_export_enqueue.py
 from unittest.mock import MagicMock, patch
 
+from django.contrib.auth.models import User
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.utils import timezone
 
-from core.models import Company, Customer, Invoice, InvoiceItem
+from core.models import Company, Customer, ExportJob, Invoice, InvoiceItem, Membership
 
 
 class ExportEnqueueTest(TestCase):
@@ -26,7 +27,10 @@ class ExportEnqueueTest(TestCase):
             unit_price_cents=10000,
             vat_rate=20,
         )
+        self.user = User.objects.create_user(username="exp", password="pw")
+        Membership.objects.create(user=self.user, company=self.company)
         self.client = Client()
+        self.client.force_login(self.user)
 
     @patch("django_rq.get_queue")
     def test_enqueue_export_calls_queue(self, mock_get_queue):
@@ -42,7 +46,10 @@ class ExportEnqueueTest(TestCase):
         self.assertEqual(resp.status_code, 302)
         fake_queue.enqueue.assert_called()
         args = fake_queue.enqueue.call_args[0]
-        # le premier arg est la fonction heavy_export_invoice (callable)
+        # le premier arg est la tâche run_export_job (callable)
         self.assertTrue(callable(args[0]))
-        # le second argument devrait être l'invoice pk
-        self.assertEqual(args[1], self.inv.pk)
+        # le second argument est l'ExportJob créé pour cette facture
+        job = ExportJob.objects.get(pk=args[1])
+        self.assertEqual(job.kind, "PDF_BUNDLE")
+        self.assertEqual(job.params, {"invoice_ids": [self.inv.pk]})
+        self.assertEqual(job.rq_job_id, "job-123")
@@ -0,0 +1,163 @@
+# portal/tests/test_export_jobs.py
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Company, Customer, ExportJob, Invoice, InvoiceItem, Membership
+from portal.services_exports import (
+    EXPORT_QUEUE_UNAVAILABLE,
+    cleanup_exports,
+    create_export,
+    run_export,
+)
+
+
+class ExportJobTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+        self.company = Company.objects.create(name="JobCo")
+        self.user = User.objects.create_user(username="job", password="pw")
+        Membership.objects.create(user=self.user, company=self.company)
+        self.customer = Customer.objects.create(company=self.company, name="Alpha")
+        for i, day in enumerate((10, 20), 1):
+            inv = Invoice.objects.create(
+                company=self.company,
+                customer=self.customer,
+                number=f"J-{i}",
+                issue_date=date(2025, 1, day),
+                status="ISSUED",
+            )
+            InvoiceItem.objects.create(
+                invoice=inv, description="x", unit_price_cents=10000, vat_rate=20
+            )
+        self.client.force_login(self.user)
+
+    def _job(self, kind, params=None):
+        return ExportJob.objects.create(
+            company=self.company, kind=kind, params=params or {}
+        )
+
+    def test_accounting_csv_job_writes_filtered_file(self):
+        job = run_export(self._job("ACCOUNTING_CSV", {"start_date": "2025-01-15"}))
+        self.assertEqual(job.status, "SUCCESS")
+        self.assertEqual((job.progress, job.rows_done, job.rows_total), (100, 1, 1))
+        with job.file.open("rb") as fh:
+            lines = fh.read().decode("utf-8").lstrip("\ufeff").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("J-2,2025-01-20"))
+
+    def test_tenant_dump_is_loaddata_jsonl(self):
+        job = run_export(self._job("TENANT_DUMP"))
+        self.assertEqual(job.status, "SUCCESS")
+        with job.file.open("rb") as fh:
+            models = [json.loads(line)["model"] for line in fh]
+        self.assertEqual(models[0], "core.company")
+        self.assertEqual(models.count("core.invoiceitem"), 2)
+        self.assertEqual(job.rows_done, len(models))
+
+    @override_settings(PDF_BUNDLE_WORKERS=1)
+    @patch("core.pdf_service.html_to_pdf", return_value=b"%PDF")
+    def test_pdf_bundle_zip(self, _render):
+        job = run_export(self._job("PDF_BUNDLE"))
+        with zipfile.ZipFile(job.file.path) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()), ["invoice_J-1.pdf", "invoice_J-2.pdf"]
+            )
+
+    @override_settings(PDF_BUNDLE_WORKERS=1, PDF_CACHE_MAX_BYTES=0)
+    @patch("core.pdf_service.html_to_pdf", return_value=b"%PDF")
+    def test_pdf_bundle_filters_and_reuses_stored_pdfs(self, render):
+        Invoice.objects.filter(number="J-2").update(status="PAID")
+        params = {"start_date": "2025-01-01", "status": "ISSUED,PAID"}
+        job = run_export(self._job("PDF_BUNDLE", params))
+        self.assertEqual((job.rows_done, job.rows_total), (2, 2))
+        self.assertEqual(render.call_count, 2)
+        # factures émises : PDF enregistré dans leur champ, repris au lot suivant
+        self.assertEqual(Invoice.objects.exclude(pdf="").count(), 2)
+        job = run_export(self._job("PDF_BUNDLE", {"status": "PAID"}))
+        with zipfile.ZipFile(job.file.path) as archive:
+            self.assertEqual(archive.namelist(), ["invoice_J-2.pdf"])
+        self.assertEqual(render.call_count, 2)
+
+    @override_settings(PDF_BUNDLE_WORKERS=2)
+    def test_pdf_bundle_renders_in_parallel_processes(self):
+        job = run_export(self._job("PDF_BUNDLE", {"status": "ISSUED"}))
+        self.assertEqual(job.status, "SUCCESS")
+        with zipfile.ZipFile(job.file.path) as archive:
+            for name in archive.namelist():
+                self.assertTrue(archive.read(name).startswith(b"%PDF"))
+
+    @override_settings(PDF_BUNDLE_WORKERS=1)
+    @patch("core.pdf_service.html_to_pdf", side_effect=OSError)
+    def test_failure_is_recorded_without_file(self, _render):
+        job = run_export(self._job("PDF_BUNDLE"))
+        self.assertEqual(job.status, "FAILED")
+        self.assertIn("OSError", job.error)
+        self.assertFalse(job.file)
+        self.assertEqual(os.listdir(os.path.join(self.media, "exports")), [])
+
+    @patch("django_rq.get_queue", side_effect=ConnectionError("redis down"))
+    def test_queue_unavailable_fails_without_running_inline(self, _queue):
+        resp = self.client.post(reverse("portal:export_start"), {"kind": "TENANT_DUMP"})
+        self.assertEqual(resp.status_code, 202)
+        status = self.client.get(resp.json()["status_url"]).json()
+        self.assertEqual(status["status"], "FAILED")
+        self.assertEqual(status["error"], EXPORT_QUEUE_UNAVAILABLE)
+        self.assertEqual(ExportJob.objects.get().rows_done, 0)
+
+    @override_settings(EXPORT_INLINE_FALLBACK=True)
+    @patch("django_rq.get_queue", side_effect=ConnectionError("redis down"))
+    def test_start_status_download_endpoints(self, _queue):
+        # repli autorisé : sans worker joignable, l'export est exécuté sur place
+        resp = self.client.post(reverse("portal:export_start"), {"kind": "TENANT_DUMP"})
+        self.assertEqual(resp.status_code, 202)
+        status = self.client.get(resp.json()["status_url"]).json()
+        self.assertEqual((status["status"], status["progress"]), ("SUCCESS", 100))
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("attachment", download["Content-Disposition"])
+
+    def test_other_company_job_not_visible(self):
+        other = Company.objects.create(name="Other")
+        job = ExportJob.objects.create(company=other, kind="TENANT_DUMP")
+        resp = self.client.get(reverse("portal:export_status", args=[job.pk]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_unavailable_kind_rejected(self):
+        resp = self.client.post(reverse("portal:export_start"), {"kind": "VAT"})
+        self.assertEqual(resp.status_code, 400)
+        with self.assertRaises(ValueError):
+            create_export(self.company, "VAT")
+
+    def test_cleanup_expires_old_artifacts(self):
+        old = run_export(self._job("TENANT_DUMP"))
+        recent = run_export(self._job("TENANT_DUMP"))
+        ExportJob.objects.filter(pk=old.pk).update(
+            finished_at=timezone.now() - timedelta(hours=48)
+        )
+        orphan = os.path.join(self.media, "exports", "invoice_1_stub.txt")
+        with open(orphan, "w") as fh:
+            fh.write("x")
+        past = (timezone.now() - timedelta(hours=48)).timestamp()
+        os.utime(orphan, (past, past))
+
+        self.assertEqual(cleanup_exports(retention_hours=24), 2)
+        old.refresh_from_db()
+        self.assertEqual(old.status, "EXPIRED")
+        self.assertFalse(old.file)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent.file.path))
@@ -0,0 +1,119 @@
+# portal/tests/test_fec.py
+import io
+import os
+import shutil
+import tempfile
+from datetime import date
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.fec import FEC_COLUMNS, FecValidator, fec_rows, validate_fec
+from core.models import Company, Customer, ExportJob, Invoice, InvoiceItem
+from portal.services_exports import export_filename, run_export
+
+
+class FecExportTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(
+            name="FecCo", siret="12345678900011", activity_kind="SERVICES_BIC"
+        )
+        self.customer = Customer.objects.create(company=self.company, name="Alpha")
+        inv = self._invoice("F-1", date(2025, 3, 1))
+        self._item(inv, 10000, 20)
+        self._item(inv, 5000, "5.5")
+        # avoir (quantité négative) : sens inversés
+        self._item(self._invoice("AV-1", date(2025, 4, 1)), 2000, 20, quantity=-1)
+        self._item(self._invoice("F-DRAFT", date(2025, 5, 1), "DRAFT"), 999, 20)
+        self._item(self._invoice("F-2024", date(2024, 12, 31)), 999, 20)
+
+    def _invoice(self, number, issued, status="ISSUED"):
+        return Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number=number,
+            issue_date=issued,
+            status=status,
+        )
+
+    def _item(self, inv, cents, vat, quantity=1):
+        InvoiceItem.objects.create(
+            invoice=inv,
+            description="x",
+            quantity=quantity,
+            unit_price_cents=cents,
+            vat_rate=vat,
+        )
+
+    def test_entries_lines_and_balance(self):
+        rows = list(fec_rows(self.company, 2025))
+        self.assertTrue(all(len(r) == len(FEC_COLUMNS) for r in rows))
+        first = [(r[2], r[4], r[11], r[12]) for r in rows if r[8] == "F-1"]
+        self.assertEqual(
+            first,
+            [
+                ("1", "411000", "172,75", "0,00"),
+                ("1", "706000", "0,00", "50,00"),
+                ("1", "445713", "0,00", "2,75"),
+                ("1", "706000", "0,00", "100,00"),
+                ("1", "445712", "0,00", "20,00"),
+            ],
+        )
+        credit_note = [(r[4], r[11], r[12]) for r in rows if r[8] == "AV-1"]
+        self.assertEqual(credit_note[0], ("411000", "0,00", "24,00"))
+        self.assertEqual(rows[0][6:8], [f"C{self.customer.pk}", "Alpha"])
+        self.assertEqual({r[8] for r in rows}, {"F-1", "AV-1"})
+
+        validator = FecValidator(2025)
+        list(validator.check(rows))
+        self.assertTrue(validator.close())
+        self.assertEqual(validator.entries, 2)
+
+    def test_chunked_reads(self):
+        # factures par paquets de 1 : une requête de lignes par paquet
+        with self.assertNumQueries(3):
+            rows = list(fec_rows(self.company, 2025, chunk_size=1))
+        self.assertEqual(len(rows), 8)
+
+    def test_validator_reports_unbalanced_entry(self):
+        rows = list(fec_rows(self.company, 2025))
+        rows[0][11] = "172,70"
+        lines = ["|".join(FEC_COLUMNS)] + ["|".join(r) for r in rows]
+        errors = validate_fec(lines, 2025)
+        self.assertTrue(any("écriture 1 déséquilibrée" in e for e in errors))
+        self.assertEqual(
+            validate_fec(["bad header"] + lines[1:2]),
+            [
+                "en-tête FEC invalide",
+                "écriture 1 déséquilibrée : écart 172,70",
+                "total débit 172,70 ≠ total crédit 0,00",
+            ],
+        )
+
+    def test_export_job(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            job = ExportJob.objects.create(
+                company=self.company, kind="FEC", params={"year": 2025}
+            )
+            run_export(job)
+            self.assertEqual(job.status, "SUCCESS", job.error)
+            self.assertEqual((job.rows_total, job.rows_done), (2, 8))
+            self.assertEqual(export_filename(job), "123456789FEC20251231.txt")
+            with job.file.open("rb") as fh:
+                lines = fh.read().decode("utf-8").splitlines()
+        self.assertEqual(validate_fec(lines, 2025), [])
+
+    def test_command_writes_file(self):
+        out = os.path.join(tempfile.mkdtemp(), "fec.txt")
+        self.addCleanup(shutil.rmtree, os.path.dirname(out), ignore_errors=True)
+        call_command(
+            "export_fec",
+            company=self.company.pk,
+            year=2025,
+            output=out,
+            stdout=io.StringIO(),
+        )
+        with open(out, encoding="utf-8") as fh:
+            self.assertEqual(validate_fec(fh, 2025), [])
@@ -0,0 +1,105 @@
+# portal/tests/test_insight_rules.py
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Company, Customer, Invoice, InvoiceItem
+from portal.insight_rules import RULES, InsightRule, register, run_rules
+
+
+class InvoiceCountRule(InsightRule):
+    # règle de test : ne lit que le statut
+    name = "test_invoice_count"
+    fields = ("status",)
+
+    def __init__(self, company, today):
+        super().__init__(company, today)
+        self.count = 0
+
+    def feed(self, row):
+        self.count += 1
+
+    def results(self):
+        return [{"type": self.name, "invoice_id": 0, "count": self.count}]
+
+
+class DraftCountRule(InvoiceCountRule):
+    # règle de test restreinte aux brouillons
+    name = "test_draft_count"
+    statuses = ("DRAFT",)
+
+
+class InsightRuleEngineTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="RuleCo")
+        self.customer = customer = Customer.objects.create(
+            company=self.company, name="A"
+        )
+        for n in range(3):
+            inv = Invoice.objects.create(
+                company=self.company,
+                customer=customer,
+                number=f"R-{n}",
+                issue_date=timezone.now().date(),
+                status="ISSUED",
+            )
+            InvoiceItem.objects.create(
+                invoice=inv, description="X", unit_price_cents=1000, discount_pct=30
+            )
+        register(InvoiceCountRule)
+        self.addCleanup(RULES.pop, InvoiceCountRule.name)
+        register(DraftCountRule)
+        self.addCleanup(RULES.pop, DraftCountRule.name)
+
+    def test_extra_rule_shares_the_single_scan(self):
+        timings = {}
+        # un parcours des factures + agrégat "client perdu" (aucun : pas de noms)
+        with self.assertNumQueries(2):
+            results = run_rules(self.company, timings=timings, chunk_size=2)
+        self.assertEqual(results["test_invoice_count"][0]["count"], 3)
+        self.assertEqual(len(results["low_margin_invoice"]), 3)
+        self.assertEqual(results["lost_client"], [])
+        self.assertEqual(set(timings), set(RULES) | {"scan"})
+
+    def test_rule_without_fields_skips_the_scan(self):
+        with self.assertNumQueries(1):  # GROUP BY client seulement
+            results = run_rules(self.company, ["lost_client"])
+        self.assertEqual(results, {"lost_client": []})
+
+    def test_subset_of_rules(self):
+        results = run_rules(self.company, ["test_invoice_count"])
+        self.assertEqual(list(results), ["test_invoice_count"])
+
+    def test_scan_reads_only_the_statuses_of_the_rules(self):
+        Invoice.objects.create(
+            company=self.company, customer=self.customer, number="R-D", status="DRAFT"
+        )
+        results = run_rules(self.company, ["test_draft_count"])
+        self.assertEqual(results["test_draft_count"][0]["count"], 1)
+        # union des statuts : ISSUED/PAID (marge faible) + DRAFT
+        results = run_rules(self.company, ["low_margin_invoice", "test_draft_count"])
+        self.assertEqual(results["test_draft_count"][0]["count"], 4)
+        self.assertEqual(len(results["low_margin_invoice"]), 3)
+        # règle sans restriction : toutes les factures
+        results = run_rules(self.company, ["low_margin_invoice", "test_invoice_count"])
+        self.assertEqual(results["test_invoice_count"][0]["count"], 4)
+
+    def test_low_margin_threshold_uses_rounded_line_discounts(self):
+        Invoice.objects.filter(company=self.company).delete()
+        for number, unit_price_cents in (("E-1", 1000), ("E-2", 1)):
+            inv = Invoice.objects.create(
+                company=self.company,
+                customer=self.customer,
+                number=number,
+                status="ISSUED",
+            )
+            InvoiceItem.objects.create(
+                invoice=inv,
+                description="X",
+                unit_price_cents=unit_price_cents,
+                discount_pct=20,
+            )
+        found = run_rules(self.company, ["low_margin_invoice"])["low_margin_invoice"]
+        # E-1 : 200/1000 = 20 % pile -> signalée ; E-2 : remise de 0,2 centime
+        # arrondie à 0 sur la ligne -> 0 %, sous le seuil
+        self.assertEqual([i["invoice_number"] for i in found], ["E-1"])
+        self.assertEqual(found[0]["discount_pct"], 20.0)
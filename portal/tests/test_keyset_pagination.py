@@ -0,0 +1,87 @@
+# portal/tests/test_keyset_pagination.py
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Company, Customer, Invoice, Membership
+from portal.pagination import decode_cursor, encode_cursor, keyset_page
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="PageCo")
+        self.customer = Customer.objects.create(company=self.company, name="C")
+        # plusieurs factures par jour : départage par id
+        for i in range(7):
+            self._invoice(f"P-{i}", date(2025, 1, 1) + timedelta(days=i // 2))
+
+    def _invoice(self, number, issued):
+        return Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number=number,
+            issue_date=issued,
+            status="ISSUED",
+        )
+
+    def _qs(self):
+        return Invoice.objects.filter(company=self.company)
+
+    def test_forward_and_backward_cover_all_rows_once(self):
+        expected = list(self._qs().order_by("-issue_date", "-pk"))
+        pages, cursor = [], None
+        while True:
+            rows, cursor, _ = keyset_page(self._qs(), cursor, page_size=3)
+            pages.append(rows)
+            if not cursor:
+                break
+        self.assertEqual([r for page in pages for r in page], expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+
+        # retour arrière depuis la dernière page
+        _, _, prev = keyset_page(
+            self._qs(), encode_cursor("n", pages[1][-1].issue_date, pages[1][-1].pk), 3
+        )
+        rows, next_cursor, prev_cursor = keyset_page(self._qs(), prev, 3)
+        self.assertEqual(rows, pages[1])
+        self.assertIsNotNone(next_cursor)
+        self.assertIsNotNone(prev_cursor)
+        rows, _, prev_cursor = keyset_page(self._qs(), prev_cursor, 3)
+        self.assertEqual(rows, pages[0])
+        self.assertIsNone(prev_cursor)
+
+    def test_concurrent_insert_does_not_shift_next_page(self):
+        first, cursor, _ = keyset_page(self._qs(), None, 3)
+        second = keyset_page(self._qs(), cursor, 3)[0]
+        # une facture plus récente arrive entre deux pages
+        self._invoice("P-new", date(2025, 2, 1))
+        self.assertEqual(keyset_page(self._qs(), cursor, 3)[0], second)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+        self.assertIsNone(decode_cursor(encode_cursor("x", date(2025, 1, 1), 1)))
+        rows, _, prev = keyset_page(self._qs(), "garbage", 3)
+        self.assertEqual(rows[0].number, "P-6")
+        self.assertIsNone(prev)
+
+    def test_emptied_cursor_range_falls_back_to_first_page(self):
+        first, cursor, _ = keyset_page(self._qs(), None, 3)
+        _, _, prev = keyset_page(self._qs(), cursor, 3)
+        # les factures plus récentes que la page 2 disparaissent
+        self._qs().filter(pk__in=[r.pk for r in first]).delete()
+        rows, next_cursor, prev_cursor = keyset_page(self._qs(), prev, 3)
+        self.assertEqual(rows, list(self._qs().order_by("-issue_date", "-pk")[:3]))
+        self.assertIsNotNone(next_cursor)
+        self.assertIsNone(prev_cursor)
+
+    def test_accounting_page_uses_cursor_links(self):
+        user = User.objects.create_user(username="page", password="pw")
+        Membership.objects.create(user=user, company=self.company)
+        self.client.force_login(user)
+        resp = self.client.get(reverse("portal:accounting"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["invoices"]), 7)
+        self.assertIsNone(resp.context["next_cursor"])
+        self.assertNotContains(resp, "?page=")
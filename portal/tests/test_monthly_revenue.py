@@ -0,0 +1,102 @@
+# portal/tests/test_monthly_revenue.py
+from datetime import date
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import (
+    Company,
+    CompanyMonthlyRevenue,
+    Customer,
+    Invoice,
+    InvoiceItem,
+)
+from core.revenue import PeriodRevenue, period_total_cents
+from portal.services import compute_accounting_figures
+
+
+class MonthlyRevenueRollupTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="RollCo")
+        self.customer = Customer.objects.create(company=self.company, name="C")
+
+    def _invoice(self, number, day, cents, status="ISSUED"):
+        inv = Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number=number,
+            issue_date=day,
+            status=status,
+        )
+        # lignes : totaux et agrégat rafraîchis au commit
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv, description="X", unit_price_cents=cents, vat_rate=20
+            )
+        return inv
+
+    def _row(self, year, month, status="ISSUED"):
+        return CompanyMonthlyRevenue.objects.filter(
+            company=self.company, year=year, month=month, status=status
+        ).first()
+
+    def test_rollup_follows_invoice_and_item_changes(self):
+        inv = self._invoice("R-1", date(2025, 3, 10), 10000)
+        self._invoice("R-2", date(2025, 3, 20), 5000)
+        row = self._row(2025, 3)
+        self.assertEqual((row.total_cents, row.invoice_count), (18000, 2))
+
+        inv.issue_date = date(2025, 4, 1)
+        inv.save()
+        self.assertEqual(self._row(2025, 3).total_cents, 6000)
+        self.assertEqual(self._row(2025, 4).total_cents, 12000)
+
+        inv.status = "PAID"
+        inv.save()
+        self.assertIsNone(self._row(2025, 4))
+        self.assertEqual(self._row(2025, 4, "PAID").tax_cents, 2000)
+
+        inv.delete()
+        self.assertIsNone(self._row(2025, 4, "PAID"))
+
+    def test_rebuild_command(self):
+        self._invoice("R-1", date(2025, 1, 5), 10000)
+        CompanyMonthlyRevenue.objects.all().delete()
+        call_command("rebuild_monthly_revenue")
+        self.assertEqual(self._row(2025, 1).total_cents, 12000)
+
+    def test_period_total_mixes_rollup_and_partial_months(self):
+        self._invoice("R-1", date(2025, 1, 5), 10000)
+        self._invoice("R-2", date(2025, 2, 14), 10000)
+        self._invoice("R-3", date(2025, 3, 31), 10000)
+        self._invoice("R-4", date(2025, 4, 2), 10000)
+        self.assertEqual(
+            period_total_cents(self.company, date(2025, 1, 10), date(2025, 4, 1)),
+            24000,
+        )
+        self.assertEqual(
+            period_total_cents(self.company, date(2025, 1, 1), date(2025, 3, 31)),
+            36000,
+        )
+        self.assertEqual(
+            period_total_cents(self.company, date(2025, 2, 1), date(2025, 2, 13)), 0
+        )
+
+    def test_period_revenue_memoized(self):
+        self._invoice("R-1", date(2025, 1, 5), 10000)
+        revenue = PeriodRevenue(self.company)
+        with self.assertNumQueries(2):  # agrégat mensuel + mois partiel
+            self.assertEqual(revenue.cents(date(2025, 1, 1), date(2025, 2, 10)), 12000)
+        with self.assertNumQueries(0):
+            self.assertEqual(revenue.cents(date(2025, 1, 1), date(2025, 2, 10)), 12000)
+
+    def test_accounting_figures_share_period_revenue(self):
+        self.company.urssaf_frequency = "TRIMESTRIEL"
+        self._invoice("R-1", date(2025, 1, 5), 10000)
+        revenue = PeriodRevenue(self.company)
+        # au 1er trimestre, CA cumulé et période URSSAF couvrent la même période
+        figures = compute_accounting_figures(self.company, date(2025, 2, 10), revenue)
+        self.assertEqual(figures["ca_ytd"], figures["period_ca"])
+        self.assertEqual(len(revenue._memo), 1)
+        self.assertGreater(figures["vat_progress"], 0)
@@ -0,0 +1,26 @@
+# portal/tests/test_pdf_assets.py
+from unittest.mock import patch
+
+from django.contrib.staticfiles import finders
+from django.test import SimpleTestCase, override_settings
+
+from core.pdf import link_callback, resolve_static
+
+
+class PdfAssetsTest(SimpleTestCase):
+    def setUp(self):
+        resolve_static.cache_clear()
+
+    def test_static_lookup_is_memoized(self):
+        with patch("core.pdf.finders.find", wraps=finders.find) as find:
+            first = link_callback("/static/pdf/pdf.css", None)
+            second = link_callback("/static/pdf/pdf.css", None)
+        self.assertEqual(find.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith("pdf.css"))
+        self.assertEqual(link_callback("/media/x.png", None), "/media/x.png")
+
+    def test_cache_cleared_when_static_settings_change(self):
+        link_callback("/static/pdf/pdf.css", None)
+        with override_settings(STATIC_URL="/assets/"):
+            self.assertEqual(resolve_static.cache_info().currsize, 0)
@@ -0,0 +1,75 @@
+# portal/tests/test_pdf_cache.py
+import os
+import shutil
+import tempfile
+from datetime import date
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core import pdf_cache
+from core.models import Company, Customer, Invoice, InvoiceItem
+from core.pdf import invoice_pdf_context, render_pdf_from_template
+
+
+class PdfCacheTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        company = Company.objects.create(name="CacheCo")
+        customer = Customer.objects.create(company=company, name="C")
+        self.invoice = Invoice.objects.create(
+            company=company,
+            customer=customer,
+            number="CACHE-1",
+            issue_date=date(2025, 3, 1),
+            status="ISSUED",
+        )
+        InvoiceItem.objects.create(
+            invoice=self.invoice, description="x", unit_price_cents=1000, vat_rate=20
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def _render(self):
+        return render_pdf_from_template(
+            "pdf/invoice.html", invoice_pdf_context(self.invoice), use_cache=True
+        )
+
+    def test_second_render_is_a_hit(self):
+        with patch("core.pdf.html_to_pdf", return_value=b"%PDF-1") as convert:
+            first = self._render()
+            second = self._render()
+        self.assertEqual(first, second)
+        self.assertEqual(convert.call_count, 1)
+        self.assertEqual(
+            pdf_cache.cache_stats(),
+            {"cache_hits": 1, "cache_misses": 1, "cache_evictions": 0},
+        )
+
+    def test_edited_document_or_asset_changes_the_key(self):
+        html = "<link href='/static/pdf/pdf.css'><p>120,00</p>"
+        key = pdf_cache.pdf_cache_key("pdf/invoice.html", html)
+        self.assertEqual(key, pdf_cache.pdf_cache_key("pdf/invoice.html", html))
+        edited = html.replace("120,00", "121,00")
+        self.assertNotEqual(key, pdf_cache.pdf_cache_key("pdf/invoice.html", edited))
+        # pdf.css modifié (taille / mtime) : autre clé pour le même HTML
+        with patch("core.pdf_cache._file_version", return_value="0:0"):
+            self.assertNotEqual(key, pdf_cache.pdf_cache_key("pdf/invoice.html", html))
+
+    def test_lru_eviction_under_size_cap(self):
+        for i, key in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+            pdf_cache.store_pdf(key, b"x" * 100)
+            os.utime(pdf_cache._path(key), (1000 + i, 1000 + i))
+        # "a" relu : le plus récemment utilisé, "b" devient le plus ancien
+        self.assertIsNotNone(pdf_cache.get_cached_pdf("a" * 64))
+        removed = pdf_cache.evict(limit=250)
+        self.assertEqual(removed, 1)
+        self.assertFalse(pdf_cache._path("b" * 64).exists())
+        self.assertTrue(pdf_cache._path("a" * 64).exists())
+        self.assertEqual(cache.get(pdf_cache.SIZE_KEY), 200)
@@ -0,0 +1,114 @@
+# portal/tests/test_pdf_service.py
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import pdf_service
+from core.models import Company, Customer, Invoice, InvoiceItem, Membership
+from core.pdf import html_to_pdf, invoice_pdf_context
+from core.pdf_service import PdfRenderTimeout, pdf_stats, render_pdf
+
+
+class PdfServiceTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.company = Company.objects.create(name="PdfCo")
+        self.user = User.objects.create_user(username="pdf", password="pw")
+        Membership.objects.create(user=self.user, company=self.company)
+        customer = Customer.objects.create(company=self.company, name="C")
+        self.invoice = Invoice.objects.create(
+            company=self.company,
+            customer=customer,
+            number="PDF-1",
+            issue_date=date(2025, 3, 1),
+            status="ISSUED",
+        )
+        InvoiceItem.objects.create(
+            invoice=self.invoice, description="x", unit_price_cents=10000, vat_rate=20
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("portal:invoice_pdf", args=[self.invoice.pk])
+
+    def tearDown(self):
+        pdf_service.shutdown_pool()
+        cache.clear()
+
+    @override_settings(PDF_RENDER_WORKERS=0)
+    def test_inline_render_is_measured(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        # facture émise : PDF enregistré puis servi comme fichier
+        self.assertTrue(b"".join(resp.streaming_content).startswith(b"%PDF"))
+        stats = pdf_stats()
+        self.assertEqual(stats["renders"], 1)
+        self.assertEqual(pdf_service.inflight(), 0)
+
+    @override_settings(PDF_RENDER_QUEUE_LIMIT=0, PDF_RENDER_RETRY_AFTER=7)
+    def test_saturated_service_answers_503(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "7")
+        self.assertEqual(pdf_stats()["rejected"], 1)
+
+    @override_settings(PDF_RENDER_WORKERS=0, PDF_RENDER_QUEUE_LIMIT=1)
+    def test_queue_limit_is_shared_between_callers(self):
+        # un rendu en cours chez un autre appelant (autre worker web) : place prise
+        started, release = threading.Event(), threading.Event()
+
+        def slow_html_to_pdf(html):
+            started.set()
+            release.wait(10)
+            return html_to_pdf(html)
+
+        ctx = invoice_pdf_context(self.invoice)
+        with patch("core.pdf_service.html_to_pdf", slow_html_to_pdf):
+            other = threading.Thread(target=render_pdf, args=("pdf/invoice.html", ctx))
+            other.start()
+            self.assertTrue(started.wait(10))
+            self.assertEqual(pdf_service.inflight(), 1)
+            resp = self.client.get(self.url)
+            release.set()
+            other.join(10)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(pdf_stats()["rejected"], 1)
+        self.assertEqual(pdf_service.inflight(), 0)
+        # place rendue : l'appelant suivant est servi
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @patch("core.pdf_service._slot_ttl", return_value=0.3)
+    def test_leaked_slot_expires_under_steady_traffic(self, _ttl):
+        leaked = pdf_service._acquire_slot(2)  # worker tué : jamais rendue
+        self.assertIsNotNone(leaked)
+        deadline = time.monotonic() + 0.6
+        while time.monotonic() < deadline:  # trafic continu sur l'autre place
+            slot = pdf_service._acquire_slot(2)
+            self.assertIsNotNone(slot)
+            pdf_service._release_slot(slot)
+            time.sleep(0.02)
+        self.assertEqual(pdf_service.inflight(2), 0)
+        self.assertIsNotNone(pdf_service._acquire_slot(2))
+        self.assertIsNotNone(pdf_service._acquire_slot(2))
+
+    @override_settings(PDF_RENDER_WORKERS=1)
+    def test_renders_in_process_pool(self):
+        ctx = invoice_pdf_context(self.invoice)
+        self.assertTrue(render_pdf("pdf/invoice.html", ctx).startswith(b"%PDF"))
+        self.assertIsNotNone(pdf_service._state["pool"])
+        # délai dépassé : rendu abandonné par l'appelant, place rendue à la fin
+        with self.assertRaises(PdfRenderTimeout):
+            render_pdf("pdf/invoice.html", ctx, timeout=0.0001)
+        pdf_service.shutdown_pool()
+        self.assertEqual(pdf_service.inflight(), 0)
+        self.assertEqual(pdf_stats()["timeouts"], 1)
@@ -0,0 +1,93 @@
+# portal/tests/test_period_totals.py
+from datetime import date
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.models import Company, Customer, Invoice, InvoiceItem
+from portal.services import compute_period_totals, period_totals
+
+
+class PeriodTotalsTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="PeriodCo")
+        self.c1 = Customer.objects.create(company=self.company, name="A")
+        self.c2 = Customer.objects.create(company=self.company, name="B")
+        inv = self._invoice("T-1", self.c1, date(2025, 1, 5), "ISSUED")
+        # lignes identiques : arrondi par ligne (3 × 0,333 € -> 3 × 0,33 € ; TVA 3 × 0,07 €)
+        for _ in range(3):
+            self._item(inv, 33, 20, quantity="1.01")
+        self._item(inv, 10000, "5.5")
+        inv = self._invoice("T-2", self.c2, date(2025, 2, 5), "PAID")
+        self._item(inv, 20000, 20, discount="10")
+        self._invoice("T-3", self.c1, date(2025, 3, 5), "DRAFT")
+
+    def tearDown(self):
+        cache.clear()
+
+    def _invoice(self, number, customer, issued, status):
+        return Invoice.objects.create(
+            company=self.company,
+            customer=customer,
+            number=number,
+            issue_date=issued,
+            status=status,
+        )
+
+    def _item(self, inv, cents, vat, quantity="1", discount="0"):
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv,
+                description="x",
+                quantity=quantity,
+                unit_price_cents=cents,
+                vat_rate=vat,
+                discount_pct=discount,
+            )
+
+    def test_totals_match_document_totals(self):
+        totals = compute_period_totals(self.company)
+        invoices = Invoice.objects.filter(company=self.company)
+        self.assertEqual(totals["count"], 3)
+        self.assertEqual(
+            int(totals["subtotal"] * 100), sum(i.subtotal_cents for i in invoices)
+        )
+        self.assertEqual(
+            int(totals["vat_total"] * 100), sum(i.tax_cents for i in invoices)
+        )
+        # la ventilation par taux retombe exactement sur les totaux des factures
+        self.assertEqual(
+            sum(r["base"] for r in totals["by_vat_rate"]), totals["subtotal"]
+        )
+        self.assertEqual(
+            sum(r["vat"] for r in totals["by_vat_rate"]), totals["vat_total"]
+        )
+        self.assertEqual([str(r["rate"]) for r in totals["by_vat_rate"]], ["5.5", "20"])
+        self.assertEqual(
+            [(r["status"], r["count"]) for r in totals["by_status"]],
+            [("DRAFT", 1), ("ISSUED", 1), ("PAID", 1)],
+        )
+
+    def test_filters(self):
+        totals = compute_period_totals(
+            self.company,
+            start=date(2025, 1, 1),
+            end=date(2025, 2, 28),
+            client=self.c2.pk,
+        )
+        self.assertEqual(totals["count"], 1)
+        self.assertEqual(str(totals["subtotal"]), "180.00")
+        self.assertEqual(str(totals["total_ttc"]), "216.00")
+
+    def test_cached_per_filter_and_invalidated_by_invoice_change(self):
+        first = period_totals(self.company)
+        with self.assertNumQueries(0):
+            self.assertEqual(period_totals(self.company), first)
+        # autre filtre : autre entrée
+        self.assertEqual(period_totals(self.company, client=self.c2.pk)["count"], 1)
+
+        inv = self._invoice("T-4", self.c2, date(2025, 4, 5), "ISSUED")
+        self._item(inv, 1000, 20)
+        self.assertEqual(period_totals(self.company)["count"], 4)
+        self.assertEqual(period_totals(self.company, client=self.c2.pk)["count"], 2)
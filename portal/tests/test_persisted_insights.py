@@ -0,0 +1,90 @@
+# portal/tests/test_persisted_insights.py
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Company, Customer, Insight, Invoice, InvoiceItem
+from portal.services import _section_insights
+from portal.services_insights import (
+    compute_insights,
+    insights_full_pending_key,
+    persisted_insights,
+    refresh_insights,
+)
+from portal.tasks import refresh_company_insights
+
+
+class PersistedInsightsTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="PinCo")
+        self.customer = Customer.objects.create(company=self.company, name="A")
+        self.today = timezone.now().date()
+        cache.delete(f"insights:{self.company.id}:last_run")
+        cache.delete(insights_full_pending_key(self.company.id))
+
+    def _invoice(self, number, days_ago=0, discount=0, customer=None):
+        inv = Invoice.objects.create(
+            company=self.company,
+            customer=customer or self.customer,
+            number=number,
+            issue_date=self.today - timedelta(days=days_ago),
+            status="ISSUED",
+        )
+        InvoiceItem.objects.create(
+            invoice=inv, description="X", unit_price_cents=1000, discount_pct=discount
+        )
+        return inv
+
+    def test_full_run_matches_compute_insights(self):
+        self._invoice("P-1", days_ago=200, discount=30)
+        refresh_company_insights(self.company.id)
+        self.assertEqual(
+            persisted_insights(self.company), compute_insights(self.company)
+        )
+        self.assertEqual(Insight.objects.filter(company=self.company).count(), 2)
+
+    def test_incremental_run_only_touches_given_subjects(self):
+        inv = self._invoice("P-1", discount=30)
+        refresh_insights(self.company, full=True)
+        other = self._invoice("P-2", discount=50)
+        InvoiceItem.objects.filter(invoice=inv).update(discount_pct=0)
+
+        # seule P-2 est réévaluée : P-1 garde son insight (non signalée)
+        refresh_insights(self.company, invoice_ids=[other.pk])
+        numbers = [i["invoice_number"] for i in persisted_insights(self.company)]
+        self.assertEqual(numbers, ["P-1", "P-2"])
+
+        refresh_insights(self.company, invoice_ids=[inv.pk])
+        numbers = [i["invoice_number"] for i in persisted_insights(self.company)]
+        self.assertEqual(numbers, ["P-2"])
+
+    def test_clients_lost_by_elapsed_time_are_picked_up(self):
+        self._invoice("P-1", days_ago=175)
+        refresh_insights(self.company, full=True)
+        self.assertEqual(persisted_insights(self.company), [])
+
+        later = timezone.now() + timedelta(days=10)
+        with patch("django.utils.timezone.now", return_value=later):
+            refresh_insights(self.company)
+        types = [i["type"] for i in persisted_insights(self.company)]
+        self.assertEqual(types, ["lost_client"])
+
+    def test_signals_schedule_refresh_after_commit(self):
+        with patch("django_rq.get_queue") as get_queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                inv = self._invoice("P-1", discount=30)
+        args = get_queue.return_value.enqueue.call_args_list[-1].args
+        self.assertEqual(args[0], refresh_company_insights)
+        self.assertEqual(args[1:3], (self.company.id, [inv.pk]))
+
+    def test_first_full_refresh_scheduled_once(self):
+        with patch("portal.services.schedule_insights_refresh") as schedule:
+            _section_insights(self.company, self.today, 5)
+            _section_insights(self.company, self.today, 5)
+        schedule.assert_called_once_with(self.company.id, full=True)
+        # fin du job : drapeau levé
+        refresh_company_insights(self.company.id, full=True)
+        self.assertIsNone(cache.get(insights_full_pending_key(self.company.id)))
@@ -1,12 +1,13 @@
 # portal/tests/test_services.py
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.utils import timezone
 
 # imports projet — adapte si les noms diffèrent
 from core.models import Company, Customer, Invoice, InvoiceItem
-from portal.services import compute_dashboard
+from portal.services import DASHBOARD_SECTIONS, compute_dashboard
 
 
 class DashboardServiceTest(TestCase):
@@ -26,13 +27,14 @@ class DashboardServiceTest(TestCase):
             issue_date=today,
             status="ISSUED",
         )
-        InvoiceItem.objects.create(
-            invoice=inv1,
-            description="Item A",
-            quantity=1,
-            unit_price_cents=10000,
-            vat_rate=20,
-        )
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv1,
+                description="Item A",
+                quantity=1,
+                unit_price_cents=10000,
+                vat_rate=20,
+            )
 
         # invoice 2 (older)
         inv2 = Invoice.objects.create(
@@ -42,13 +44,14 @@ class DashboardServiceTest(TestCase):
             issue_date=today - timezone.timedelta(days=45),
             status="ISSUED",
         )
-        InvoiceItem.objects.create(
-            invoice=inv2,
-            description="Item B",
-            quantity=2,
-            unit_price_cents=5000,
-            vat_rate=20,
-        )
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv2,
+                description="Item B",
+                quantity=2,
+                unit_price_cents=5000,
+                vat_rate=20,
+            )
 
     def test_compute_dashboard_returns_keys(self):
         data = compute_dashboard(self.company, use_cache=False)
@@ -72,3 +75,19 @@ class DashboardServiceTest(TestCase):
         # aging buckets present and decimals
         for k in ("0_30", "31_60", "61_90", "gt_90"):
             assert k in data["aging"]
+
+    def test_sql_aggregates_match_line_totals(self):
+        data = compute_dashboard(self.company, use_cache=False)
+        # 100 € HT + 20 % TVA par facture
+        assert data["ca_month"] == Decimal("120.00")
+        assert data["invoices_open_total"] == Decimal("240.00")
+        assert data["aging"]["0_30"] == Decimal("120.00")
+        assert data["aging"]["31_60"] == Decimal("120.00")
+        assert data["top_customers"][0]["total"] == Decimal("240.00")
+        assert data["ca_series"][-1] == Decimal("120.00")
+        assert len(data["ca_series"]) == 12
+
+    def test_query_count_is_bounded(self):
+        kpi_sections = [s for s in DASHBOARD_SECTIONS if s != "insights"]
+        with self.assertNumQueries(7):
+            compute_dashboard(self.company, use_cache=False, sections=kpi_sections)
@@ -64,3 +64,32 @@ class InsightsRulesTest(TestCase):
             if i["type"] == "lost_client" and i["customer_id"] == self.client_a.pk
         ]
         self.assertTrue(len(found) >= 1)
+
+    def test_constant_query_count(self):
+        # une requête par règle, quel que soit le nombre de clients / factures
+        old_date = self.today - timedelta(days=30 * 7)
+        for i in range(5):
+            customer = Customer.objects.create(company=self.company, name=f"C{i}")
+            inv = Invoice.objects.create(
+                company=self.company,
+                customer=customer,
+                number=f"QC-{i}",
+                issue_date=old_date,
+                status="ISSUED",
+            )
+            InvoiceItem.objects.create(
+                invoice=inv,
+                description="X",
+                quantity=2,
+                unit_price_cents=1000,
+                discount_pct=25,
+            )
+        # parcours des factures, agrégat par client, noms des clients perdus
+        with self.assertNumQueries(3):
+            insights = compute_insights(self.company)
+        self.assertEqual(
+            [i["type"] for i in insights],
+            ["low_margin_invoice"] * 5 + ["lost_client"] * 5,
+        )
+        self.assertEqual(insights[0]["discount_pct"], 25.0)
+        self.assertEqual(insights[0]["message"], "Remise 25.0% sur la facture QC-0")
@@ -1,6 +1,7 @@
 # portal/tests/test_signals.py
+from unittest.mock import patch
+
 from django.apps import apps
-from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 
@@ -23,16 +24,42 @@ class SignalsTest(TestCase):
         )
         # create at least one item if model requires it
         if any(f.name == "invoice" for f in InvoiceItem._meta.fields):
-            InvoiceItem.objects.create(
-                invoice=inv,
-                description="Item",
-                quantity=1,
-                unit_price_cents=1000,
-                vat_rate=20,
-            )
-
-        key = f"dash:{company.id}"
-        cache.set(key, {"x": 1}, 600)
-        assert cache.get(key) is not None
-        inv.save()
-        assert cache.get(key) is None
+            with (
+                patch("django_rq.get_queue"),
+                self.captureOnCommitCallbacks(execute=True),
+            ):
+                InvoiceItem.objects.create(
+                    invoice=inv,
+                    description="Item",
+                    quantity=1,
+                    unit_price_cents=1000,
+                    vat_rate=20,
+                )
+
+        from portal.services import compute_dashboard, dashboard_cache_keys
+
+        compute_dashboard(company)
+        with self.assertNumQueries(0):
+            assert compute_dashboard(company)["invoices_open_total"] > 0
+        before = dashboard_cache_keys(company.id, ["aging", "cash"])
+        inv.status = "PAID"
+        inv.save()  # signal : bump de version des sections concernées
+        after = dashboard_cache_keys(company.id, ["aging", "cash"])
+        assert before["aging"] != after["aging"]
+        assert before["cash"] == after["cash"]
+        assert compute_dashboard(company)["invoices_open_total"] == 0
+
+    def test_turnover_entry_only_invalidates_cash(self):
+        Company = apps.get_model("core", "Company")
+        TurnoverEntry = apps.get_model("core", "TurnoverEntry")
+        from portal.services import DASHBOARD_SECTIONS, dashboard_cache_keys
+
+        company = Company.objects.create(name="CashCo")
+        sections = list(DASHBOARD_SECTIONS)
+        before = dashboard_cache_keys(company.id, sections)
+        today = timezone.now().date()
+        TurnoverEntry.objects.create(
+            company=company, period_start=today, period_end=today, amount=10
+        )
+        after = dashboard_cache_keys(company.id, sections)
+        assert [s for s in sections if before[s] != after[s]] == ["cash"]
@@ -0,0 +1,121 @@
+# portal/tests/test_singleflight.py
+import threading
+import time
+import uuid
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Company, Customer, Invoice, InvoiceItem
+from core.singleflight import single_flight
+from portal.services import accounting_figures
+
+
+def _run_concurrently(n, target):
+    # démarre n threads en même temps (barrière) et renvoie leurs résultats
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+class SingleFlightTest(SimpleTestCase):
+    def setUp(self):
+        self.key = f"sf-test:{uuid.uuid4().hex}"
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def _slow_compute(self, value="v", delay=0.2):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            return value
+
+        return compute
+
+    def test_concurrent_callers_compute_once(self):
+        results = _run_concurrently(
+            8, lambda: single_flight(self.key, self._slow_compute(), 60)
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ["v"] * 8)
+        self.assertEqual(cache.get(self.key), "v")
+
+    def test_callers_without_lock_get_stale_value(self):
+        results = _run_concurrently(
+            5,
+            lambda: single_flight(self.key, self._slow_compute("new"), 60, stale="old"),
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), ["new"] + ["old"] * 4)
+
+    def test_fresh_predicate_triggers_recompute(self):
+        cache.set(self.key, {"v": 1, "fresh": False}, 60)
+        value = single_flight(
+            self.key, lambda: {"v": 2, "fresh": True}, 60, fresh=lambda e: e["fresh"]
+        )
+        self.assertEqual(value["v"], 2)
+
+    def test_failed_leader_releases_lock(self):
+        def boom():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            single_flight(self.key, boom, 60)
+        # le verrou a été libéré : l'appel suivant calcule sans attendre
+        self.assertEqual(
+            single_flight(self.key, lambda: "ok", 60, wait_timeout=0), "ok"
+        )
+
+    def test_waiter_computes_itself_after_wait_timeout(self):
+        # leader bloqué : le verrou est tenu, la valeur n'arrive jamais
+        cache.add(f"sf:{self.key}", "someone-else", 60)
+        start = time.monotonic()
+        value = single_flight(
+            self.key, lambda: "fallback", 60, wait_timeout=0.1, poll_interval=0.02
+        )
+        self.assertEqual(value, "fallback")
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class AccountingFiguresCacheTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(
+            name="AccCo", activity_kind="SERVICES_BIC"
+        )
+        self.customer = Customer.objects.create(company=self.company, name="C")
+
+    def _invoice(self, cents):
+        inv = Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number=f"ACC-{cents}",
+            issue_date=timezone.now().date(),
+            status="ISSUED",
+        )
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=inv, description="x", unit_price_cents=cents, vat_rate=0
+            )
+        return inv
+
+    def test_cached_then_invalidated_by_invoice_change(self):
+        self._invoice(10000)
+        first = accounting_figures(self.company)
+        self.assertEqual(str(first["period_ca"]), "100.00")
+        with self.assertNumQueries(0):
+            self.assertEqual(accounting_figures(self.company), first)
+        self._invoice(5000)
+        self.assertEqual(str(accounting_figures(self.company)["period_ca"]), "150.00")
@@ -0,0 +1,110 @@
+# portal/tests/test_stored_pdf.py
+import os
+import shutil
+import tempfile
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from xhtml2pdf import pisa
+
+from core.models import Company, Customer, Invoice, InvoiceItem, Membership
+from core.pdf_store import pdf_version, store_document_pdf
+
+
+@override_settings(PDF_RENDER_WORKERS=0)
+class StoredInvoicePdfTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        company = Company.objects.create(name="StoreCo")
+        user = User.objects.create_user(username="store", password="pw")
+        Membership.objects.create(user=user, company=company)
+        customer = Customer.objects.create(company=company, name="C")
+        self.invoice = Invoice.objects.create(
+            company=company,
+            customer=customer,
+            number="FAC-2025-0001",
+            issue_date=date(2025, 3, 1),
+            status="ISSUED",
+        )
+        self.item = InvoiceItem.objects.create(
+            invoice=self.invoice, description="x", unit_price_cents=1000, vat_rate=20
+        )
+        self.client.force_login(user)
+        self.url = reverse("portal:invoice_pdf", args=[self.invoice.pk])
+
+    def tearDown(self):
+        cache.clear()
+
+    def _get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_rendered_once_then_served_from_field(self):
+        with patch("core.pdf.pisa.CreatePDF", wraps=pisa.CreatePDF) as create:
+            first = self._get()
+            second = self._get()
+        self.assertEqual(create.call_count, 1)
+        self.invoice.refresh_from_db()
+        self.assertTrue(self.invoice.pdf.name.startswith("invoices/"))
+        self.assertTrue(os.path.exists(self.invoice.pdf.path))
+        self.assertEqual(first["ETag"], f'"{pdf_version(self.invoice.pdf.name)}"')
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("Last-Modified", second)
+        self.assertEqual(b"".join(second.streaming_content)[:4], b"%PDF")
+
+    def test_conditional_get_and_versioned_url(self):
+        etag = self._get()["ETag"]
+        resp = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["Cache-Control"], "private, no-cache")
+        resp = self.client.get(self.url, {"v": etag.strip('"')})
+        self.assertIn("immutable", resp["Cache-Control"])
+
+    def test_editing_invalidates_stored_pdf(self):
+        self._get()
+        self.invoice.refresh_from_db()
+        path = self.invoice.pdf.path
+        with patch("django_rq.get_queue"), self.captureOnCommitCallbacks(execute=True):
+            self.item.unit_price_cents = 2000
+            self.item.save()
+        self.invoice.refresh_from_db()
+        self.assertFalse(self.invoice.pdf)
+        self.assertFalse(os.path.exists(path))
+
+    def test_render_of_edited_document_not_stored(self):
+        # rendu lancé avant une modification, enregistré après
+        stale = Invoice.objects.get(pk=self.invoice.pk)
+        self.invoice.notes = "modifiée"
+        self.invoice.save()
+        self.assertIsNone(store_document_pdf(stale, b"%PDF-stale"))
+        self.invoice.refresh_from_db()
+        self.assertFalse(self.invoice.pdf)
+        self.assertEqual([f for _, _, files in os.walk(self.media) for f in files], [])
+        # servi quand même, sans être conservé
+        resp = self._get()
+        self.assertEqual(resp.status_code, 200)
+
+    def test_concurrent_first_downloads_keep_one_file(self):
+        first = Invoice.objects.get(pk=self.invoice.pk)
+        second = Invoice.objects.get(pk=self.invoice.pk)
+        name = store_document_pdf(first, b"%PDF-1")
+        self.assertIsNone(store_document_pdf(second, b"%PDF-2"))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.pdf.name, name)
+        folder = os.path.dirname(self.invoice.pdf.path)
+        self.assertEqual(os.listdir(folder), [os.path.basename(name)])
+
+    def test_draft_is_not_stored(self):
+        Invoice.objects.filter(pk=self.invoice.pk).update(status="DRAFT")
+        resp = self._get()
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp)
+        self.invoice.refresh_from_db()
+        self.assertFalse(self.invoice.pdf)
@@ -0,0 +1,96 @@
+# portal/tests/test_totals_kernel.py
+import random
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.services import compute_totals
+from core.totals import (
+    batch_sums,
+    batch_totals,
+    div_round,
+    line_totals,
+    np,
+    to_bp,
+    to_hundredths,
+)
+
+
+def _item(qty, unit_cents, disc=0, vat=20):
+    return SimpleNamespace(
+        quantity=Decimal(qty),
+        unit_price_cents=unit_cents,
+        discount_pct=Decimal(disc),
+        vat_rate=Decimal(vat),
+    )
+
+
+def item_line_raw(row):
+    qty, unit, disc, vat = row
+    return to_hundredths(qty), unit, to_bp(disc), to_bp(vat)
+
+
+class TotalsKernelTest(SimpleTestCase):
+    def test_scaling(self):
+        self.assertEqual(to_hundredths(Decimal("1.5")), 150)
+        self.assertEqual(to_hundredths(None), 0)
+        self.assertEqual(to_bp("5.5"), 550)
+        self.assertEqual(to_bp(Decimal("12.345")), 1235)  # demi vers le haut
+
+    def test_half_up_rounding(self):
+        self.assertEqual(div_round(150, 100), 2)
+        self.assertEqual(div_round(149, 100), 1)
+        self.assertEqual(div_round(-150, 100), -2)
+
+    def test_line_rounding_order(self):
+        # 3 × 0,333 € = 0,999 € -> 1,00 € ; remise 12,5 % = 0,125 -> 0,13 ; TVA 5,5 %
+        lt = line_totals(333, 300, discount_bp=1250, vat_bp=550)
+        self.assertEqual(lt, (999, 125, 874, 48, 922))
+
+    def test_batch_per_document(self):
+        lines = [
+            ("A", 100, 1000, 0, 2000),
+            ("B", 250, 199, 1000, 550),
+            ("A", 50, 333, 0, 2000),
+        ]
+        per_line, docs = batch_totals(lines)
+        self.assertEqual(len(per_line), 3)
+        self.assertEqual(list(docs), ["A", "B"])
+        self.assertEqual(docs["A"], (1167, 233, 1400))
+        self.assertEqual(docs["B"].subtotal, per_line[1].ht)
+
+    def test_document_totals_sum_rounded_lines(self):
+        # arrondi par ligne : 3 lignes à 0,005 € de TVA chacune -> 3 centimes
+        items = [_item(1, 5, vat=10)] * 3
+        self.assertEqual(compute_totals(items), (15, 3, 18))
+        self.assertEqual(compute_totals([]), (0, 0, 0))
+
+    @skipIf(np is None, "NumPy non installé")
+    def test_vectorized_sums_match_scalar(self):
+        rnd = random.Random(7)
+        rows = [
+            (
+                rnd.randint(1, 50),
+                Decimal(rnd.randint(-200, 10_000)) / 100,
+                rnd.randint(0, 100_000),
+                Decimal(rnd.choice(["0", "5", "12.5", "33.33", "100"])),
+                Decimal(rnd.choice(["0", "2.1", "5.5", "10", "20"])),
+            )
+            for _ in range(2000)
+        ]
+        scalar = batch_sums(rows, threshold=len(rows) + 1)
+        self.assertEqual(batch_sums(rows, threshold=0), scalar)
+        # lignes déjà triées par document (cas values_list ordonné)
+        rows.sort(key=lambda r: r[0])
+        self.assertEqual(batch_sums(rows, threshold=0), scalar)
+        _, docs = batch_totals((d, *item_line_raw(r)) for d, *r in rows)
+        self.assertEqual({k: v[2:] for k, v in scalar.items()}, docs)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("bench_totals", "--lines", "500", stdout=out)
+        self.assertIn("documents differing : 0", out.getvalue())
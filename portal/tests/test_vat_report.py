@@ -0,0 +1,126 @@
+# portal/tests/test_vat_report.py
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Company, Customer, Invoice, InvoiceItem, Membership
+from portal.services_vat import (
+    compute_vat_report,
+    month_period,
+    parse_vat_period,
+    quarter_period,
+    recent_vat_periods,
+    vat_report,
+)
+
+
+class VatReportTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="VatCo", tva_franchise=False)
+        self.customer = Customer.objects.create(company=self.company, name="C")
+        inv = self._invoice(date(2025, 1, 15), "ISSUED")
+        # 3 lignes identiques : TVA arrondie par ligne (3 × 0,07 € et non 0,20 €)
+        for _ in range(3):
+            self._item(inv, 33, 20, quantity="1.01")
+        self._item(inv, 10000, "5.5")
+        self._item(self._invoice(date(2025, 2, 10), "PAID"), 20000, 20)
+        # exclues : brouillon, hors période
+        self._item(self._invoice(date(2025, 2, 11), "DRAFT"), 99999, 20)
+        self._item(self._invoice(date(2025, 4, 1), "ISSUED"), 99999, 20)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _invoice(self, issued, status):
+        return Invoice.objects.create(
+            company=self.company,
+            customer=self.customer,
+            number=f"V-{Invoice.objects.count()}",
+            issue_date=issued,
+            status=status,
+        )
+
+    def _item(self, inv, cents, vat, quantity="1"):
+        InvoiceItem.objects.create(
+            invoice=inv,
+            description="x",
+            quantity=quantity,
+            unit_price_cents=cents,
+            vat_rate=vat,
+        )
+
+    def test_parse_period(self):
+        self.assertEqual(parse_vat_period("2025-03"), month_period(2025, 3))
+        q1 = parse_vat_period("2025-Q1")
+        self.assertEqual((q1.start, q1.end), (date(2025, 1, 1), date(2025, 3, 31)))
+        self.assertEqual(
+            parse_vat_period("bad", today=date(2025, 1, 10)).key, "2024-12"
+        )
+        months, quarters = recent_vat_periods(date(2025, 3, 31))
+        self.assertEqual([p.key for p in months[:3]], ["2025-02", "2025-01", "2024-12"])
+        self.assertEqual(quarters[0], quarter_period(2024, 4))
+
+    def test_quarter_grouped_by_rate(self):
+        report = compute_vat_report(self.company, quarter_period(2025, 1))
+        rows = [(str(r["rate"]), str(r["base"]), str(r["vat"])) for r in report["rows"]]
+        self.assertEqual(rows, [("5.5", "100.00", "5.50"), ("20", "200.99", "40.21")])
+        self.assertEqual(str(report["total_base"]), "300.99")
+        self.assertEqual(str(report["total_vat"]), "45.71")
+
+    def test_single_group_by_query(self):
+        with self.assertNumQueries(1):
+            compute_vat_report(self.company, month_period(2025, 1))
+
+    def test_closed_period_cached_open_period_live(self):
+        closed = month_period(2025, 1)
+        first = vat_report(self.company, closed, today=date(2025, 6, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                vat_report(self.company, closed, today=date(2025, 6, 1)), first
+            )
+        current = month_period(2025, 6)
+        with self.assertNumQueries(1):
+            vat_report(self.company, current, today=date(2025, 6, 10))
+        with self.assertNumQueries(1):
+            vat_report(self.company, current, today=date(2025, 6, 10))
+
+    def test_backdated_invoice_invalidates_closed_period(self):
+        closed = month_period(2025, 1)
+        today = date(2025, 6, 1)
+        before = vat_report(self.company, closed, today=today)["total_vat"]
+        # émise après coup, datée du mois clos ; OVERDUE compte comme au FEC
+        self._item(self._invoice(date(2025, 1, 31), "OVERDUE"), 1000, 20)
+        after = vat_report(self.company, closed, today=today)["total_vat"]
+        self.assertEqual(after - before, 2)
+        inv = Invoice.objects.get(issue_date=date(2025, 1, 31))
+        inv.status = "CANCELLED"
+        inv.save()
+        self.assertEqual(
+            vat_report(self.company, closed, today=today)["total_vat"], before
+        )
+
+    def test_html_csv_pdf(self):
+        user = User.objects.create_user(username="vat", password="pw")
+        Membership.objects.create(user=user, company=self.company)
+        self.client.force_login(user)
+        url = reverse("portal:vat_report")
+
+        resp = self.client.get(url, {"period": "2025-Q1"})
+        self.assertContains(resp, "T1 2025")
+        self.assertContains(resp, "45,71")
+
+        resp = self.client.get(url, {"period": "2025-Q1", "format": "csv"})
+        lines = resp.content.decode("utf-8").lstrip("\ufeff").splitlines()
+        self.assertEqual(lines[-1], "Total,300.99,45.71")
+        self.assertIn('filename="tva_2025-Q1.csv"', resp["Content-Disposition"])
+
+        with patch(
+            "portal.views_accounting.render_pdf_from_template", return_value=b"%PDF"
+        ) as render:
+            resp = self.client.get(url, {"period": "2025-Q1", "format": "pdf"})
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        self.assertEqual(render.call_args[0][0], "pdf/vat_report.html")
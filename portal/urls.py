@@ -4,7 +4,8 @@ from . import views
 
 # nouvelle importation
 from .views_accounting import accounting_dashboard as accounting_dashboard_view
-from .views_export import enqueue_export
+from .views_accounting import vat_report
+from .views_export import enqueue_export, export_download, export_start, export_status
 
 app_name = "portal"
 
@@ -37,7 +38,11 @@ urlpatterns = [
         enqueue_export,
         name="invoice_enqueue_export",
     ),
+    path("exports/", export_start, name="export_start"),
+    path("exports/<int:pk>/", export_status, name="export_status"),
+    path("exports/<int:pk>/download/", export_download, name="export_download"),
     path("accounting/", accounting_dashboard_view, name="accounting"),
     path("accounting/urssaf/pdf/", views.urssaf_pdf, name="urssaf_pdf"),
+    path("accounting/vat/", vat_report, name="vat_report"),
     # Les routes /pdf/... pointant vers les views de dev ont été supprimées
 ]
@@ -1,12 +1,12 @@
 import json
-from decimal import ROUND_HALF_UP, Decimal
 
 from django.contrib import auth, messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import Group, User
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.http import (
+    FileResponse,
     Http404,
     HttpRequest,
     HttpResponse,
@@ -16,11 +16,11 @@ from django.http import (
 )
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.dateparse import parse_date
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.http import require_POST
 
-from core.accounting import compute_contributions, get_thresholds
 from core.models import (
     Company,
     Invoice,
@@ -30,16 +30,15 @@ from core.models import (
     SystemLog,
     Ticket,
     TicketEvent,
-    TurnoverEntry,
 )
-from core.pdf import render_pdf_from_template
+from core.pdf import invoice_pdf_context
+from core.pdf_service import PdfServiceUnavailable, render_pdf
+from core.pdf_store import is_persisted, pdf_version, store_document_pdf
 from core.services import (
-    compute_totals,
     feature_enabled,
     next_invoice_number,
     next_quote_number,
 )
-from core.utils import invoice_total
 
 from .forms import (
     CompanySettingsForm,
@@ -53,10 +52,7 @@ from .forms import (
     TicketForm,
     TicketStatusForm,
 )
-from .services import compute_dashboard
-from .services_insights import compute_insights
-
-Q2 = Decimal("0.01")
+from .services import accounting_figures, compute_dashboard, request_revenue
 
 
 def _is_superuser(u):
@@ -124,7 +120,9 @@ def dashboard(request):
 
     recent_tickets = base.select_related("assigned_to").order_by("-created_at")[:8]
     # Récupération du dashboard compta
-    dashboard_kpis = compute_dashboard(company)
+    # stale-while-revalidate : jamais de recalcul complet sur le chemin de la requête
+    # quand une valeur précédente existe (le refresh part en file RQ)
+    dashboard_kpis = compute_dashboard(company, stale_while_revalidate=True)
 
     ctx = {
         "company": company,
@@ -142,8 +140,12 @@ def dashboard(request):
             float(x) for x in dashboard_kpis["ca_series"]
         ],  # pour JS (Chart.js)
     }
-    dashboard_insights = compute_insights(company)
-    ctx.update({"insights": dashboard_insights})
+    ctx.update(
+        {
+            "insights": dashboard_kpis["insights"],
+            "stale_seconds": dashboard_kpis["stale_seconds"],
+        }
+    )
     return render(request, "portal/dashboard.html", ctx)
 
 
@@ -509,6 +511,83 @@ def quote_edit(request, pk: int):
     )
 
 
+def _pdf_unavailable(exc):
+    resp = HttpResponse(
+        "Génération du PDF momentanément indisponible, réessayez.",
+        status=503,
+        content_type="text/plain; charset=utf-8",
+    )
+    resp["Retry-After"] = str(exc.retry_after)
+    return resp
+
+
+def _pdf_response(template_name, context, filename):
+    """
+    PDF rendu par le service (pool borné) ; service saturé ou trop lent :
+    503 + Retry-After plutôt que d'immobiliser le worker web.
+    """
+    try:
+        pdf = render_pdf(template_name, context)
+    except PdfServiceUnavailable as exc:
+        return _pdf_unavailable(exc)
+    resp = HttpResponse(pdf, content_type="application/pdf")
+    resp["Content-Disposition"] = f'inline; filename="{filename}"'
+    return resp
+
+
+def _stored_pdf_response(request, fieldfile, filename):
+    """
+    Sert le PDF enregistré avec ETag / Last-Modified (GET conditionnel : 304).
+    URL versionnée (?v=<empreinte>) : cache navigateur d'un an, sinon
+    revalidation à chaque ouverture. None si le fichier a disparu.
+    """
+    name = fieldfile.name
+    version = pdf_version(name)
+    etag = quote_etag(version or name)
+    try:
+        last_modified = int(fieldfile.storage.get_modified_time(name).timestamp())
+    except OSError:
+        return None
+    resp = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if resp is None:
+        try:
+            resp = FileResponse(
+                fieldfile.open("rb"), content_type="application/pdf", filename=filename
+            )
+        except FileNotFoundError:
+            return None
+    resp["ETag"] = etag
+    resp["Last-Modified"] = http_date(last_modified)
+    if version and request.GET.get("v") == version:
+        resp["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        resp["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def _document_pdf_response(request, doc, template_name, context, filename):
+    """
+    PDF d'un devis / d'une facture. Document émis (core.pdf_store) : rendu à
+    la première demande, enregistré dans doc.pdf puis servi tel quel.
+    `context` : fonction renvoyant le contexte du template (appelée au rendu).
+    """
+    if is_persisted(doc) and doc.pdf:
+        resp = _stored_pdf_response(request, doc.pdf, filename)
+        if resp is not None:
+            return resp
+    try:
+        pdf = render_pdf(template_name, context(), use_cache=True)
+    except PdfServiceUnavailable as exc:
+        return _pdf_unavailable(exc)
+    if is_persisted(doc) and store_document_pdf(doc, pdf):
+        resp = _stored_pdf_response(request, doc.pdf, filename)
+        if resp is not None:
+            return resp
+    resp = HttpResponse(pdf, content_type="application/pdf")
+    resp["Content-Disposition"] = f'inline; filename="{filename}"'
+    return resp
+
+
 @login_required
 def quote_pdf(request, pk: int):
     company = _user_company(request)
@@ -521,13 +600,18 @@ def quote_pdf(request, pk: int):
     )
     if not q:
         raise Http404()
-    subtotal, tax, total = compute_totals(q.items.all())
-    pdf = render_pdf_from_template(
-        "pdf/quote.html", {"q": q, "subtotal": subtotal, "tax": tax, "total": total}
+    return _document_pdf_response(
+        request,
+        q,
+        "pdf/quote.html",
+        lambda: {
+            "q": q,
+            "subtotal": q.subtotal_cents,
+            "tax": q.tax_cents,
+            "total": q.total_cents,
+        },
+        f"{q.number}.pdf",
     )
-    resp = HttpResponse(pdf, content_type="application/pdf")
-    resp["Content-Disposition"] = f'inline; filename="{q.number}.pdf"'
-    return resp
 
 
 # ---- Factures ----
@@ -596,7 +680,7 @@ def invoice_edit(request, pk: int):
 @login_required
 def invoice_pdf(request, pk: int):
     """
-    Génère le PDF d'une facture via core.pdf.render_pdf_from_template.
+    Génère le PDF d'une facture via le service de rendu (core.pdf_service).
     Vérifie que l'utilisateur est lié à la même company (ou superuser).
     Fournit un contexte complet : lignes, totaux HT/TVA/TTC, client.
     """
@@ -611,68 +695,13 @@ def invoice_pdf(request, pk: int):
     if not (request.user.is_superuser or (company and inv.company_id == company.id)):
         raise Http404("Facture introuvable")
 
-    # Calcul des lignes et totaux
-    subtotal = Decimal("0.00")
-    vat_total = Decimal("0.00")
-    lines = []
-    for it in inv.items.all():
-        qty = Decimal(it.quantity)
-        unit_ht = (Decimal(it.unit_price_cents) / Decimal(100)).quantize(
-            Q2, rounding=ROUND_HALF_UP
-        )
-        base_ht = (unit_ht * qty).quantize(Q2, rounding=ROUND_HALF_UP)
-        discount_pct = Decimal(it.discount_pct or 0) / Decimal(100)
-        discount_amt = (base_ht * discount_pct).quantize(Q2, rounding=ROUND_HALF_UP)
-        line_ht = (base_ht - discount_amt).quantize(Q2, rounding=ROUND_HALF_UP)
-        vat_rate = Decimal(it.vat_rate or 0) / Decimal(100)
-        vat_amt = (line_ht * vat_rate).quantize(Q2, rounding=ROUND_HALF_UP)
-
-        lines.append(
-            {
-                "description": it.description,
-                "quantity": qty,
-                "unit_ht": unit_ht,
-                "base_ht": base_ht,
-                "discount_pct": float(discount_pct * 100),
-                "discount_amt": discount_amt,
-                "line_ht": line_ht,
-                "vat_rate": float(vat_rate * 100),
-                "vat_amt": vat_amt,
-                "total_ht": line_ht,
-            }
-        )
-        subtotal += line_ht
-        vat_total += vat_amt
-
-    subtotal = subtotal.quantize(Q2)
-    vat_total = vat_total.quantize(Q2)
-    total_ttc = (subtotal + vat_total).quantize(Q2)
-
-    # Contexte pour le template PDF (nommage simple pour templates)
-    ctx = {
-        "invoice": inv,
-        "company": inv.company,
-        "customer": inv.customer,
-        "lines": lines,
-        "subtotal": subtotal,
-        "vat_total": vat_total,
-        "total_ttc": total_ttc,
-    }
-
-    pdf_bytes = render_pdf_from_template("pdf/invoice.html", ctx)
-    resp = HttpResponse(pdf_bytes, content_type="application/pdf")
-    resp["Content-Disposition"] = f'inline; filename="invoice_{inv.number}.pdf"'
-    return resp
-
-
-def _invoices_total_for_period(company, start, end):
-    qs = Invoice.objects.filter(
-        company=company, issue_date__gte=start, issue_date__lte=end
-    ).prefetch_related("items")
-    total = Decimal("0.00")
-    for inv in qs:
-        total += invoice_total(inv)
-    return total
+    return _document_pdf_response(
+        request,
+        inv,
+        "pdf/invoice.html",
+        lambda: invoice_pdf_context(inv),
+        f"invoice_{inv.number}.pdf",
+    )
 
 
 @login_required
@@ -681,60 +710,9 @@ def accounting_dashboard(request):
     if not company:
         raise Http404()
 
-    today = timezone.now().date()
-    year = today.year
-    th = get_thresholds(year)
-
-    # CA cumulé depuis le 1er janvier (factures émises)
-    year_start = today.replace(month=1, day=1)
-    inv_sum = _invoices_total_for_period(company, year_start, today)
-    # Saisies manuelles éventuelles
-    manual_sum = TurnoverEntry.objects.filter(
-        company=company, period_start__gte=year_start, period_end__lte=today
-    ).aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
-    ca_ytd = (inv_sum or Decimal("0.00")) + (manual_sum or Decimal("0.00"))
-
-    # Plafonds micro
-    micro_cap = (
-        th.micro_cap_sales
-        if company.activity_kind == "VENTES"
-        else th.micro_cap_services
-    )
-    micro_progress = float((ca_ytd / Decimal(micro_cap)) * 100) if micro_cap else 0.0
-
-    # Franchise TVA (selon activité, base + tolérance)
-    if company.activity_kind == "VENTES":
-        vat_base = th.vat_base_sales
-        vat_tol = th.vat_base_sales_tol
-    else:
-        vat_base = th.vat_base_services
-        vat_tol = th.vat_base_services_tol
-
-    # URSSAF – estimation période courante (mensuel/trimestriel)
-    if company.urssaf_frequency == "MENSUEL":
-        period_start = today.replace(day=1)
-    else:
-        q = (today.month - 1) // 3
-        period_start = today.replace(month=q * 3 + 1, day=1)
-    period_end = today
-
-    period_ca = _invoices_total_for_period(company, period_start, period_end)
-
-    contrib, rate_label = compute_contributions(company.activity_kind, period_ca)
-
     ctx = {
         "company": company,
-        "year": year,
-        "ca_ytd": ca_ytd,
-        "micro_cap": micro_cap,
-        "micro_progress": round(micro_progress, 2),
-        "vat_base": vat_base,
-        "vat_tol": vat_tol,
-        "period_start": period_start,
-        "period_end": period_end,
-        "period_ca": period_ca,
-        "contrib": contrib,
-        "urssaf_rate_label": rate_label,
+        **accounting_figures(company, revenue=request_revenue(request, company)),
     }
 
     return render(request, "portal/accounting/dashboard.html", ctx)
@@ -747,43 +725,21 @@ def urssaf_pdf(request):
     if not company:
         raise Http404()
 
-    from io import BytesIO
-
-    from django.template.loader import get_template
-    from django.utils import timezone
-    from xhtml2pdf import pisa
+    figures = accounting_figures(company, revenue=request_revenue(request, company))
+    period_start, period_end = figures["period_start"], figures["period_end"]
 
-    today = timezone.now().date()
-    if company.urssaf_frequency == "MENSUEL":
-        period_start = today.replace(day=1)
-    else:
-        q = (today.month - 1) // 3
-        period_start = today.replace(month=q * 3 + 1, day=1)
-    period_end = today
-
-    period_ca = _invoices_total_for_period(company, period_start, period_end)
-
-    contrib, rate_label = compute_contributions(company.activity_kind, period_ca)
-
-    template = get_template("pdf/urssaf_summary.html")
-    html = template.render(
+    return _pdf_response(
+        "pdf/urssaf_summary.html",
         {
             "company": company,
             "period_start": period_start,
             "period_end": period_end,
-            "period_ca": period_ca,
-            "contrib": contrib,
-            "urssaf_rate_label": rate_label,
-        }
-    )
-    out = BytesIO()
-    pisa.CreatePDF(html, dest=out)
-    resp = HttpResponse(out.getvalue(), content_type="application/pdf")
-    resp["Content-Disposition"] = "inline; filename=urssaf_%s_%s.pdf" % (
-        period_start.isoformat(),
-        period_end.isoformat(),
+            "period_ca": figures["period_ca"],
+            "contrib": figures["contrib"],
+            "urssaf_rate_label": figures["urssaf_rate_label"],
+        },
+        f"urssaf_{period_start.isoformat()}_{period_end.isoformat()}.pdf",
     )
-    return resp
 
 
 @login_required
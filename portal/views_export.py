@@ -1,20 +1,105 @@
 # portal/views_export.py
-import django_rq
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.views.decorators.http import require_POST
 
-from core.models import Invoice
+from core.models import ExportJob, Invoice
 
-from .tasks import heavy_export_invoice
+from .services_exports import EXPORTERS, create_export, export_filename
+from .views import _user_company
 
+# paramètres acceptés par type d'export (POST de export_start)
+EXPORT_PARAMS = {
+    "ACCOUNTING_CSV": ("start_date", "end_date", "client"),
+    "PDF_BUNDLE": ("invoice_ids", "start_date", "end_date", "client", "status"),
+    "FEC": ("year",),
+    "TENANT_DUMP": (),
+}
 
+
+def _job_status(job):
+    return {
+        "ok": True,
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "rows_done": job.rows_done,
+        "rows_total": job.rows_total,
+        "error": job.error,
+        "status_url": reverse("portal:export_status", args=[job.pk]),
+        "download_url": (
+            reverse("portal:export_download", args=[job.pk])
+            if job.status == "SUCCESS" and job.file
+            else None
+        ),
+    }
+
+
+def _company_job(request, pk):
+    company = _user_company(request)
+    if not company:
+        raise Http404()
+    return get_object_or_404(ExportJob, pk=pk, company=company)
+
+
+@login_required
 def enqueue_export(request, pk: int):
     """
-    Enqueue la tâche heavy_export_invoice sur la queue 'default'.
+    Place en file l'export PDF d'une facture (ExportJob PDF_BUNDLE).
     """
-    invoice = get_object_or_404(Invoice, pk=pk)
-    q = django_rq.get_queue("default")
-    job = q.enqueue(heavy_export_invoice, invoice.pk)
-    messages.success(request, f"Export placé en file (job id: {job.id})")
+    company = _user_company(request)
+    invoice = get_object_or_404(Invoice, pk=pk, company=company)
+    job = create_export(
+        company, "PDF_BUNDLE", {"invoice_ids": [invoice.pk]}, request.user
+    )
+    messages.success(request, f"Export placé en file (export n° {job.pk})")
     return redirect(reverse("portal:invoices"))
+
+
+@login_required
+@require_POST
+def export_start(request):
+    """Crée un export (POST kind + paramètres) ; renvoie son statut à suivre."""
+    company = _user_company(request)
+    if not company:
+        return JsonResponse({"ok": False, "error": "no_company"}, status=403)
+    kind = request.POST.get("kind")
+    if kind not in EXPORT_PARAMS or kind not in EXPORTERS:
+        return JsonResponse({"ok": False, "error": "bad_params"}, status=400)
+    params = {}
+    for name in EXPORT_PARAMS[kind]:
+        if name == "invoice_ids":
+            try:
+                params[name] = [int(v) for v in request.POST.getlist(name)]
+            except ValueError:
+                return JsonResponse({"ok": False, "error": "bad_params"}, status=400)
+        elif name == "year" and request.POST.get(name):
+            if not request.POST[name].isdigit():
+                return JsonResponse({"ok": False, "error": "bad_params"}, status=400)
+            params[name] = int(request.POST[name])
+        elif request.POST.get(name):
+            params[name] = request.POST[name]
+    job = create_export(company, kind, params, request.user)
+    return JsonResponse(_job_status(job), status=202)
+
+
+@login_required
+def export_status(request, pk: int):
+    """Avancement d'un export (interrogé périodiquement par l'interface)."""
+    return JsonResponse(_job_status(_company_job(request, pk)))
+
+
+@login_required
+def export_download(request, pk: int):
+    job = _company_job(request, pk)
+    if job.status != "SUCCESS" or not job.file:
+        raise Http404("Export indisponible")
+    try:
+        fh = job.file.open("rb")
+    except FileNotFoundError:
+        raise Http404("Export expiré")
+    return FileResponse(fh, as_attachment=True, filename=export_filename(job))